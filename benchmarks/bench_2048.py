@@ -0,0 +1,256 @@
+"""
+Benchmarks for the Game2048 hot paths and the registered AI engines.
+
+    python -m benchmarks.bench_2048 -o bench.json
+    python -m benchmarks.bench_2048 --save-baseline
+    python -m benchmarks.bench_2048 --baseline benchmarks/baseline.json
+
+Every benchmark runs on boards drawn from a fixed seed and reports the best
+time per operation over several repeats. Comparing against a baseline exits
+with status 1 if any benchmark got slower by more than --threshold.
+
+Timings only compare on the machine that made them, so no baseline is
+committed: save one with --save-baseline before changing the code.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from typing import NamedTuple
+from src.backends_2048 import BACKENDS
+from src.bitboard_2048 import BitboardGame2048, to_bitboard
+from src.engines_2048 import ENGINES, create_engine
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+GRID_SIZES = (3, 4, 5, 6)
+SEED = 2048
+STATES = 256
+
+
+class BenchmarkResult(NamedTuple):
+    name: str
+    ns_per_op: float
+    ops: int
+
+
+class Regression(NamedTuple):
+    name: str
+    baseline_ns: float
+    current_ns: float
+
+    @property
+    def ratio(self):
+        return self.current_ns / self.baseline_ns
+
+
+def random_board(rng, grid_size):
+    tiles = [0, 0, 0, 2, 2, 4, 4, 8, 16, 32, 64, 128]
+    return [
+        [rng.choice(tiles) for _ in range(grid_size)]
+        for _ in range(grid_size)
+    ]
+
+
+def time_per_op(operation, number, repeat):
+    """
+    Calls operation(i) for i in range(number), repeat times, and returns the
+    best average time per call in nanoseconds
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for i in range(number):
+            operation(i)
+        best = min(best, (time.perf_counter_ns() - start) / number)
+    return best
+
+
+def play_random_game(game, rng):
+    game.start_game()
+    moves = (game.move_left, game.move_right, game.move_up, game.move_down)
+    while not game.is_game_over():
+        if rng.choice(moves)():
+            game.generate_tile()
+
+
+def game_benchmarks(backend, grid_size, number):
+    """
+    Yields (name, operation, number) for every Game2048 hot path
+    """
+    rng = random.Random(SEED)
+    boards = [random_board(rng, grid_size) for _ in range(STATES)]
+    if backend == "bitboard":
+        game = BitboardGame2048()
+        states = [to_bitboard(board) for board in boards]
+
+        def set_state(i):
+            game.bitboard = states[i % STATES]
+    else:
+        game = BACKENDS[backend](grid_size=grid_size)
+
+        def set_state(i):
+            game.board = [row[:] for row in boards[i % STATES]]
+
+    prefix = f"{backend}/{grid_size}x{grid_size}"
+    rows = [row for board in boards for row in board]
+
+    def slide_row_left(i):
+        game.slide_row_left(rows[i % len(rows)])
+
+    yield f"{prefix}/slide_row_left", slide_row_left, number
+
+    # Every benchmark below resets the board first, this is that overhead
+    yield f"{prefix}/set_state", set_state, number
+
+    for method in (
+        "move_left",
+        "move_right",
+        "move_up",
+        "move_down",
+        "is_game_over",
+    ):
+
+        def operation(i, method=getattr(game, method)):
+            set_state(i)
+            method()
+
+        yield f"{prefix}/{method}", operation, number
+
+    def generate_tile(i):
+        set_state(i)
+        game.generate_tile()
+
+    yield f"{prefix}/generate_tile", generate_tile, number
+
+    def rollout(i):
+        game.rng.seed(SEED + i)
+        play_random_game(game, random.Random(SEED + i))
+
+    yield f"{prefix}/rollout", rollout, max(1, number // 2000)
+
+
+def engine_benchmarks(number):
+    rng = random.Random(SEED)
+    boards = [random_board(rng, 4) for _ in range(STATES)]
+    for name in sorted(ENGINES):
+        if name == "ntuple":
+            from src.ntuple_ai_engine_2048 import NTupleNetwork
+
+            # Untrained weights play as fast, without needing a weights file
+            engine = create_engine(name, network=NTupleNetwork())
+        else:
+            engine = create_engine(name)
+
+        def recommend(i, engine=engine):
+            engine.recommend_next_move(boards[i % STATES])
+
+        yield f"engine/{name}/recommend_next_move", recommend, number
+
+
+def all_benchmarks(number):
+    for grid_size in GRID_SIZES:
+        yield from game_benchmarks("list", grid_size, number)
+        yield from game_benchmarks("packed", grid_size, number)
+    yield from game_benchmarks("bitboard", 4, number)
+    yield from engine_benchmarks(max(1, number // 2000))
+
+
+def run_benchmarks(number=2000, repeat=5, name_filter=None, out=None):
+    results = []
+    for name, operation, ops in all_benchmarks(number):
+        if name_filter and name_filter not in name:
+            continue
+        ns_per_op = time_per_op(operation, ops, repeat)
+        results.append(BenchmarkResult(name, ns_per_op, ops))
+        if out:
+            print(f"{name:<45} {ns_per_op / 1000:>12.2f} us/op", file=out)
+    return results
+
+
+def to_json(results) -> dict:
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {result.name: result.ns_per_op for result in results},
+    }
+
+
+def compare(results, baseline: dict, threshold: float):
+    """
+    Returns the benchmarks that are more than threshold (0.1 = 10%) slower
+    than in baseline, benchmarks missing from either side are ignored
+    """
+    baseline_results = baseline["results"]
+    return [
+        Regression(
+            result.name, baseline_results[result.name], result.ns_per_op
+        )
+        for result in results
+        if result.name in baseline_results
+        and result.ns_per_op > baseline_results[result.name] * (1 + threshold)
+    ]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmarks Game2048 hot paths and AI engines"
+    )
+    parser.add_argument("-o", "--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against this JSON file")
+    parser.add_argument(
+        "--save-baseline",
+        nargs="?",
+        const=DEFAULT_BASELINE,
+        help=f"store results as the baseline (default {DEFAULT_BASELINE})",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="allowed slowdown against the baseline, 0.1 = 10%%",
+    )
+    parser.add_argument("-n", "--number", type=int, default=2000)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("-k", "--filter", help="only run names containing")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.baseline and not os.path.exists(args.baseline):
+        sys.exit(
+            f"No baseline at {args.baseline}, save one on this machine "
+            "with --save-baseline first"
+        )
+    results = run_benchmarks(
+        args.number, args.repeat, args.filter, out=sys.stdout
+    )
+    data = to_json(results)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(data, f, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    for regression in regressions:
+        print(
+            f"REGRESSION {regression.name}: "
+            f"{regression.baseline_ns / 1000:.2f} -> "
+            f"{regression.current_ns / 1000:.2f} us/op "
+            f"({regression.ratio:.2f}x)"
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,8 +5,7 @@ setup(
     version="1.0.0",
     author="Zack Tan",
     description="A 2048 game with AI support.",
-    packages=find_packages(where="src"),
-    package_dir={"": "src"},
+    packages=find_packages(include=["src"]),
     install_requires=[
         "pygame",
         "numpy",
@@ -14,7 +13,13 @@ setup(
     ],
     entry_points={
         "console_scripts": [
-            "zacks-2048=main:main",  # assumes you have a main() in src/main.py
+            "zacks-2048=src.main:main",
+            "zacks-2048-headless=src.headless_2048:main",
+            "zacks-2048-train-ntuple=src.ntuple_ai_engine_2048:main",
+            "zacks-2048-tournament=src.tournament_2048:main",
+            "zacks-2048-server=src.server_2048:main",
+            "zacks-2048-tablebase=src.tablebase_2048:main",
+            "zacks-2048-tune-heuristic=src.heuristics_2048:main",
         ],
     },
     python_requires=">=3.8",
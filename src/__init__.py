@@ -0,0 +1,36 @@
+"""
+2048 game logic and AI engines, importable without pygame:
+
+    from src import Game2048, create_engine
+
+Names below are only imported on first use, so that importing the package
+(as every process pool worker does) stays cheap. numpy is only imported by
+the engines and batch games that need it, pygame only by src.main.
+"""
+
+import importlib
+
+_EXPORTS = {
+    "AIEngine2048": "src.base_ai_engine_2048",
+    "Analysis": "src.base_ai_engine_2048",
+    "BACKENDS": "src.backends_2048",
+    "ENGINES": "src.engines_2048",
+    "Game2048": "src.game_2048",
+    "Keys2048": "src.utils",
+    "create_engine": "src.engines_2048",
+    "create_game": "src.backends_2048",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    try:
+        module_name = _EXPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_name), name)
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
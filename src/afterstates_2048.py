@@ -0,0 +1,160 @@
+from typing import NamedTuple
+from src.utils import Keys2048
+
+# Moves in the order of every afterstate tuple; bit k of a legal move mask
+# stands for MOVES[k]
+MOVES = (Keys2048.LEFT, Keys2048.RIGHT, Keys2048.UP, Keys2048.DOWN)
+MOVE_BITS = {move: 1 << k for k, move in enumerate(MOVES)}
+ALL_MOVES = (1 << len(MOVES)) - 1
+
+
+# Lines seen by slide_rows and Game2048 moves, cached with their slides.
+# Games only ever meet a small part of all possible lines; a cache filling
+# up is cleared, as packed_2048 does.
+_MAX_LINE_CACHE = 1 << 20
+_line_caches = ({}, {})  # to the left, to the right
+
+
+class LineSlide(NamedTuple):
+    line: tuple  # the line after the slide
+    score: int  # merged tile sum
+    changed: bool
+    empty_gained: int  # empty cells after the slide minus before
+    max_tile: int  # of the line after the slide
+
+
+class Afterstates(NamedTuple):
+    boards: tuple  # the board after each move, unchanged if it is illegal
+    scores: tuple  # merged tile sum of each move
+    legal: int  # bit k is set if MOVES[k] changes the board
+
+
+def moves_from_mask(mask: int):
+    """The moves of a legal move mask, in MOVES order"""
+    return [move for k, move in enumerate(MOVES) if mask >> k & 1]
+
+
+def slide_row_left_with_score(row):
+    """
+    Returns (new_row, score) after sliding a row to the left, every tile
+    merging at most once: [2, 2, 2, 2] -> [4, 4, 0, 0], not [8, 0, 0, 0]
+    """
+    new_row = [num for num in row if num != 0]
+
+    score = 0
+    i = 0
+    while i < len(new_row) - 1:
+        if new_row[i] == new_row[i + 1]:
+            new_row[i] = new_row[i] * 2
+            score += new_row[i]
+            new_row.pop(i + 1)
+            new_row.append(0)
+        i += 1
+    new_row.extend([0] * (len(row) - len(new_row)))
+    return new_row, score
+
+
+def _slide_line(line: tuple, to_left: bool) -> LineSlide:
+    if to_left:
+        new_line, score = slide_row_left_with_score(line)
+    else:
+        new_line, score = slide_row_left_with_score(line[::-1])
+        new_line.reverse()
+    new_line = tuple(new_line)
+    return LineSlide(
+        new_line,
+        score,
+        new_line != line,
+        new_line.count(0) - line.count(0),
+        max(new_line),
+    )
+
+
+def line_cache(to_left: bool) -> dict:
+    """
+    The slides of lines (tuples of tiles, of any length) to the left (or
+    right) seen so far, filled by cache_line
+    """
+    return _line_caches[0 if to_left else 1]
+
+
+def cache_line(cache: dict, line: tuple, to_left: bool) -> LineSlide:
+    """Slides line and keeps the result in cache, see line_cache"""
+    if len(cache) >= _MAX_LINE_CACHE:
+        cache.clear()
+    slide = cache[line] = _slide_line(line, to_left)
+    return slide
+
+
+def slide_rows(rows, to_left: bool):
+    """
+    Slides every row towards the left (or right).
+    Returns (new_rows, score), looking every row up in the line caches
+    """
+    cache = line_cache(to_left)
+    new_rows = []
+    score = 0
+    for row in rows:
+        row = tuple(row)
+        slide = cache.get(row)
+        if slide is None:
+            slide = cache_line(cache, row, to_left)
+        new_rows.append(list(slide.line))
+        score += slide.score
+    return new_rows, score
+
+
+def afterstates(board) -> Afterstates:
+    """
+    Every move of a square list of lists board at once, without touching
+    it. The boards returned are new lists.
+    """
+    rows = [list(row) for row in board]
+    columns = [list(column) for column in zip(*board)]
+    boards = []
+    scores = []
+    legal = 0
+    k = 0
+    for lines in (rows, columns):
+        for to_left in (True, False):
+            new_lines, score = slide_rows(lines, to_left)
+            if new_lines != lines:
+                legal |= 1 << k
+            if lines is columns:
+                new_lines = [list(row) for row in zip(*new_lines)]
+            boards.append(new_lines)
+            scores.append(score)
+            k += 1
+    return Afterstates(tuple(boards), tuple(scores), legal)
+
+
+def _line_moves(line) -> int:
+    """
+    Bit 0 if the line slides towards its start, bit 1 towards its end
+    """
+    mask = 0
+    for a, b in zip(line, line[1:]):
+        if a and a == b:
+            return 0b11
+        if b and not a:
+            mask |= 0b01
+        elif a and not b:
+            mask |= 0b10
+    return mask
+
+
+def legal_moves(board) -> int:
+    """
+    Mask of the moves changing a square list of lists board (see MOVES),
+    found by scanning it once, without sliding anything
+    """
+    mask = 0
+    for row in board:
+        mask |= _line_moves(row)
+        if mask == 0b11:
+            break
+    for column in zip(*board):
+        mask |= _line_moves(column) << 2
+        if mask == ALL_MOVES:
+            break
+    return mask
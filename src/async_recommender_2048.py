@@ -0,0 +1,97 @@
+import logging
+import queue
+import threading
+from typing import NamedTuple
+from src.base_ai_engine_2048 import AIEngine2048
+from src.utils import Keys2048
+
+LOG = logging.getLogger(__name__)
+
+
+class Recommendation(NamedTuple):
+    move: Keys2048
+    iteration: int  # 1 for the first (shallowest) result
+    final: bool  # True once the engine has nothing better to offer
+
+
+class AsyncRecommender:
+    """
+    Runs an engine's anytime search on a background thread so callers, like
+    the pygame loop, never wait for it. request() starts a search on a
+    snapshot of the board and cancels the one before it; best holds the
+    latest result and improves as the search deepens.
+    """
+
+    def __init__(self, engine: AIEngine2048):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._requests = queue.Queue()
+        self._generation = 0
+        self._best = None
+        self._searching = False
+        self._thread = threading.Thread(
+            target=self._run, name="recommender", daemon=True
+        )
+        self._thread.start()
+
+    def __repr__(self):
+        return f"Async {self.engine}"
+
+    @property
+    def best(self) -> Recommendation:
+        """The best recommendation so far, None if there is none yet"""
+        return self._best
+
+    @property
+    def busy(self) -> bool:
+        return self._searching
+
+    def request(self, board) -> None:
+        with self._lock:
+            self._generation += 1
+            self._best = None
+            self._searching = True
+            generation = self._generation
+        self._requests.put((generation, [list(row) for row in board]))
+
+    def cancel(self) -> None:
+        """Drops the current search and its result, e.g. after a move"""
+        with self._lock:
+            self._generation += 1
+            self._best = None
+            self._searching = False
+
+    def close(self) -> None:
+        self.cancel()
+        self._requests.put((None, None))
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            generation, board = self._requests.get()
+            if board is None:
+                return
+            if generation != self._generation:
+                continue  # superseded before it started
+
+            def should_stop():
+                return generation != self._generation
+
+            try:
+                iteration = 0
+                for move in self.engine.iter_recommendations(
+                    board, should_stop
+                ):
+                    iteration += 1
+                    with self._lock:
+                        if should_stop():
+                            break
+                        self._best = Recommendation(move, iteration, False)
+                    LOG.debug("%s, iteration %d: %s", self, iteration, move)
+            except Exception:
+                LOG.exception("%s failed", self)
+            with self._lock:
+                if not should_stop():
+                    if self._best is not None:
+                        self._best = self._best._replace(final=True)
+                    self._searching = False
@@ -0,0 +1,220 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from src.game_2048 import Game2048
+
+LOG = logging.getLogger(__name__)
+
+# Speeds cycled through by the window, None plays as fast as possible
+UNLIMITED = None
+SPEEDS = (1, 2, 5, 10, 30, 60, 120, UNLIMITED)
+
+# How far back the live counters look, in seconds
+STATS_WINDOW = 1.0
+
+
+class AutoPlayer:
+    """
+    Plays a Game2048 with its AI engine at moves_per_second, or UNLIMITED.
+    The engine runs on a worker thread, asked for the next move as soon as
+    the board changes. advance() is called once per rendered frame and
+    applies the moves due since the last frame as they arrive, but never
+    waits past frame_budget seconds, so in unlimited mode many moves are
+    simulated per frame while the screen still refreshes at a fixed rate,
+    however slow the engine. close() stops the worker.
+    """
+
+    def __init__(
+        self,
+        game: Game2048,
+        moves_per_second=10,
+        frame_budget=1 / 60,
+        clock=time.perf_counter,
+    ):
+        self.game = game
+        self.moves_per_second = moves_per_second
+        self.frame_budget = frame_budget
+        self.clock = clock
+        self.running = False
+        self.result = None  # "won", "over" or "stalled" once it stopped
+        self.moves = 0
+        self._due = 0.0
+        self._frames = deque()  # (time, moves applied) of recent frames
+        self._latencies = deque()  # (time, engine latency) of recent moves
+        self._pending = None  # board the worker is choosing a move for
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="autoplayer", daemon=True
+        )
+        self._thread.start()
+
+    def __repr__(self):
+        speed = (
+            "unlimited"
+            if self.moves_per_second is UNLIMITED
+            else f"{self.moves_per_second} moves/s"
+        )
+        return f"AutoPlayer({speed}, {self.game.ai_engine})"
+
+    def close(self) -> None:
+        self.stop()
+        self._requests.put(None)
+        self._thread.join()
+
+    def start(self) -> None:
+        self.running = True
+        self.result = None
+        self._due = 0.0
+
+    def stop(self) -> None:
+        self.running = False
+        self.result = None
+
+    def toggle(self) -> None:
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+    def change_speed(self, steps: int) -> None:
+        """Moves steps places along SPEEDS, staying within its ends"""
+        try:
+            index = SPEEDS.index(self.moves_per_second)
+        except ValueError:
+            index = len(SPEEDS) - 1
+        index = min(max(index + steps, 0), len(SPEEDS) - 1)
+        self.moves_per_second = SPEEDS[index]
+
+    def step(self) -> bool:
+        """
+        Plays one recommended move, waiting for the engine, and spawns a
+        tile. Stops auto-play when the game ends or the engine insists on a
+        move that does nothing. Returns whether the board changed.
+        """
+        if self._finished():
+            return False
+        return self._play(self._next_move(None))
+
+    def _finished(self) -> bool:
+        end_game = self.game.is_end_game()
+        if end_game:
+            self._finish("won" if end_game == 1 else "over")
+        return bool(end_game)
+
+    def _request(self) -> None:
+        self._pending = [list(row) for row in self.game.board]
+        self._requests.put(self._pending)
+
+    def _next_move(self, deadline):
+        """
+        Returns the engine's move for the current board, None if it does
+        not arrive by deadline (a self.clock() time, None waits for it)
+        """
+        if self._pending is None:
+            self._request()
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = max(deadline - self.clock(), 0.0)
+            try:
+                board, move, end, latency = self._results.get(timeout=timeout)
+            except queue.Empty:
+                return None
+            self._pending = None
+            if isinstance(move, Exception):
+                raise move
+            self._latencies.append((end, latency))
+            if board == self.game.board:
+                return move
+            # The board changed meanwhile, e.g. by a key press
+            self._request()
+
+    def _run(self) -> None:
+        while True:
+            board = self._requests.get()
+            if board is None:
+                return
+            start = self.clock()
+            try:
+                move = self.game.ai_engine.recommend_next_move(board)
+            except Exception as e:
+                LOG.exception("%s failed", self)
+                move = e
+            end = self.clock()
+            self._results.put((board, move, end, end - start))
+
+    def _play(self, move) -> bool:
+        game = self.game
+        if not getattr(game, f"move_{move}")():
+            self._finish("stalled")
+            return False
+        self.moves += 1
+        game.generate_tile()
+        # Same order as the window: a won but stuck board is game over
+        if game.is_game_over():
+            self._finish("over")
+        elif game.is_game_win():
+            self._finish("won")
+        return True
+
+    def advance(self, elapsed: float) -> int:
+        """
+        Applies the moves due after elapsed seconds.
+        Returns how many moves changed the board.
+        """
+        if not self.running:
+            return 0
+        if self.moves_per_second is UNLIMITED:
+            self._due = float("inf")
+        else:
+            # A long frame must not turn into a burst of catch-up moves
+            self._due = min(
+                self._due + elapsed * self.moves_per_second,
+                max(1.0, self.moves_per_second * self.frame_budget),
+            )
+
+        deadline = self.clock() + self.frame_budget
+        moves = 0
+        while self.running and self._due >= 1 and not self._finished():
+            move = self._next_move(deadline)
+            if move is None:
+                break  # still due, the engine is slower than a frame
+            self._due -= 1
+            moves += self._play(move)
+            if self.clock() >= deadline:
+                break
+        if self.running and self._pending is None and not self._finished():
+            # The engine works on the next move between frames
+            self._request()
+        if self.moves_per_second is UNLIMITED:
+            self._due = 0.0
+        self._frames.append((self.clock(), moves))
+        return moves
+
+    def _finish(self, result: str) -> None:
+        self.result = result
+        self.running = False
+
+    def _trim(self, samples: deque) -> None:
+        horizon = self.clock() - STATS_WINDOW
+        while samples and samples[0][0] < horizon:
+            samples.popleft()
+
+    @property
+    def rate(self) -> float:
+        """Moves per second actually played over the last STATS_WINDOW"""
+        self._trim(self._frames)
+        return sum(moves for _, moves in self._frames) / STATS_WINDOW
+
+    @property
+    def latency(self) -> float:
+        """Mean engine latency in seconds over the last STATS_WINDOW"""
+        self._trim(self._latencies)
+        if not self._latencies:
+            return 0.0
+        return sum(latency for _, latency in self._latencies) / len(
+            self._latencies
+        )
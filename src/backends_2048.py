@@ -0,0 +1,66 @@
+from src import bitboard_2048, packed_2048
+from src.bitboard_2048 import BitboardGame2048
+from src.game_2048 import Game2048
+from src.packed_2048 import PackedGame2048
+
+# Interchangeable Game2048 implementations, all playing a seed identically.
+# For many games at once see batch_game_2048 instead.
+BACKENDS = {
+    "list": Game2048,
+    "bitboard": BitboardGame2048,
+    "packed": PackedGame2048,
+}
+
+
+def _fits(values, max_exponent: int) -> bool:
+    for value in values:
+        exponent = value.bit_length() - 1
+        if value != 1 << exponent or not 1 <= exponent <= max_exponent:
+            return False
+    return True
+
+
+def select_backend(
+    grid_size=4, max_score=2048, numbers_to_be_generated=(2, 4)
+) -> str:
+    """
+    Returns the name of the fastest backend able to play a configuration:
+    bitboard for 4x4 boards up to 32768, packed for power of two tiles up
+    to 2**127 on any board, list (the reference) for everything else
+    """
+    values = (max_score, *numbers_to_be_generated)
+    if grid_size == bitboard_2048.BITBOARD_GRID_SIZE and _fits(
+        values, bitboard_2048.MAX_EXPONENT
+    ):
+        return "bitboard"
+    if _fits(values, packed_2048.MAX_EXPONENT):
+        return "packed"
+    return "list"
+
+
+def create_game(
+    grid_size=4,
+    max_score=2048,
+    numbers_to_be_generated=(2, 4),
+    backend=None,
+    **kwargs,
+) -> Game2048:
+    """
+    Creates a game with the named backend, or the one select_backend picks
+    """
+    if backend is None:
+        backend = select_backend(
+            grid_size, max_score, numbers_to_be_generated
+        )
+    try:
+        game_class = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(
+            f"Unknown backend {backend!r}, choose from {', '.join(BACKENDS)}"
+        )
+    return game_class(
+        grid_size=grid_size,
+        max_score=max_score,
+        numbers_to_be_generated=numbers_to_be_generated,
+        **kwargs,
+    )
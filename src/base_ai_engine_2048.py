@@ -1,7 +1,31 @@
+import types
 from abc import ABC, abstractmethod
+from typing import NamedTuple
 from src.utils import Keys2048
 
 
+class Analysis(NamedTuple):
+    move: Keys2048
+    score: float  # None if the engine does not value positions
+    depth: int  # deepest search finished, None if the engine does not search
+
+
+def fingerprint(obj) -> str:
+    """
+    Fingerprint of an engine, or of a function or object it plays with
+    (e.g. an evaluate function): its fingerprint() if it has one, the
+    qualified name of functions, else its repr
+    """
+    if hasattr(obj, "fingerprint"):
+        return obj.fingerprint()
+    owner = getattr(obj, "__self__", None)
+    if owner is not None and not isinstance(owner, types.ModuleType):
+        return f"{fingerprint(owner)}.{obj.__name__}"
+    if hasattr(obj, "__qualname__"):
+        return f"{obj.__module__}.{obj.__qualname__}"
+    return repr(obj)
+
+
 class AIEngine2048(ABC):
     """
     Abstract Base Class for AI Engine's that could be injected into our 2048 class
@@ -14,3 +38,43 @@ class AIEngine2048(ABC):
     @abstractmethod
     def recommend_next_move(self, board) -> Keys2048:
         pass
+
+    def analyse(self, board) -> Analysis:
+        """
+        Like recommend_next_move, also returning the value and search depth
+        behind the move when the engine has them
+        """
+        return Analysis(self.recommend_next_move(board), None, None)
+
+    def recommend_batch(self, boards):
+        """
+        Recommendations for many boards at once, in order. Engines that can
+        evaluate boards together (e.g. as one NumPy array) override it.
+        """
+        return [self.recommend_next_move(board) for board in boards]
+
+    def iter_recommendations(self, board, should_stop=None):
+        """
+        Anytime search: yields progressively better moves for board (e.g.
+        one per iterative deepening depth) and returns early once
+        should_stop() is true. Engines without an anytime search yield
+        their single recommendation.
+        """
+        yield self.recommend_next_move(board)
+
+    def fingerprint(self) -> str:
+        """
+        Identifies everything that decides the engine's moves, e.g. to key
+        cached results on. Its repr by default; engines whose repr leaves
+        part of their configuration out extend it.
+        """
+        return repr(self)
+
+    def score_position(self, board, time_budget=None):
+        """
+        Optional: values of board with the player to move, one per search
+        depth (1, 2, ...) the engine finished within time_budget seconds (by
+        default the engine's own). Engines implementing it can be searched in
+        parallel at the root by ParallelAIEngine.
+        """
+        raise NotImplementedError
@@ -0,0 +1,218 @@
+import numpy as np
+from src.utils import Keys2048
+
+# Move codes used by the move vectors of BatchGame2048, -1 means "skip"
+MOVES = (Keys2048.LEFT, Keys2048.RIGHT, Keys2048.UP, Keys2048.DOWN)
+MOVE_CODES = {move: code for code, move in enumerate(MOVES)}
+NO_MOVE = -1
+
+
+def compress_left(boards):
+    """
+    Pushes the non zero tiles of every row to the left, keeping their order
+    """
+    # Tile k of a row lands on column k, every zero on a scratch column
+    non_zero = boards != 0
+    columns = np.where(
+        non_zero, np.cumsum(non_zero, axis=-1) - 1, boards.shape[-1]
+    )
+    compressed = np.zeros(
+        boards.shape[:-1] + (boards.shape[-1] + 1,), dtype=boards.dtype
+    )
+    np.put_along_axis(compressed, columns, boards, axis=-1)
+    return compressed[..., :-1]
+
+
+def slide_left(boards):
+    """
+    Slides every row of a (..., grid, grid) array to the left with the same
+    single-merge-per-pair rule as Game2048.slide_row_left.
+    Returns (new_boards, score) where score holds the merged tile sum of each
+    board.
+    """
+    new_boards = compress_left(boards)
+    score = np.zeros(boards.shape[:-2], dtype=boards.dtype)
+    for j in range(boards.shape[-1] - 1):
+        left, right = new_boards[..., j], new_boards[..., j + 1]
+        merge = (left == right) & (left != 0)
+        # The emptied neighbour can not merge again in the next step
+        left[merge] *= 2
+        right[merge] = 0
+        score += np.where(merge, left, 0).sum(axis=-1)
+    return compress_left(new_boards), score
+
+
+def orient(boards, move_code):
+    """
+    Rotates/flips boards so that move_code becomes a left slide
+    """
+    if move_code == 0:
+        return boards
+    if move_code == 1:
+        return boards[..., ::-1]
+    if move_code == 2:
+        return boards.swapaxes(-1, -2)
+    return boards[..., ::-1, :].swapaxes(-1, -2)
+
+
+def unorient(boards, move_code):
+    """
+    Inverse of orient
+    """
+    if move_code == 3:
+        return boards.swapaxes(-1, -2)[..., ::-1, :]
+    return orient(boards, move_code)
+
+
+def apply_moves(boards, moves):
+    """
+    Applies one move code per board.
+    Returns (new_boards, changed, score) without touching boards.
+    """
+    new_boards = boards.copy()
+    score = np.zeros(len(boards), dtype=boards.dtype)
+    for code in range(len(MOVES)):
+        selected = moves == code
+        if not selected.any():
+            continue
+        slid, gained = slide_left(orient(boards[selected], code))
+        new_boards[selected] = unorient(slid, code)
+        score[selected] = gained
+    changed = (new_boards != boards).any(axis=(-1, -2))
+    return new_boards, changed, score
+
+
+def afterstates(boards):
+    """
+    Every move of every board of a (N, grid, grid) array at once, without
+    touching boards. Returns (afterstates (N, 4, grid, grid), scores (N, 4),
+    legal move masks (N,)), bit k of a mask standing for MOVES[k].
+    """
+    n = len(boards)
+    new_boards = np.empty((n, len(MOVES)) + boards.shape[1:], boards.dtype)
+    scores = np.empty((n, len(MOVES)), boards.dtype)
+    for code in range(len(MOVES)):
+        slid, scores[:, code] = slide_left(orient(boards, code))
+        new_boards[:, code] = unorient(slid, code)
+    changed = (new_boards != boards[:, None]).any(axis=(-1, -2))
+    legal = changed @ (1 << np.arange(len(MOVES)))
+    return new_boards, scores, legal
+
+
+def game_over_mask(boards):
+    has_empty = (boards == 0).any(axis=(-1, -2))
+    has_pair = (boards[..., :, 1:] == boards[..., :, :-1]).any(
+        axis=(-1, -2)
+    ) | (boards[..., 1:, :] == boards[..., :-1, :]).any(axis=(-1, -2))
+    return ~(has_empty | has_pair)
+
+
+class BatchGame2048:
+    """
+    N games of 2048 stepped together, stored as one (N, grid, grid) array.
+    Mirrors the Game2048 API with vectors in place of scalars: every method
+    acts on all games at once, without a per game Python loop.
+    """
+
+    def __init__(
+        self,
+        n_games,
+        grid_size=4,
+        boards=None,
+        numbers_to_be_generated=(2, 4),
+        max_score=2048,
+        seed=None,
+    ):
+        self.n_games = n_games
+        self.grid_size = grid_size
+        self.boards = (
+            np.array(boards, dtype=np.int64)
+            if boards is not None
+            else np.zeros((n_games, grid_size, grid_size), dtype=np.int64)
+        )
+        if self.boards.shape != (n_games, grid_size, grid_size):
+            raise ValueError(
+                f"Expected boards of shape {(n_games, grid_size, grid_size)}"
+                f", got {self.boards.shape}"
+            )
+        self.numbers_to_be_generated = np.array(
+            numbers_to_be_generated, dtype=np.int64
+        )
+        self.max_score = max_score
+        self.rng = np.random.default_rng(seed)
+        self.scores = np.zeros(n_games, dtype=np.int64)
+        self._end_game = np.zeros(n_games, dtype=np.int8)
+
+    def __repr__(self):
+        size = f"{self.grid_size}x{self.grid_size}"
+        return f"BatchGame2048({self.n_games} games of {size})"
+
+    def is_end_game(self):
+        return self._end_game
+
+    def start_game(self):
+        """
+        Fills every board with a random number (1 to grid_size**2) of 2s at
+        random positions, like Game2048.start_game
+        """
+        cells = self.grid_size**2
+        self._end_game[:] = 0
+        self.scores[:] = 0
+        num_of_2s = self.rng.integers(1, cells + 1, size=(self.n_games, 1))
+        ranks = self.rng.random((self.n_games, cells)).argsort(axis=1)
+        self.boards = np.where(ranks < num_of_2s, 2, 0).reshape(
+            self.n_games, self.grid_size, self.grid_size
+        )
+
+    def generate_tile(self, mask=None) -> None:
+        """
+        Adds a random tile from numbers_to_be_generated on a random empty cell
+        of every board selected by mask (all boards by default)
+        """
+        flat = self.boards.reshape(self.n_games, -1)
+        empty = flat == 0
+        selected = empty.any(axis=1)
+        if mask is not None:
+            selected &= mask
+        keys = np.where(empty, self.rng.random(empty.shape), -1.0)
+        cells = keys.argmax(axis=1)
+        numbers = self.rng.choice(
+            self.numbers_to_be_generated, size=self.n_games
+        )
+        rows = np.flatnonzero(selected)
+        flat[rows, cells[rows]] = numbers[rows]
+        self.boards = flat.reshape(self.boards.shape)
+
+    def move(self, moves):
+        """
+        Applies one move code per game (see MOVES, NO_MOVE to skip a game).
+        Returns the mask of games whose board changed.
+        """
+        moves = np.asarray(moves)
+        self.boards, changed, score = apply_moves(self.boards, moves)
+        self.scores += score
+        return changed
+
+    def step(self, moves):
+        """
+        Moves every game still in play, spawns a tile on the boards that
+        changed and updates the end game states.
+        Returns the mask of games whose board changed.
+        """
+        moves = np.where(self._end_game == 0, moves, NO_MOVE)
+        changed = self.move(moves)
+        self.generate_tile(changed)
+        # Like main, a board that is both won and stuck counts as game over
+        self.is_game_win()
+        self.is_game_over()
+        return changed
+
+    def is_game_win(self):
+        won = (self.boards == self.max_score).any(axis=(1, 2))
+        self._end_game[won] = 1
+        return won
+
+    def is_game_over(self):
+        over = game_over_mask(self.boards)
+        self._end_game[over] = 2
+        return over
@@ -0,0 +1,361 @@
+from src import game_record_2048
+from src.afterstates_2048 import Afterstates
+from src.game_2048 import Game2048
+from src.utils import Keys2048
+from src.row_tables_2048 import (
+    MAX_EXPONENT,
+    NIBBLE_MASK,
+    ROW_MASK,
+    get_row_tables,
+)
+
+# A 4x4 board packed into a single 64-bit integer. Every cell holds the log2
+# of its tile value in a 4-bit nibble (0 for an empty cell, 1 for 2, ...,
+# 15 for 32768). Row i lives in bits [16 * i, 16 * i + 16) and column j of
+# that row in bits [4 * j, 4 * j + 4), so cell (i, j) is nibble 4 * i + j.
+
+BITBOARD_GRID_SIZE = 4
+MAX_TILE = 1 << MAX_EXPONENT
+
+
+def tile_to_exponent(value: int) -> int:
+    """
+    Converts a tile value (0, 2, 4, ..., 32768) into its nibble exponent
+    """
+    if value == 0:
+        return 0
+    exponent = value.bit_length() - 1
+    if value != 1 << exponent or not 1 <= exponent <= MAX_EXPONENT:
+        raise ValueError(f"Tile {value} can not be stored in a bitboard")
+    return exponent
+
+
+def exponent_to_tile(exponent: int) -> int:
+    return 1 << exponent if exponent else 0
+
+
+def to_bitboard(board) -> int:
+    """
+    Packs a 4x4 list of lists into a 64-bit bitboard
+    """
+    if len(board) != BITBOARD_GRID_SIZE or any(
+        len(row) != BITBOARD_GRID_SIZE for row in board
+    ):
+        raise ValueError("Bitboards only support 4x4 boards")
+
+    bitboard = 0
+    for i, row in enumerate(board):
+        for j, value in enumerate(row):
+            bitboard |= tile_to_exponent(value) << (4 * (4 * i + j))
+    return bitboard
+
+
+def from_bitboard(bitboard: int):
+    """
+    Unpacks a 64-bit bitboard into a fresh 4x4 list of lists
+    """
+    return [
+        [
+            exponent_to_tile((bitboard >> (4 * (4 * i + j))) & NIBBLE_MASK)
+            for j in range(BITBOARD_GRID_SIZE)
+        ]
+        for i in range(BITBOARD_GRID_SIZE)
+    ]
+
+
+def _move_rows(bitboard: int, row_table, score_table):
+    r0 = bitboard & ROW_MASK
+    r1 = (bitboard >> 16) & ROW_MASK
+    r2 = (bitboard >> 32) & ROW_MASK
+    r3 = (bitboard >> 48) & ROW_MASK
+    new_bitboard = (
+        row_table[r0]
+        | row_table[r1] << 16
+        | row_table[r2] << 32
+        | row_table[r3] << 48
+    )
+    return new_bitboard, (
+        score_table[r0] + score_table[r1] + score_table[r2] + score_table[r3]
+    )
+
+
+def transpose(bitboard: int) -> int:
+    """
+    Mirrors the board along its main diagonal, nibble (i, j) -> (j, i)
+    """
+    a1 = bitboard & 0xF0F00F0FF0F00F0F
+    a2 = bitboard & 0x0000F0F00000F0F0
+    a3 = bitboard & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+def move_left(bitboard: int):
+    """
+    Returns (new_bitboard, score) after sliding every row to the left
+    """
+    tables = get_row_tables()
+    return _move_rows(bitboard, tables.left, tables.score)
+
+
+def move_right(bitboard: int):
+    tables = get_row_tables()
+    return _move_rows(bitboard, tables.right, tables.score)
+
+
+def move_up(bitboard: int):
+    tables = get_row_tables()
+    new_bitboard, score = _move_rows(
+        transpose(bitboard), tables.left, tables.score
+    )
+    return transpose(new_bitboard), score
+
+
+def move_down(bitboard: int):
+    tables = get_row_tables()
+    new_bitboard, score = _move_rows(
+        transpose(bitboard), tables.right, tables.score
+    )
+    return transpose(new_bitboard), score
+
+
+MOVES = (
+    (Keys2048.LEFT, move_left),
+    (Keys2048.RIGHT, move_right),
+    (Keys2048.UP, move_up),
+    (Keys2048.DOWN, move_down),
+)
+
+
+def empty_mask(bitboard: int) -> int:
+    """
+    Returns a mask holding a single set bit (the nibble's lowest) for every
+    empty cell of the bitboard
+    """
+    x = bitboard | (bitboard >> 2)
+    x |= x >> 1
+    return ~x & 0x1111111111111111
+
+
+def count_empty(bitboard: int) -> int:
+    return empty_mask(bitboard).bit_count()
+
+
+def empty_cells(bitboard: int):
+    """
+    Lists the nibble indexes of the empty cells in row-major order
+    """
+    mask = empty_mask(bitboard)
+    cells = []
+    while mask:
+        low_bit = mask & -mask
+        cells.append((low_bit.bit_length() - 1) >> 2)
+        mask ^= low_bit
+    return cells
+
+
+def max_exponent(bitboard: int) -> int:
+    best = 0
+    while bitboard:
+        best = max(best, bitboard & NIBBLE_MASK)
+        bitboard >>= 4
+    return best
+
+
+def has_exponent(bitboard: int, exponent: int) -> bool:
+    while bitboard:
+        if bitboard & NIBBLE_MASK == exponent:
+            return True
+        bitboard >>= 4
+    return False
+
+
+def spawn_tile(bitboard: int, rng, numbers_to_be_generated=(2, 4)) -> int:
+    """
+    Places a random tile from numbers_to_be_generated on a random empty cell.
+    Draws from rng in the same order as Game2048.generate_tile, so both
+    representations stay in lockstep for a given random stream.
+    """
+    cells = empty_cells(bitboard)
+    if not cells:
+        return bitboard
+    cell = rng.choice(cells)
+    exponent = tile_to_exponent(rng.choice(numbers_to_be_generated))
+    return bitboard | exponent << (4 * cell)
+
+
+def afterstates(bitboard: int) -> Afterstates:
+    """
+    Every move of bitboard at once (see afterstates_2048), as bitboards.
+    Vertical moves share one transpose of the board.
+    """
+    tables = get_row_tables()
+    left, right, score = tables.left, tables.right, tables.score
+    transposed = transpose(bitboard)
+    new_left, left_score = _move_rows(bitboard, left, score)
+    new_right, right_score = _move_rows(bitboard, right, score)
+    new_up, up_score = _move_rows(transposed, left, score)
+    new_down, down_score = _move_rows(transposed, right, score)
+    return Afterstates(
+        (new_left, new_right, transpose(new_up), transpose(new_down)),
+        (left_score, right_score, up_score, down_score),
+        (new_left != bitboard)
+        | (new_right != bitboard) << 1
+        | (new_up != transposed) << 2
+        | (new_down != transposed) << 3,
+    )
+
+
+def legal_moves(bitboard: int) -> int:
+    """
+    Mask of the moves changing bitboard (see afterstates_2048.MOVES), from
+    row table lookups only
+    """
+    tables = get_row_tables()
+    changed_left, changed_right = tables.changed_left, tables.changed_right
+    mask = 0
+    for rows, shift in ((bitboard, 0), (transpose(bitboard), 2)):
+        for i in range(0, 64, 16):
+            row = (rows >> i) & ROW_MASK
+            mask |= (changed_left[row] | changed_right[row] << 1) << shift
+    return mask
+
+
+def is_game_over(bitboard: int) -> bool:
+    if empty_mask(bitboard):
+        return False
+    return (
+        move_left(bitboard)[0] == bitboard
+        and move_up(bitboard)[0] == bitboard
+    )
+
+
+class BitboardGame2048(Game2048):
+    """
+    Game2048 running on a 64-bit bitboard instead of a list of lists.
+    `board` is still readable and assignable as a list of lists, but every
+    read decodes a fresh copy, so write back through `board = ...` rather
+    than mutating cells in place.
+    """
+
+    def __init__(
+        self,
+        grid_size=BITBOARD_GRID_SIZE,
+        board=None,
+        numbers_to_be_generated=(2, 4),
+        max_score=2048,
+        ai_engine=None,
+        seed=None,
+        rng=None,
+    ):
+        if grid_size != BITBOARD_GRID_SIZE:
+            raise ValueError("Bitboards only support 4x4 boards")
+        for number in numbers_to_be_generated:
+            tile_to_exponent(number)
+        self._win_exponent = tile_to_exponent(max_score)
+        self.bitboard = 0
+        super().__init__(
+            grid_size=grid_size,
+            board=board,
+            numbers_to_be_generated=numbers_to_be_generated,
+            max_score=max_score,
+            ai_engine=ai_engine,
+            seed=seed,
+            rng=rng,
+        )
+
+    @property
+    def board(self):
+        return from_bitboard(self.bitboard)
+
+    @board.setter
+    def board(self, board):
+        self.bitboard = to_bitboard(board)
+        self._start_history()
+
+    def generate_tile(self) -> None:
+        new_bitboard = spawn_tile(
+            self.bitboard, self.rng, self.numbers_to_be_generated
+        )
+        if new_bitboard != self.bitboard:
+            cell = ((new_bitboard ^ self.bitboard).bit_length() - 1) >> 2
+            exponent = (new_bitboard >> (4 * cell)) & NIBBLE_MASK
+            self.bitboard = new_bitboard
+            self._record_spawn(cell, exponent_to_tile(exponent))
+
+    def place_tile(self, x, y, value) -> None:
+        cell = x * BITBOARD_GRID_SIZE + y
+        self.bitboard = (
+            self.bitboard & ~(NIBBLE_MASK << (4 * cell))
+            | tile_to_exponent(value) << (4 * cell)
+        )
+        self._record_spawn(cell, value)
+
+    def _record_spawn(self, cell, value):
+        if not self._recording:
+            return
+        self.history.append(
+            game_record_2048.spawn_byte(
+                cell,
+                self.numbers_to_be_generated.index(value),
+                len(self.numbers_to_be_generated),
+            )
+        )
+
+    def is_game_win(self):
+        if has_exponent(self.bitboard, self._win_exponent):
+            self._end_game = 1
+            return True
+        return False
+
+    def is_game_over(self):
+        if is_game_over(self.bitboard):
+            self._end_game = 2
+            return True
+        return False
+
+    @property
+    def max_tile(self):
+        return exponent_to_tile(max_exponent(self.bitboard))
+
+    @property
+    def empty_count(self):
+        return count_empty(self.bitboard)
+
+    def _apply(self, move_key, move):
+        if self._recording:
+            self.history.append(game_record_2048.move_byte(move_key))
+        new_bitboard, score = move(self.bitboard)
+        is_changed = new_bitboard != self.bitboard
+        self.bitboard = new_bitboard
+        self.score += score
+        return is_changed
+
+    def move_left(self):
+        return self._apply(Keys2048.LEFT, move_left)
+
+    def move_right(self):
+        return self._apply(Keys2048.RIGHT, move_right)
+
+    def move_up(self):
+        return self._apply(Keys2048.UP, move_up)
+
+    def move_down(self):
+        return self._apply(Keys2048.DOWN, move_down)
+
+    def _transpose(self):
+        self.bitboard = transpose(self.bitboard)
+
+    def afterstates(self):
+        bitboards, scores, legal = afterstates(self.bitboard)
+        return Afterstates(
+            tuple(from_bitboard(bitboard) for bitboard in bitboards),
+            scores,
+            legal,
+        )
+
+    def legal_moves(self) -> int:
+        return legal_moves(self.bitboard)
@@ -0,0 +1,237 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from src.base_ai_engine_2048 import AIEngine2048, Analysis, fingerprint
+from src.symmetry_2048 import IDENTITY, canonical_board, move_from_canonical
+from src.utils import Keys2048
+
+LOG = logging.getLogger(__name__)
+
+CACHE_ENV_VAR = "ZACKS_2048_RECOMMENDATION_CACHE"
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "zacks_2048", "recommendations.sqlite"
+)
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS recommendations (
+        engine TEXT NOT NULL,
+        board BLOB NOT NULL,
+        move TEXT NOT NULL,
+        score REAL,
+        depth INTEGER,
+        added REAL NOT NULL,
+        PRIMARY KEY (engine, board)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS recommendations_added "
+    "ON recommendations (added)",
+)
+
+
+def board_key(board) -> bytes:
+    """One byte per cell holding the log2 of its tile, 0 for empty"""
+    key = bytearray()
+    for row in board:
+        for value in row:
+            if value & (value - 1) or value < 0:
+                raise ValueError(f"{value} is not a power of two tile")
+            key.append(value.bit_length() - 1 if value else 0)
+    return bytes(key)
+
+
+class CachedAIEngine(AIEngine2048):
+    """
+    Wraps an engine with a persistent cache of its analyses, kept in an
+    sqlite file that any number of processes can read at once while one
+    at a time writes (WAL journal). Entries are keyed by board and by a
+    namespace, by default the wrapped engine's fingerprint(), so
+    differently configured engines never share results. Pass namespace
+    when something else decides the engine's moves, e.g. a weights file.
+
+    The file keeps about max_entries entries, evicting the oldest first
+    (the count is checked every max_entries / 100 inserts). The
+    warm_start most recently added entries of the engine are loaded into
+    memory at construction, and up to that many recently used ones stay
+    there. With canonical, the 8 rotations and reflections of a board share
+    one entry; only use it with engines that play symmetric boards
+    symmetrically.
+    """
+
+    def __init__(
+        self,
+        engine: AIEngine2048,
+        path: str = None,
+        max_entries=1_000_000,
+        warm_start=10_000,
+        canonical=False,
+        namespace: str = None,
+    ):
+        self.engine = engine
+        self.path = path or os.environ.get(CACHE_ENV_VAR) or DEFAULT_CACHE_PATH
+        self.max_entries = max_entries
+        self.warm_start = warm_start
+        self.canonical = canonical
+        self.namespace = namespace or fingerprint(engine)
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+        # Counting rows is a table scan, only do it every so many inserts
+        self._check_every = max(1, max_entries // 100)
+        self._inserts = 0
+        self._load_warm_start()
+
+    def __repr__(self):
+        return f"Cached {self.engine}"
+
+    def __getstate__(self):
+        # Connections do not survive pickling, or forking
+        state = self.__dict__.copy()
+        state.update(_connection=None, _pid=None, _lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with connection:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+    def _load_warm_start(self):
+        if not self.warm_start:
+            return
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT board, move, score, depth FROM recommendations "
+                "WHERE engine = ? ORDER BY added DESC LIMIT ?",
+                (self.namespace, self.warm_start),
+            )
+            # Oldest first, so the newest are the last to be forgotten
+            for key, move, score, depth in reversed(rows.fetchall()):
+                self._memory[key] = Analysis(Keys2048(move), score, depth)
+        LOG.debug("%s warm started with %d entries", self, len(self._memory))
+
+    def count(self) -> int:
+        """Entries stored for the wrapped engine"""
+        with self._lock:
+            (count,) = (
+                self._connect()
+                .execute(
+                    "SELECT COUNT(*) FROM recommendations WHERE engine = ?",
+                    (self.namespace,),
+                )
+                .fetchone()
+            )
+        return count
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def recommend_next_move(self, board) -> Keys2048:
+        return self.analyse(board).move
+
+    def analyse(self, board) -> Analysis:
+        if self.canonical:
+            key_board, transform = canonical_board(board)
+        else:
+            key_board, transform = board, IDENTITY
+        key = board_key(key_board)
+
+        analysis = self._get(key)
+        if analysis is None:
+            self.misses += 1
+            analysis = self.engine.analyse(key_board)
+            self._put(key, analysis)
+        else:
+            self.hits += 1
+        return analysis._replace(
+            move=move_from_canonical(analysis.move, transform)
+        )
+
+    def _remember(self, key: bytes, analysis: Analysis) -> None:
+        self._memory[key] = analysis
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.warm_start:
+            self._memory.popitem(last=False)
+
+    def _get(self, key: bytes):
+        with self._lock:
+            analysis = self._memory.get(key)
+            if analysis is not None:
+                self._memory.move_to_end(key)
+                return analysis
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT move, score, depth FROM recommendations "
+                    "WHERE engine = ? AND board = ?",
+                    (self.namespace, key),
+                )
+                .fetchone()
+            )
+            if row is None:
+                return None
+            analysis = Analysis(Keys2048(row[0]), row[1], row[2])
+            self._remember(key, analysis)
+            return analysis
+
+    def _put(self, key: bytes, analysis: Analysis) -> None:
+        with self._lock:
+            self._remember(key, analysis)
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO recommendations "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        self.namespace,
+                        key,
+                        str(analysis.move),
+                        analysis.score,
+                        analysis.depth,
+                        time.time(),
+                    ),
+                )
+            self._inserts += 1
+            if self._inserts % self._check_every == 0:
+                self._evict(connection)
+
+    def _evict(self, connection) -> None:
+        (count,) = connection.execute(
+            "SELECT COUNT(*) FROM recommendations"
+        ).fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        with connection:
+            connection.execute(
+                "DELETE FROM recommendations WHERE rowid IN ("
+                "SELECT rowid FROM recommendations ORDER BY added LIMIT ?)",
+                (excess,),
+            )
+        LOG.debug("%s evicted %d entries", self, excess)
@@ -0,0 +1,28 @@
+import importlib
+from src.base_ai_engine_2048 import AIEngine2048
+
+# Engines selectable by name from the command line tools, as module and
+# class names: engine modules (and numpy, for some) are only imported once
+# an engine is created
+ENGINES = {
+    "zack": ("src.zack_ai_engine_2048", "ZackAIEngine"),
+    "expectimax": ("src.expectimax_ai_engine_2048", "ExpectimaxAIEngine"),
+    "ntuple": ("src.ntuple_ai_engine_2048", "NTupleAIEngine"),
+    "montecarlo": ("src.monte_carlo_ai_engine_2048", "MonteCarloAIEngine"),
+    "heuristic": ("src.heuristics_2048", "HeuristicAIEngine"),
+}
+
+
+def engine_class(name: str) -> type:
+    """Imports and returns the class of the engine registered as name"""
+    try:
+        module_name, class_name = ENGINES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown engine {name!r}, choose from {', '.join(ENGINES)}"
+        )
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_engine(name: str, **kwargs) -> AIEngine2048:
+    return engine_class(name)(**kwargs)
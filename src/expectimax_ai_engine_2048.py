@@ -0,0 +1,256 @@
+import time
+from collections import OrderedDict
+from src.afterstates_2048 import MOVES
+from src.base_ai_engine_2048 import AIEngine2048, Analysis, fingerprint
+from src import bitboard_2048
+from src.symmetry_2048 import canonical_key
+from src.utils import Keys2048
+
+CORNER_SHIFTS = (0, 12, 48, 60)
+
+
+def evaluate_board(bitboard: int) -> float:
+    """
+    Default leaf evaluation: rewards empty cells and keeping the largest tile
+    in a corner
+    """
+    corner_bonus = 0
+    max_exponent = bitboard_2048.max_exponent(bitboard)
+    for shift in CORNER_SHIFTS:
+        if (bitboard >> shift) & bitboard_2048.NIBBLE_MASK == max_exponent:
+            corner_bonus = 1 << max_exponent
+            break
+    return 64 * bitboard_2048.count_empty(bitboard) + corner_bonus
+
+
+class TranspositionTable:
+    """
+    Bounded memo of evaluated positions, evicting the least recently used
+    entry once maxsize is reached
+    """
+
+    def __init__(self, maxsize=1_000_000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class _SearchTimeout(Exception):
+    pass
+
+
+def _past(deadline: float):
+    """Returns a stop callback that turns true once deadline has passed"""
+
+    def stop():
+        return time.perf_counter() > deadline
+
+    return stop
+
+
+class ExpectimaxAIEngine(AIEngine2048):
+    """
+    Depth-limited expectimax over 4x4 bitboards. Max nodes pick a move, chance
+    nodes average over every empty cell and every number in
+    numbers_to_be_generated (both uniform, like Game2048.generate_tile).
+    Search is iteratively deepened up to max_depth and stops at the deepest
+    depth finished within time_budget seconds. Chance branches reached with
+    a probability below min_probability are evaluated instead of expanded.
+    With symmetric_table, rotations and reflections of a position share one
+    transposition table entry; evaluate must then value them all the same,
+    as evaluate_board does. The table is not locked, threads searching at
+    the same time need an engine each.
+    """
+
+    def __init__(
+        self,
+        max_depth=3,
+        time_budget=0.1,
+        min_probability=1e-4,
+        table_size=1_000_000,
+        numbers_to_be_generated=(2, 4),
+        evaluate=evaluate_board,
+        symmetric_table=False,
+    ):
+        self.max_depth = max_depth
+        self.time_budget = time_budget
+        self.min_probability = min_probability
+        self.numbers_to_be_generated = numbers_to_be_generated
+        self.evaluate = evaluate
+        self.table = TranspositionTable(table_size)
+        self.symmetric_table = symmetric_table
+        self._spawn_exponents = [
+            bitboard_2048.tile_to_exponent(number)
+            for number in numbers_to_be_generated
+        ]
+
+    def __repr__(self):
+        return (
+            f"Expectimax AI Engine (depth {self.max_depth}, "
+            f"{self.time_budget}s budget)"
+        )
+
+    def fingerprint(self) -> str:
+        return (
+            f"{self!r} min_probability={self.min_probability!r} "
+            f"numbers={self.numbers_to_be_generated!r} "
+            f"evaluate={fingerprint(self.evaluate)}"
+        )
+
+    def recommend_next_move(self, board) -> Keys2048:
+        """
+        Returns the best move for board, or Keys2048.LEFT if no move is legal
+        """
+        return self.analyse(board).move
+
+    def analyse(self, board) -> Analysis:
+        """
+        Returns the best move for board with its value at the deepest depth
+        finished, (Keys2048.LEFT, None, 0) if no move is legal
+        """
+        bitboard = bitboard_2048.to_bitboard(board)
+        deadline = time.perf_counter() + self.time_budget
+        best = Analysis(Keys2048.LEFT, None, 0)
+        # Depth 1 always completes so there is a recommendation to return
+        stop = None
+        for depth in range(1, self.max_depth + 1):
+            try:
+                move, value = self._search(bitboard, depth, stop)
+            except _SearchTimeout:
+                break
+            if move is None:
+                break
+            best = Analysis(move, value, depth)
+            stop = _past(deadline)
+        return best
+
+    def iter_recommendations(self, board, should_stop=None):
+        """
+        Yields the best move of every depth up to max_depth in turn, without
+        a time budget, until should_stop() turns true
+        """
+        bitboard = bitboard_2048.to_bitboard(board)
+        for depth in range(1, self.max_depth + 1):
+            try:
+                move = self._search(bitboard, depth, should_stop)[0]
+            except _SearchTimeout:
+                return
+            if move is None:
+                return
+            yield move
+
+    def score_position(self, board, time_budget=None):
+        """
+        Returns the values of board (player to move) for every depth up to
+        max_depth finished within time_budget (self.time_budget if None),
+        depth 1 always included
+        """
+        bitboard = bitboard_2048.to_bitboard(board)
+        if time_budget is None:
+            time_budget = self.time_budget
+        deadline = time.perf_counter() + time_budget
+        values = []
+        stop = None
+        for depth in range(1, self.max_depth + 1):
+            try:
+                values.append(self._max_node(bitboard, depth, 1.0, stop))
+            except _SearchTimeout:
+                break
+            stop = _past(deadline)
+        return values
+
+    def search(self, bitboard: int, depth: int):
+        """
+        Returns the best root move for a fixed depth, None if none is legal
+        """
+        return self._search(bitboard, depth)[0]
+
+    def _search(self, bitboard: int, depth: int, stop=None):
+        best_move, best_value = None, float("-inf")
+        bitboards, scores, legal = bitboard_2048.afterstates(bitboard)
+        for k, move_key in enumerate(MOVES):
+            if not legal >> k & 1:
+                continue
+            value = scores[k] + self._chance_node(
+                bitboards[k], depth, 1.0, stop
+            )
+            if value > best_value:
+                best_move, best_value = move_key, value
+        return best_move, best_value
+
+    def _max_node(
+        self, bitboard: int, depth: int, probability: float, stop=None
+    ):
+        best_value = None
+        bitboards, scores, legal = bitboard_2048.afterstates(bitboard)
+        for k in range(len(MOVES)):
+            if not legal >> k & 1:
+                continue
+            value = scores[k] + self._chance_node(
+                bitboards[k], depth, probability, stop
+            )
+            if best_value is None or value > best_value:
+                best_value = value
+        # No legal move, the game is over here
+        return best_value if best_value is not None else 0.0
+
+    def _chance_node(
+        self, bitboard: int, depth: int, probability: float, stop=None
+    ):
+        if depth <= 1 or probability < self.min_probability:
+            return self.evaluate(bitboard)
+
+        if self.symmetric_table:
+            key = (canonical_key(bitboard), depth)
+        else:
+            key = (bitboard, depth)
+        value = self.table.get(key)
+        if value is not None:
+            return value
+        if stop is not None and stop():
+            raise _SearchTimeout
+
+        cells = bitboard_2048.empty_cells(bitboard)
+        if not cells:
+            return self.evaluate(bitboard)
+        outcomes = len(cells) * len(self._spawn_exponents)
+        branch_probability = probability / outcomes
+        total = 0.0
+        for cell in cells:
+            for exponent in self._spawn_exponents:
+                total += self._max_node(
+                    bitboard | exponent << (4 * cell),
+                    depth - 1,
+                    branch_probability,
+                    stop,
+                )
+        value = total / outcomes
+        self.table.put(key, value)
+        return value
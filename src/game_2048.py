@@ -1,5 +1,7 @@
 import random
+from src import afterstates_2048
 from src.base_ai_engine_2048 import AIEngine2048
+from src import game_record_2048
 from src.utils import Keys2048
 import logging
 
@@ -14,140 +16,258 @@ class Game2048:
         numbers_to_be_generated=(2, 4),
         max_score=2048,
         ai_engine: AIEngine2048 = None,
+        seed=None,
+        rng: random.Random = None,
     ):
+        """
+        Every game draws its tiles from its own random stream: rng if given,
+        otherwise a random.Random(seed). Games created with the same seed
+        play out identically regardless of other games or the global
+        random module.
+        Every move and spawn since the board was last assigned is kept in
+        history, one byte each (see game_record_2048).
+        """
         self.grid_size = grid_size
+        self.seed = seed
+        self.rng = rng if rng is not None else random.Random(seed)
+        self.numbers_to_be_generated = numbers_to_be_generated
+        self.max_score = max_score
         self.board = (
             board if board else [[0] * grid_size for _ in range(grid_size)]
         )
-        self.numbers_to_be_generated = numbers_to_be_generated
-        self.max_score = max_score
+        self.score = 0
         self._end_game = 0
 
         if ai_engine:
             self.ai_engine = ai_engine
-            LOG.info(f"AI Engine deployed : {self.ai_engine}")
+            LOG.info("AI Engine deployed : %s", self.ai_engine)
 
     def __repr__(self):
         return f"{self.board}"
 
+    @property
+    def board(self):
+        return self._board
+
+    @board.setter
+    def board(self, board):
+        # Assigning a board copies and rescans it once; from then on moves
+        # and spawns keep the derived state up to date cell by cell. Cells
+        # edited in place from outside are not tracked, assign a new board
+        # instead.
+        self._board = [list(row) for row in board]
+        self._reset_state()
+        self._start_history()
+
+    def _start_history(self):
+        self.initial_board = [list(row) for row in self.board]
+        self.history = bytearray()
+        # Spawns on very large boards do not fit a byte, nothing is recorded
+        self._recording = (
+            self.grid_size**2 * len(self.numbers_to_be_generated)
+            <= game_record_2048.MAX_SPAWN_BYTES
+        )
+        if self._recording:
+            try:
+                game_record_2048.check_recordable(
+                    self.grid_size,
+                    self.max_score,
+                    self.numbers_to_be_generated,
+                    self.seed,
+                    self.initial_board,
+                )
+            except ValueError as e:
+                LOG.warning("Not recording the game: %s", e)
+                self._recording = False
+
+    def _reset_state(self):
+        board = self._board
+        self._empty_count = sum(row.count(0) for row in board)
+        self._max_tile = max(max(row) for row in board) if board else 0
+        self._win_tiles = sum(row.count(self.max_score) for row in board)
+        self._pairs = None
+
+    @property
+    def _equal_pairs(self) -> int:
+        """
+        Adjacent equal tiles, counted once per board and only when asked:
+        is_game_over only needs them once the board is full
+        """
+        if self._pairs is None:
+            board = self._board
+            columns = list(zip(*board))
+            self._pairs = sum(
+                a == b and a != 0
+                for lines in (board, columns)
+                for line in lines
+                for a, b in zip(line, line[1:])
+            )
+        return self._pairs
+
+    @property
+    def max_tile(self):
+        return self._max_tile
+
+    @property
+    def empty_count(self):
+        return self._empty_count
+
     def is_end_game(self):
         return self._end_game
 
     def recommend_next_move(self) -> Keys2048:
         move = self.ai_engine.recommend_next_move(self.board)
-        LOG.info(f"{self.ai_engine} recommends {move}")
+        LOG.debug("%s recommends %s", self.ai_engine, move)
         return move
 
     def generate_tile(self) -> None:
         """
-        Adds a random tile on the board, at '0' locations, from possible numbers_to_be_generated
+        Adds a random tile on the board, at '0' locations, from possible
+        numbers_to_be_generated
         """
-        empty_cells = [
-            (i, j)
-            for i in range(self.grid_size)
-            for j in range(self.grid_size)
-            if self.board[i][j] == 0
-        ]
-        if empty_cells:
-            generated_coordinate = random.choice(empty_cells)
-            num_generated = random.choice(self.numbers_to_be_generated)
-            x, y = generated_coordinate[0], generated_coordinate[1]
-            self.board[x][y] = num_generated
+        if not self._empty_count:
+            return
+        # Row-major order and the same draw as rng.choice, so a seed spawns
+        # the same tiles as on every other backend. Counting the empty cells
+        # of each row finds the cell drawn without listing them all.
+        index = self.rng.randrange(self._empty_count)
+        num_generated = self.rng.choice(self.numbers_to_be_generated)
+        for x, row in enumerate(self._board):
+            empty = row.count(0)
+            if index < empty:
+                break
+            index -= empty
+        y = row.index(0)
+        for _ in range(index):
+            y = row.index(0, y + 1)
+        self.place_tile(x, y, num_generated)
+
+    def place_tile(self, x, y, value) -> None:
+        """
+        Spawns value (one of numbers_to_be_generated) at (x, y), as
+        generate_tile would
+        """
+        row = self._board[x]
+        old = row[y]
+        row[y] = value
+        self._empty_count += (value == 0) - (old == 0)
+        self._win_tiles += (value == self.max_score) - (old == self.max_score)
+        if value > self._max_tile:
+            self._max_tile = value
+        self._pairs = None
+        if self._recording:
+            self.history.append(
+                game_record_2048.spawn_byte(
+                    x * self.grid_size + y,
+                    self.numbers_to_be_generated.index(value),
+                    len(self.numbers_to_be_generated),
+                )
+            )
 
     def start_game(self):
         self._end_game = 0
-        self.board = [[0] * self.grid_size for _ in range(self.grid_size)]
+        self.score = 0
+        board = [[0] * self.grid_size for _ in range(self.grid_size)]
 
-        num_of_2s = random.randint(1, self.grid_size**2)
+        num_of_2s = self.rng.randint(1, self.grid_size**2)
         coordinates = [
             (i, j)
             for i in range(self.grid_size)
             for j in range(self.grid_size)
         ]
 
-        starting_twos = random.sample(coordinates, num_of_2s)
+        starting_twos = self.rng.sample(coordinates, num_of_2s)
         for x, y in starting_twos:  # coo stands for coordinate
-            self.board[x][y] = 2
+            board[x][y] = 2
+        self.board = board
 
     def is_game_win(self):
-        if any(
-            v == self.max_score
-            for board_list in self.board
-            for v in board_list
-        ):
+        if self._win_tiles:
             self._end_game = 1
             return True
         else:
             return False
 
     def is_game_over(self):
-        for i in range(self.grid_size):
-            for j in range(self.grid_size):
-                if self.board[i][j] == 0:
-                    return (
-                        False  # early termination if there are any empty cells
-                    )
-
-        # check horizontal game over
-        for i in range(self.grid_size):
-            for j in range(self.grid_size - 1):
-                if self.board[i][j] == self.board[i][j + 1]:
-                    return False
-
-        # check vertical game over
-        for i in range(self.grid_size - 1):
-            for j in range(self.grid_size):
-                if self.board[i][j] == self.board[i + 1][j]:
-                    return False
+        # Any empty cell or pair of equal neighbours still leaves a move
+        if self._empty_count or self._equal_pairs:
+            return False
         self._end_game = 2
         return True
 
     def slide_row_left(self, row):
-        # [2,2,0,0] -> [4,0,0,0]
-        # Transformation : [2,2] -> [4] -> [4,0,0,0]
-
-        new_row = [num for num in row if num != 0]
-
-        i = 0
-        while i < len(new_row) - 1:
-            if new_row[i] == new_row[i + 1]:
-                new_row[i] = new_row[i] * 2
-                new_row.pop(i + 1)
-                new_row.append(0)
-                i += 1
-            else:
-                i += 1
-        new_row.extend([0] * (self.grid_size - len(new_row)))
-        return new_row
+        return self._slide_row_left_with_score(row)[0]
 
-    def move_left(self):
-        new_board = [self.slide_row_left(row) for row in self.board]
-        is_changed = new_board != self.board
-        self.board = new_board
+    def _slide_row_left_with_score(self, row):
+        return afterstates_2048.slide_row_left_with_score(row)
+
+    def afterstates(self) -> afterstates_2048.Afterstates:
+        """
+        The board and score of every move and the mask of the legal ones,
+        leaving the game untouched
+        """
+        return afterstates_2048.afterstates(self.board)
+
+    def legal_moves(self) -> int:
+        """
+        Mask of the moves that would change the board, bit k for
+        afterstates_2048.MOVES[k]
+        """
+        return afterstates_2048.legal_moves(self.board)
+
+    def _move(self, move, to_left, columns):
+        if self._recording:
+            self.history.append(game_record_2048.move_byte(move))
+        # Lines are looked up as tuples in the line cache, which also holds
+        # what each slide does to the empty cells and max tile, so the
+        # counters update once per line
+        cache = afterstates_2048.line_cache(to_left)
+        lines = zip(*self._board) if columns else map(tuple, self._board)
+        max_score = self.max_score
+        new_lines = []
+        is_changed = False
+        for line in lines:
+            slide = cache.get(line)
+            if slide is None:
+                slide = afterstates_2048.cache_line(cache, line, to_left)
+            new_line, score, changed, empty_gained, max_tile = slide
+            new_lines.append(new_line)
+            if not changed:
+                continue
+            is_changed = True
+            self.score += score
+            self._empty_count += empty_gained
+            if max_tile > self._max_tile:
+                self._max_tile = max_tile
+            if max_tile >= max_score:
+                self._win_tiles += new_line.count(max_score) - line.count(
+                    max_score
+                )
+        if is_changed:
+            if columns:
+                new_lines = zip(*new_lines)
+            self._board = [list(line) for line in new_lines]
+            self._pairs = None
         return is_changed
 
+    def move_left(self):
+        return self._move(Keys2048.LEFT, to_left=True, columns=False)
+
     def move_right(self):
-        flipped_board = [row[::-1] for row in self.board]
-        new_board = [self.slide_row_left(row)[::-1] for row in flipped_board]
-        is_changed = new_board != self.board
-        self.board = new_board
-        return is_changed
+        return self._move(Keys2048.RIGHT, to_left=False, columns=False)
 
-    def transpose(self):
+    def _transpose(self):
+        # Not a move, history can not record it so a replay would differ
         new_board = [[0] * self.grid_size for _ in range(self.grid_size)]
         for i in range(self.grid_size):
             for j in range(self.grid_size):
                 new_board[j][i] = self.board[i][j]
-        self.board = new_board
+        # Every counter is symmetric
+        self._board = new_board
 
     def move_up(self):
-        self.transpose()
-        is_changed = self.move_left()
-        self.transpose()
-        return is_changed
+        # Columns are slid directly, so no transpose round trip
+        return self._move(Keys2048.UP, to_left=True, columns=True)
 
     def move_down(self):
-        self.transpose()
-        is_changed = self.move_right()
-        self.transpose()
-        return is_changed
+        return self._move(Keys2048.DOWN, to_left=False, columns=True)
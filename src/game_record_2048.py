@@ -0,0 +1,220 @@
+import mmap
+import struct
+from typing import NamedTuple
+from src.utils import Keys2048
+
+# A record file is a sequence of games, each one laid out as
+#
+#   header  magic, version, grid size, config, seed and the starting board
+#   events  one byte per event:
+#             0x80 | move code            a move (codes follow MOVES)
+#             cell * len(numbers) + k     a spawn of numbers[k] on cell
+#                                         (row-major cell index)
+#   0xFF    end of game
+#
+# so spawn bytes have to stay below 0x80, i.e. grid_size**2 times the number
+# of spawnable values must not exceed 128 (an 8x8 board spawning 2 or 4).
+
+MAGIC = b"Z48R"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBBIq")  # magic, version, grid, n, flags, ...
+HAS_SEED = 0x01
+MOVE_FLAG = 0x80
+END_OF_GAME = 0xFF
+MAX_SPAWN_BYTES = 0x80
+
+MOVES = (Keys2048.LEFT, Keys2048.RIGHT, Keys2048.UP, Keys2048.DOWN)
+MOVE_CODES = {move: code for code, move in enumerate(MOVES)}
+
+
+class GameRecord(NamedTuple):
+    grid_size: int
+    max_score: int
+    numbers_to_be_generated: tuple
+    seed: int  # None if the game was not created from a seed
+    initial_board: list
+    events: bytes
+
+
+class Move(NamedTuple):
+    move: Keys2048
+
+
+class Spawn(NamedTuple):
+    x: int
+    y: int
+    value: int
+
+
+def move_byte(move: Keys2048) -> int:
+    return MOVE_FLAG | MOVE_CODES[move]
+
+
+def spawn_byte(cell: int, number_index: int, n_numbers: int) -> int:
+    return cell * n_numbers + number_index
+
+
+def check_spawn_range(grid_size: int, n_numbers: int) -> None:
+    if grid_size**2 * n_numbers > MAX_SPAWN_BYTES:
+        raise ValueError(
+            f"A {grid_size}x{grid_size} board spawning {n_numbers} numbers "
+            "does not fit one byte per spawn"
+        )
+
+
+def _tile_exponent(value: int) -> int:
+    if value == 0:
+        return 0
+    exponent = value.bit_length() - 1
+    if value != 1 << exponent or not 1 <= exponent < END_OF_GAME:
+        raise ValueError(f"Tile {value} can not be recorded")
+    return exponent
+
+
+def check_recordable(
+    grid_size, max_score, numbers_to_be_generated, seed, initial_board
+) -> None:
+    """
+    Raises ValueError if a game of this configuration, seed and starting
+    board does not fit the record format
+    """
+    check_spawn_range(grid_size, len(numbers_to_be_generated))
+    if seed is not None and (
+        not isinstance(seed, int) or not -(2**63) <= seed < 2**63
+    ):
+        raise ValueError(f"Seed {seed!r} is not a 64-bit integer")
+    for value in (max_score, *numbers_to_be_generated):
+        if not 0 <= value < 2**32:
+            raise ValueError(f"{value} does not fit 32 bits")
+    for row in initial_board:
+        for value in row:
+            _tile_exponent(value)
+
+
+def encode_header(
+    grid_size, max_score, numbers_to_be_generated, seed, initial_board
+) -> bytes:
+    check_recordable(
+        grid_size, max_score, numbers_to_be_generated, seed, initial_board
+    )
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        grid_size,
+        len(numbers_to_be_generated),
+        HAS_SEED if seed is not None else 0,
+        max_score,
+        seed if seed is not None else 0,
+    )
+    numbers = struct.pack(
+        f"<{len(numbers_to_be_generated)}I", *numbers_to_be_generated
+    )
+    board = bytes(
+        _tile_exponent(value) for row in initial_board for value in row
+    )
+    return header + numbers + board
+
+
+def write_game(f, game) -> None:
+    """
+    Appends the trajectory of a Game2048 to the binary file object f
+    """
+    f.write(
+        encode_header(
+            game.grid_size,
+            game.max_score,
+            game.numbers_to_be_generated,
+            game.seed,
+            game.initial_board,
+        )
+    )
+    f.write(game.history)
+    f.write(bytes((END_OF_GAME,)))
+
+
+def _parse_game(buffer, offset: int):
+    """
+    Parses the game starting at offset.
+    Returns (GameRecord, offset of the next game).
+    """
+    if len(buffer) - offset < HEADER.size:
+        raise ValueError(f"Game record at offset {offset} is truncated")
+    magic, version, grid_size, n_numbers, flags, max_score, seed = (
+        HEADER.unpack_from(buffer, offset)
+    )
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"No game record at offset {offset}")
+    offset += HEADER.size
+    if len(buffer) - offset < 4 * n_numbers + grid_size**2:
+        raise ValueError(f"Game record at offset {offset} is truncated")
+    numbers = struct.unpack_from(f"<{n_numbers}I", buffer, offset)
+    offset += 4 * n_numbers
+    cells = buffer[offset : offset + grid_size**2]
+    offset += grid_size**2
+    initial_board = [
+        [1 << e if e else 0 for e in cells[i : i + grid_size]]
+        for i in range(0, grid_size**2, grid_size)
+    ]
+
+    end = buffer.find(bytes((END_OF_GAME,)), offset)
+    if end < 0:
+        raise ValueError(f"Game record at offset {offset} is truncated")
+    record = GameRecord(
+        grid_size=grid_size,
+        max_score=max_score,
+        numbers_to_be_generated=numbers,
+        seed=seed if flags & HAS_SEED else None,
+        initial_board=initial_board,
+        events=buffer[offset:end],
+    )
+    return record, end + 1
+
+
+def read_games(path: str):
+    """
+    Streams the games of a record file through a memory map, so files far
+    larger than RAM can be scanned. Yields GameRecord.
+    """
+    with open(path, "rb") as f:
+        if not f.seek(0, 2):
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            offset = 0
+            while offset < len(buffer):
+                record, offset = _parse_game(buffer, offset)
+                yield record
+
+
+def iter_events(record: GameRecord):
+    """
+    Decodes the event bytes of a record, yielding Move and Spawn tuples
+    """
+    n_numbers = len(record.numbers_to_be_generated)
+    for byte in record.events:
+        if byte & MOVE_FLAG:
+            yield Move(MOVES[byte & ~MOVE_FLAG])
+        else:
+            cell, number_index = divmod(byte, n_numbers)
+            x, y = divmod(cell, record.grid_size)
+            yield Spawn(x, y, record.numbers_to_be_generated[number_index])
+
+
+def replay(record: GameRecord):
+    """
+    Rebuilds the Game2048 a record was written from by replaying its events
+    """
+    from src.game_2048 import Game2048
+
+    game = Game2048(
+        grid_size=record.grid_size,
+        board=record.initial_board,
+        numbers_to_be_generated=record.numbers_to_be_generated,
+        max_score=record.max_score,
+        seed=record.seed,
+    )
+    for event in iter_events(record):
+        if isinstance(event, Move):
+            getattr(game, f"move_{event.move}")()
+        else:
+            game.place_tile(event.x, event.y, event.value)
+    return game
@@ -0,0 +1,318 @@
+import argparse
+import csv
+import hashlib
+import inspect
+import json
+import logging
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import NamedTuple
+from src import game_record_2048
+from src.backends_2048 import BACKENDS, create_game
+from src.base_ai_engine_2048 import AIEngine2048, fingerprint
+from src.engines_2048 import ENGINES, create_engine, engine_class
+from src.game_2048 import Game2048
+from src.metrics_2048 import Metrics, instrument_engine, instrument_game
+
+LOG = logging.getLogger(__name__)
+
+
+class GameResult(NamedTuple):
+    game: int
+    seed: int
+    moves: int
+    score: int
+    max_tile: int
+    result: str  # "won", "over", "stalled" or "move_limit"
+
+
+def percentile(sorted_values, q):
+    """
+    Nearest-rank percentile of an already sorted list, q in [0, 100]
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def play_game(
+    game: Game2048, game_index: int, seed, max_moves: int, latencies
+) -> GameResult:
+    """
+    Plays one game to the end with the game's AI engine, appending every
+    engine call's latency (seconds) to latencies. seed is the one the game
+    was created with and is only recorded.
+    """
+    game.start_game()
+
+    moves = 0
+    result = "move_limit"
+    while moves < max_moves:
+        start = time.perf_counter()
+        move = game.ai_engine.recommend_next_move(game.board)
+        latencies.append(time.perf_counter() - start)
+
+        if not getattr(game, f"move_{move}")():
+            # The engine insists on a move that does nothing
+            result = "stalled"
+            break
+        moves += 1
+        game.generate_tile()
+        if game.is_game_over():
+            result = "over"
+            break
+        if game.is_game_win():
+            result = "won"
+            break
+
+    return GameResult(
+        game=game_index,
+        seed=seed,
+        moves=moves,
+        score=game.score,
+        max_tile=game.max_tile,
+        result=result,
+    )
+
+
+def run_simulation(
+    engine: AIEngine2048,
+    games: int,
+    grid_size=4,
+    max_score=2048,
+    seed=None,
+    max_moves=100_000,
+    record_file=None,
+    metrics: Metrics = None,
+    backend=None,
+):
+    """
+    Plays games one after another with engine, appending every game's
+    trajectory to the binary record_file if given and timing every game
+    call into metrics if given. backend names the game implementation,
+    by default the fastest one for the configuration.
+    Returns (results, latencies, elapsed seconds).
+    """
+    results = []
+    latencies = []
+    start = time.perf_counter()
+    for i in range(games):
+        game_seed = None if seed is None else seed + i
+        game = create_game(
+            grid_size=grid_size,
+            max_score=max_score,
+            backend=backend,
+            ai_engine=engine,
+            seed=game_seed,
+        )
+        if metrics is not None:
+            instrument_game(game, metrics)
+        results.append(play_game(game, i, game_seed, max_moves, latencies))
+        if record_file is not None:
+            game_record_2048.write_game(record_file, game)
+    return results, latencies, time.perf_counter() - start
+
+
+def summarize(results, latencies, elapsed) -> dict:
+    scores = sorted(result.score for result in results)
+    total_moves = sum(result.moves for result in results)
+    latencies = sorted(latencies)
+    return {
+        "games": len(results),
+        "moves": total_moves,
+        "elapsed_seconds": elapsed,
+        "games_per_second": len(results) / elapsed if elapsed else 0.0,
+        "moves_per_second": total_moves / elapsed if elapsed else 0.0,
+        "results": dict(Counter(result.result for result in results)),
+        "score": {
+            "min": scores[0] if scores else 0,
+            "mean": statistics.fmean(scores) if scores else 0.0,
+            "p50": percentile(scores, 50),
+            "p99": percentile(scores, 99),
+            "max": scores[-1] if scores else 0,
+        },
+        "max_tile": dict(
+            sorted(Counter(result.max_tile for result in results).items())
+        ),
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+        },
+    }
+
+
+def format_summary(summary: dict) -> str:
+    score = summary["score"]
+    latency = summary["latency_ms"]
+    tiles = ", ".join(
+        f"{tile}: {count}" for tile, count in summary["max_tile"].items()
+    )
+    results = ", ".join(
+        f"{result}: {count}" for result, count in summary["results"].items()
+    )
+    return "\n".join(
+        [
+            f"games       {summary['games']} in "
+            f"{summary['elapsed_seconds']:.2f}s "
+            f"({summary['games_per_second']:.2f} games/s)",
+            f"moves       {summary['moves']} "
+            f"({summary['moves_per_second']:.1f} moves/s)",
+            f"results     {results}",
+            f"score       min {score['min']} / mean {score['mean']:.1f} / "
+            f"p50 {score['p50']} / p99 {score['p99']} / max {score['max']}",
+            f"max tile    {tiles}",
+            f"latency     p50 {latency['p50']:.3f}ms / "
+            f"p99 {latency['p99']:.3f}ms",
+        ]
+    )
+
+
+def write_results(path: str, summary: dict, results) -> None:
+    """
+    Writes per game results to a .csv file, or the summary and per game
+    results to a .json file
+    """
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(GameResult._fields)
+            writer.writerows(results)
+    else:
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "summary": summary,
+                    "games": [result._asdict() for result in results],
+                },
+                f,
+                indent=2,
+            )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Plays 2048 games with an AI engine, without a window"
+    )
+    parser.add_argument("-n", "--games", type=int, default=10)
+    parser.add_argument(
+        "-e", "--engine", choices=sorted(ENGINES), default="expectimax"
+    )
+    parser.add_argument(
+        "--server",
+        nargs="?",
+        const="",
+        metavar="SOCKET",
+        help="ask a running zacks-2048-server instead of loading --engine",
+    )
+    parser.add_argument("--grid-size", type=int, default=4)
+    parser.add_argument("--max-score", type=int, default=2048)
+    parser.add_argument("--max-moves", type=int, default=100_000)
+    parser.add_argument(
+        "--backend",
+        choices=sorted(BACKENDS),
+        help="game implementation, the fastest one that fits by default",
+    )
+    parser.add_argument(
+        "--seed", type=int, help="seed of the first game, game i uses seed+i"
+    )
+    parser.add_argument("-o", "--output", help="write results to .json/.csv")
+    parser.add_argument(
+        "--record", help="append every game's moves and spawns to this file"
+    )
+    parser.add_argument(
+        "--metrics",
+        help="write call counts and latencies to .prom (Prometheus) or .json",
+    )
+    parser.add_argument(
+        "--cache", help="keep the engine's recommendations in this file"
+    )
+    parser.add_argument(
+        "--weights",
+        help="heuristic weights file from zacks-2048-tune-heuristic, for "
+        "the expectimax and heuristic engines",
+    )
+    parser.add_argument(
+        "--tablebase",
+        help="play the moves of this zacks-2048-tablebase file, asking the "
+        "engine for positions it does not hold",
+    )
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level)
+
+    # Only imported when asked for: sqlite3, asyncio and numpy are slow to
+    # import
+    if args.server is not None:
+        from src.server_2048 import RemoteAIEngine
+
+        engine = RemoteAIEngine(args.server or None)
+    elif args.weights:
+        from src.heuristics_2048 import Heuristic, load_weights
+
+        parameters = inspect.signature(engine_class(args.engine)).parameters
+        if "evaluate" not in parameters:
+            sys.exit(f"--weights does not apply to the {args.engine} engine")
+        engine = create_engine(
+            args.engine, evaluate=Heuristic(load_weights(args.weights))
+        )
+    else:
+        engine = create_engine(args.engine)
+    if args.cache:
+        from src.cached_ai_engine_2048 import CachedAIEngine
+
+        namespace = None
+        if args.weights:
+            with open(args.weights, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+            namespace = f"{fingerprint(engine)} weights {digest}"
+        engine = CachedAIEngine(engine, args.cache, namespace=namespace)
+    if args.tablebase:
+        from src.tablebase_2048 import TablebaseAIEngine
+
+        engine = TablebaseAIEngine(args.tablebase, fallback=engine)
+    metrics = None
+    if args.metrics:
+        metrics = Metrics()
+        instrument_engine(engine, metrics)
+    LOG.info("Simulating %d games with %s", args.games, engine)
+    record_file = open(args.record, "ab") if args.record else None
+    try:
+        results, latencies, elapsed = run_simulation(
+            engine,
+            args.games,
+            grid_size=args.grid_size,
+            max_score=args.max_score,
+            seed=args.seed,
+            max_moves=args.max_moves,
+            record_file=record_file,
+            metrics=metrics,
+            backend=args.backend,
+        )
+    finally:
+        if record_file is not None:
+            record_file.close()
+    summary = summarize(results, latencies, elapsed)
+    print(format_summary(summary))
+    playouts_per_second = getattr(engine, "playouts_per_second", None)
+    if playouts_per_second is not None:
+        print(f"playouts    {playouts_per_second:.0f}/s")
+    if args.output:
+        write_results(args.output, summary, results)
+    if metrics is not None:
+        with open(args.metrics, "w") as f:
+            if args.metrics.endswith(".prom"):
+                f.write(metrics.to_prometheus())
+            else:
+                f.write(metrics.to_json())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,426 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+import numpy as np
+from src import bitboard_2048
+from src.afterstates_2048 import MOVES
+from src.base_ai_engine_2048 import AIEngine2048, Analysis, fingerprint
+from src.batch_game_2048 import BatchGame2048, afterstates, compress_left
+from src.row_tables_2048 import NIBBLE_MASK, ROW_MASK
+from src.utils import Keys2048
+
+LOG = logging.getLogger(__name__)
+
+# Board features, all computed on tile exponents (0 for an empty cell) and
+# all the same for every rotation and reflection of a board:
+#
+#   empty         empty cells
+#   monotonicity  minus, for every row and column, the smaller of the
+#                 total rise and the total fall along it
+#   smoothness    minus the exponent gap between neighbouring tiles
+#   merges        pairs of equal tiles a slide would bring together
+#   corner        the largest exponent, if a corner holds it
+#
+# Every feature but corner is a sum over rows and columns, so 4x4 bitboards
+# are valued from two 65536 entry row tables.
+FEATURES = ("empty", "monotonicity", "smoothness", "merges", "corner")
+# Found by tune() with the cross entropy method (12 generations of 16, 48
+# games each), relative to merge scores
+DEFAULT_WEIGHTS = {
+    "empty": 21.5,
+    "monotonicity": 8.3,
+    "smoothness": 2.3,
+    "merges": 11.5,
+    "corner": 9.1,
+}
+METHODS = ("cem", "random")
+
+
+def exponents(boards):
+    """Tile exponents of an array of boards, 0 for empty cells"""
+    # frexp(2**e) is (0.5, e + 1)
+    return np.maximum(np.frexp(boards)[1] - 1, 0)
+
+
+def line_features(lines):
+    """
+    The row/column features of (..., length) exponent lines, as a
+    (..., len(FEATURES)) array with 0 for corner
+    """
+    diffs = np.diff(lines, axis=-1)
+    rises = np.maximum(diffs, 0).sum(axis=-1)
+    falls = np.maximum(-diffs, 0).sum(axis=-1)
+    neighbours = (lines[..., 1:] != 0) & (lines[..., :-1] != 0)
+    compressed = compress_left(lines)
+    pairs = (compressed[..., 1:] == compressed[..., :-1]) & (
+        compressed[..., 1:] != 0
+    )
+    return np.stack(
+        [
+            (lines == 0).sum(axis=-1),
+            -np.minimum(rises, falls),
+            -np.where(neighbours, np.abs(diffs), 0).sum(axis=-1),
+            pairs.sum(axis=-1),
+            np.zeros(lines.shape[:-1], dtype=lines.dtype),
+        ],
+        axis=-1,
+    )
+
+
+def board_features(boards):
+    """
+    Every feature of a (..., grid, grid) array of tile boards, as a
+    (..., len(FEATURES)) array
+    """
+    grid = exponents(boards)
+    features = line_features(grid).sum(axis=-2)
+    columns = line_features(grid.swapaxes(-1, -2)).sum(axis=-2)
+    # Empty cells are counted once, on the rows
+    columns[..., FEATURES.index("empty")] = 0
+    features += columns
+    largest = grid.max(axis=(-1, -2))
+    corners = np.stack(
+        [
+            grid[..., 0, 0],
+            grid[..., 0, -1],
+            grid[..., -1, 0],
+            grid[..., -1, -1],
+        ],
+        axis=-1,
+    )
+    features[..., FEATURES.index("corner")] = np.where(
+        (corners == largest[..., None]).any(axis=-1), largest, 0
+    )
+    return features
+
+
+class Heuristic:
+    """
+    Weighted sum of board features, weights given as {feature: weight}
+    (DEFAULT_WEIGHTS if None, features left out weigh 0). Values batches of
+    boards of any size with scores(), and 4x4 bitboards when called, which
+    makes it an ExpectimaxAIEngine evaluate function.
+    """
+
+    def __init__(self, weights: dict = None):
+        weights = DEFAULT_WEIGHTS if weights is None else weights
+        unknown = set(weights) - set(FEATURES)
+        if unknown:
+            raise ValueError(
+                f"Unknown features {', '.join(sorted(unknown))}, choose "
+                f"from {', '.join(FEATURES)}"
+            )
+        self.weights = {
+            feature: float(weights.get(feature, 0.0)) for feature in FEATURES
+        }
+        self._vector = np.array([self.weights[f] for f in FEATURES])
+        self._row_values = None
+        self._column_values = None
+
+    def __repr__(self):
+        terms = ", ".join(f"{f}={w:g}" for f, w in self.weights.items() if w)
+        return f"Heuristic({terms})"
+
+    def fingerprint(self) -> str:
+        # repr rounds the weights
+        return f"Heuristic({self.weights!r})"
+
+    def __getstate__(self):
+        # Row tables are rebuilt on first use rather than pickled
+        return {"weights": self.weights}
+
+    def __setstate__(self, state):
+        self.__init__(state["weights"])
+
+    def scores(self, boards):
+        """Values of a (..., grid, grid) array of tile boards"""
+        return board_features(np.asarray(boards)) @ self._vector
+
+    def score(self, board) -> float:
+        """Value of a list of lists board"""
+        return float(self.scores(np.array(board)))
+
+    def _build_row_tables(self) -> None:
+        rows = np.arange(ROW_MASK + 1)
+        lines = rows[:, None] >> 4 * np.arange(4) & NIBBLE_MASK
+        features = line_features(lines)
+        values = features @ self._vector
+        self._row_values = values.tolist()
+        empty = FEATURES.index("empty")
+        columns = values - features[:, empty] * self._vector[empty]
+        self._column_values = columns.tolist()
+
+    def __call__(self, bitboard: int) -> float:
+        if self._row_values is None:
+            self._build_row_tables()
+        rows, columns = self._row_values, self._column_values
+        transposed = bitboard_2048.transpose(bitboard)
+        value = (
+            rows[bitboard & ROW_MASK]
+            + rows[bitboard >> 16 & ROW_MASK]
+            + rows[bitboard >> 32 & ROW_MASK]
+            + rows[bitboard >> 48]
+            + columns[transposed & ROW_MASK]
+            + columns[transposed >> 16 & ROW_MASK]
+            + columns[transposed >> 32 & ROW_MASK]
+            + columns[transposed >> 48]
+        )
+        largest = bitboard_2048.max_exponent(bitboard)
+        for shift in (0, 12, 48, 60):
+            if bitboard >> shift & NIBBLE_MASK == largest:
+                return value + self.weights["corner"] * largest
+        return value
+
+
+def load_weights(path: str) -> dict:
+    """Reads {feature: weight} from a JSON file written by save_weights"""
+    with open(path) as f:
+        weights = json.load(f)
+    if not isinstance(weights, dict):
+        raise ValueError(f"{path} does not hold feature weights")
+    return weights
+
+
+def save_weights(weights: dict, path: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(weights, f, indent=2)
+        f.write("\n")
+
+
+class HeuristicAIEngine(AIEngine2048):
+    """
+    Greedy engine: plays the move with the best merge score plus heuristic
+    value of its afterstate, one ply deep. Batches of boards are valued with
+    a single NumPy call, so it plays many games at once cheaply, and weights
+    tuned with it carry over to ExpectimaxAIEngine(evaluate=...), which
+    adds up values the same way.
+    """
+
+    def __init__(self, evaluate: Heuristic = None):
+        self.evaluate = evaluate if evaluate is not None else Heuristic()
+
+    def __repr__(self):
+        return f"Heuristic AI Engine ({self.evaluate})"
+
+    def fingerprint(self) -> str:
+        return f"{self!r} evaluate={fingerprint(self.evaluate)}"
+
+    def analyse(self, board) -> Analysis:
+        return self.analyse_batch([board])[0]
+
+    def recommend_next_move(self, board) -> Keys2048:
+        return self.analyse(board).move
+
+    def recommend_batch(self, boards):
+        if len({len(board) for board in boards}) > 1:
+            return super().recommend_batch(boards)
+        return [analysis.move for analysis in self.analyse_batch(boards)]
+
+    def analyse_batch(self, boards):
+        """Like analyse for every board of a sequence of boards of one size"""
+        codes, values = self.choose(np.array(boards, dtype=np.int64))
+        return [
+            Analysis(MOVES[code], float(value), 1)
+            if np.isfinite(value)
+            else Analysis(Keys2048.LEFT, None, 0)
+            for code, value in zip(codes.tolist(), values)
+        ]
+
+    def choose(self, boards):
+        """
+        Best move code and its value for every board of a (N, grid, grid)
+        array, -inf for boards without a legal move
+        """
+        after, scores, legal = afterstates(boards)
+        values = scores + self.evaluate.scores(after)
+        moved = (legal[:, None] >> np.arange(len(MOVES)) & 1).astype(bool)
+        values = np.where(moved, values, -np.inf)
+        codes = values.argmax(axis=1)
+        return codes, values[np.arange(len(boards)), codes]
+
+
+def play_games(
+    heuristic: Heuristic,
+    games=32,
+    grid_size=4,
+    max_score=2048,
+    max_moves=10_000,
+    seed=None,
+):
+    """
+    Final scores of games played together by HeuristicAIEngine(heuristic)
+    """
+    engine = HeuristicAIEngine(heuristic)
+    batch = BatchGame2048(
+        games, grid_size=grid_size, max_score=max_score, seed=seed
+    )
+    batch.start_game()
+    for _ in range(max_moves):
+        playing = batch.is_end_game() == 0
+        if not playing.any():
+            break
+        codes, _ = engine.choose(batch.boards)
+        batch.step(codes)
+    return batch.scores
+
+
+def _fitness(weights, settings) -> float:
+    return float(np.mean(play_games(Heuristic(weights), **settings)))
+
+
+class TuningResult(NamedTuple):
+    weights: dict  # the search's final estimate of the best weights
+    fitness: float  # mean score of the best weights of the last generation
+    history: list  # (best, mean) fitness of every generation
+
+
+def tune(
+    initial: dict = None,
+    method="cem",
+    generations=10,
+    population=16,
+    elite_fraction=0.25,
+    sigma=0.5,
+    games=32,
+    grid_size=4,
+    max_score=2048,
+    max_moves=10_000,
+    processes=None,
+    seed=None,
+) -> TuningResult:
+    """
+    Searches weights maximising the mean score of play_games. Every
+    generation samples population - 1 weight vectors around a centre
+    (initial, DEFAULT_WEIGHTS by default) with a standard deviation of
+    sigma times each weight, and plays the same games with every one of
+    them and the centre. The cross entropy method ("cem") moves the centre
+    and deviations to the mean and spread of the best elite_fraction,
+    random search ("random") moves the centre to the best candidate.
+    Candidates are spread over processes worker processes (all CPUs if 0,
+    in this process if None).
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, choose from {METHODS}")
+    rng = np.random.default_rng(seed)
+    centre = np.array(
+        [
+            (DEFAULT_WEIGHTS if initial is None else initial).get(f, 0.0)
+            for f in FEATURES
+        ]
+    )
+    spread = sigma * np.maximum(np.abs(centre), 1.0)
+    elites = max(2, round(elite_fraction * population))
+    history = []
+    executor = (
+        ProcessPoolExecutor(processes or None)
+        if processes is not None
+        else None
+    )
+    try:
+        for generation in range(generations):
+            start = time.perf_counter()
+            candidates = np.vstack(
+                [
+                    centre,
+                    centre
+                    + spread
+                    * rng.standard_normal((population - 1, len(FEATURES))),
+                ]
+            )
+            settings = {
+                "games": games,
+                "grid_size": grid_size,
+                "max_score": max_score,
+                "max_moves": max_moves,
+                # Common random numbers: every candidate plays the same
+                # games, so differences come from the weights
+                "seed": int(rng.integers(2**32)),
+            }
+            weights = [dict(zip(FEATURES, c.tolist())) for c in candidates]
+            mapper = executor.map if executor is not None else map
+            fitness = np.array(
+                list(mapper(_fitness, weights, [settings] * len(weights)))
+            )
+            order = np.argsort(-fitness, kind="stable")
+            history.append((float(fitness[order[0]]), float(fitness.mean())))
+            LOG.info(
+                "Generation %d: best %.0f, mean %.0f in %.1fs",
+                generation + 1,
+                *history[-1],
+                time.perf_counter() - start,
+            )
+            if method == "cem":
+                best = candidates[order[:elites]]
+                centre = best.mean(axis=0)
+                # Keeps exploring once the elites agree
+                spread = np.maximum(
+                    best.std(axis=0), 0.05 * np.maximum(np.abs(centre), 1.0)
+                )
+            else:
+                centre = candidates[order[0]]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return TuningResult(
+        dict(zip(FEATURES, centre.tolist())),
+        history[-1][0] if history else float("nan"),
+        history,
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Tunes heuristic weights against simulated games"
+    )
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--initial", help="weights file to start from")
+    parser.add_argument("--method", choices=METHODS, default="cem")
+    parser.add_argument("--generations", type=int, default=10)
+    parser.add_argument("--population", type=int, default=16)
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument(
+        "--games", type=int, default=32, help="games played per candidate"
+    )
+    parser.add_argument("--grid-size", type=int, default=4)
+    parser.add_argument("--max-score", type=int, default=2048)
+    parser.add_argument(
+        "-j",
+        "--processes",
+        type=int,
+        help="worker processes, 0 for one per CPU",
+    )
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--log-level", default="INFO")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level)
+    result = tune(
+        initial=load_weights(args.initial) if args.initial else None,
+        method=args.method,
+        generations=args.generations,
+        population=args.population,
+        sigma=args.sigma,
+        games=args.games,
+        grid_size=args.grid_size,
+        max_score=args.max_score,
+        processes=args.processes,
+        seed=args.seed,
+    )
+    save_weights(result.weights, args.output)
+    LOG.info(
+        "Best mean score %.0f, weights in %s", result.fitness, args.output
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
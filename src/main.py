@@ -1,31 +1,79 @@
-import pygame
-from game_2048 import Game2048
+import argparse
+from src.backends_2048 import BACKENDS, create_game
+from src.game_2048 import Game2048
 import logging  # type: ignore
 import logging.config
 import os
-from zack_ai_engine_2048 import ZackAIEngine
+from src.async_recommender_2048 import AsyncRecommender
+from src.autoplay_2048 import AutoPlayer, UNLIMITED
+from src.engines_2048 import ENGINES, create_engine
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Plays 2048 in a window")
+    parser.add_argument(
+        "-e", "--engine", choices=sorted(ENGINES), default="zack"
+    )
+    parser.add_argument(
+        "--speed",
+        type=int,
+        default=10,
+        help="auto-play moves per second, 0 for unlimited",
+    )
+    parser.add_argument(
+        "--server",
+        nargs="?",
+        const="",
+        metavar="SOCKET",
+        help="ask a running zacks-2048-server instead of loading --engine",
+    )
+    parser.add_argument("--grid-size", type=int, default=4)
+    parser.add_argument("--max-score", type=int, default=2048)
+    parser.add_argument(
+        "--backend",
+        choices=sorted(BACKENDS),
+        help="game implementation, the fastest one that fits by default",
+    )
+    return parser.parse_args(argv)
+
 
 # Set up logging
-def main():
+def main(argv=None):
+    args = parse_args(argv)
     project_root = os.path.join(os.path.dirname(__file__), "..")
-    logging.config.fileConfig(os.path.join(project_root, "logging.conf"))
+    logging_conf = os.path.join(project_root, "logging.conf")
+    if os.path.exists(logging_conf):
+        logging.config.fileConfig(logging_conf)
+    else:
+        # Installed without the source tree
+        logging.basicConfig(level=logging.INFO)
     LOG = logging.getLogger(__name__)
 
+    # Imported here so that importing this module, as process pool workers
+    # do when it is __main__, does not pay for pygame
+    import pygame
+
     pygame.init()
     WINDOW_HEIGHT, WINDOW_WIDTH = 1024, 768
 
-    GRID_SIZE = 4
-    TILE_SIZE = 100
+    GRID_SIZE = args.grid_size
     TILE_MARGIN = 10
+    GRID_OFFSET_Y = 100
+    SCORE_HEIGHT = 80
+    # Tiles shrink so that larger grids still fit above the status line
+    TILE_SIZE = min(
+        100,
+        (WINDOW_WIDTH - GRID_OFFSET_Y - SCORE_HEIGHT + TILE_MARGIN)
+        // GRID_SIZE
+        - TILE_MARGIN,
+    )
     GRID_WIDTH = (
         GRID_SIZE * (TILE_SIZE + TILE_MARGIN) - TILE_MARGIN
     )  # Total width of the grid
     GRID_OFFSET_X = (
         WINDOW_HEIGHT - GRID_WIDTH
     ) // 2  # Horizontal offset to centre the grid
-    GRID_OFFSET_Y = 100
     FONT_SIZE = 36
-    SCORE_HEIGHT = 80
 
     # Colors
     BACKGROUND_COLOR = (187, 173, 160)
@@ -44,95 +92,216 @@ def main():
         1024: (237, 197, 63),
         2048: (237, 194, 46),
     }
+    SUPER_TILE_COLOR = (60, 58, 50)  # every tile beyond 2048
     TEXT_COLOR = (119, 110, 101)
     TEXT_COLOR_LIGHT = (249, 246, 242)
+    IDLE_WAIT_MS = 500  # longest sleep while nothing changes on screen
 
     screen = pygame.display.set_mode((WINDOW_HEIGHT, WINDOW_WIDTH))
     pygame.display.set_caption("2048 Game by Zack")
     font = pygame.font.Font(None, FONT_SIZE)
+    tile_font = pygame.font.Font(None, FONT_SIZE * TILE_SIZE // 100)
+
+
+    game_state_font = pygame.font.Font(None, 60)
+    restart_font = pygame.font.Font(None, 36)
+    grid_rect = pygame.Rect(
+        GRID_OFFSET_X, GRID_OFFSET_Y, GRID_WIDTH, GRID_WIDTH
+    )
+    status_rect = pygame.Rect(
+        GRID_OFFSET_X, GRID_OFFSET_Y + GRID_WIDTH, GRID_WIDTH, SCORE_HEIGHT
+    )
+    hint_rect = pygame.Rect(
+        GRID_OFFSET_X, GRID_OFFSET_Y - SCORE_HEIGHT, GRID_WIDTH, SCORE_HEIGHT
+    )
+
+    # Surfaces are rendered once per tile value, then only blitted
+    tile_surfaces = {}
+    # What is currently on screen, so only tiles that changed are redrawn
+    drawn_tiles = {}
+    drawn_end_game = [0]
+    drawn_hint = [None]
+    drawn_status = [None]
+
+    def get_tile_surface(tile_value):
+        """
+        Returns the cached surface of a tile, rendering it on first use
+        """
+        surface = tile_surfaces.get(tile_value)
+        if surface is None:
+            surface = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
+            color = TILE_COLORS.get(tile_value, SUPER_TILE_COLOR)
+            pygame.draw.rect(
+                surface, color, (0, 0, TILE_SIZE, TILE_SIZE), border_radius=5
+            )
 
+            text_color = TEXT_COLOR_LIGHT if tile_value >= 8 else TEXT_COLOR
+            text = tile_font.render(str(tile_value), True, text_color)
+            if text.get_width() > TILE_SIZE - TILE_MARGIN:
+                # Very large tiles on small grids, squeeze the digits
+                text = pygame.transform.smoothscale(
+                    text, (TILE_SIZE - TILE_MARGIN, text.get_height())
+                )
+            text_rect = text.get_rect(center=(TILE_SIZE // 2, TILE_SIZE // 2))
+            surface.blit(text, text_rect)
+            tile_surfaces[tile_value] = surface
+        return surface
 
     def draw_tile(i, j, tile_value):
         """
-        Draw a single tile at the position (i,j) with the given value
+        Draw a single tile at the position (i,j) with the given value,
+        returns the rect that changed
         """
 
         x = GRID_OFFSET_X + j * (TILE_SIZE + TILE_MARGIN)
         y = GRID_OFFSET_Y + i * (TILE_SIZE + TILE_MARGIN)
-        color = TILE_COLORS.get(tile_value, TILE_COLORS[0])
-
-        pygame.draw.rect(
-            screen, color, (x, y, TILE_SIZE, TILE_SIZE), border_radius=5
-        )
-
-        text_color = TEXT_COLOR_LIGHT if tile_value >= 8 else TEXT_COLOR
-        text = font.render(str(tile_value), True, text_color)
-        text_rect = text.get_rect(center=(x + TILE_SIZE // 2, y + TILE_SIZE // 2))
-        screen.blit(text, text_rect)
+        return screen.blit(get_tile_surface(tile_value), (x, y))
 
+    def invalidate():
+        """Forget what is on screen so the next frame redraws everything"""
+        drawn_tiles.clear()
+        drawn_end_game[0] = 0
+        drawn_hint[0] = None
+        drawn_status[0] = None
 
     def draw_grid(game: Game2048):
-        """Draw the entire 4x4 grid and lines, tiles are drawn within a for loop with an offset"""
-        screen.fill(BACKGROUND_COLOR)
-        pygame.draw.rect(
-            screen,
-            GRID_COLOR,
-            (GRID_OFFSET_X, GRID_OFFSET_Y, GRID_WIDTH, GRID_WIDTH),
-            border_radius=5,
-        )
+        """
+        Draw the grid and every tile whose value changed since the last
+        frame, returns the rects that changed
+        """
+        dirty_rects = []
+        if not drawn_tiles:
+            screen.fill(BACKGROUND_COLOR)
+            pygame.draw.rect(screen, GRID_COLOR, grid_rect, border_radius=5)
+            dirty_rects.append(screen.get_rect())
+
+        board = game.board
         for i in range(GRID_SIZE):
             for j in range(GRID_SIZE):
-                tile_value = game.board[i][j]
-                draw_tile(i, j, tile_value)
-
+                tile_value = board[i][j]
+                if drawn_tiles.get((i, j)) != tile_value:
+                    dirty_rects.append(draw_tile(i, j, tile_value))
+                    drawn_tiles[i, j] = tile_value
+        return dirty_rects
 
     def draw_game_state(game: Game2048):
-        if game.is_end_game():
-            # Create a semi-transparent overlay
-            overlay = pygame.Surface((GRID_WIDTH, GRID_WIDTH), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 180))
-            screen.blit(overlay, (GRID_OFFSET_X, GRID_OFFSET_Y))
-
-            if game.is_end_game() == 1:
-                message = "You Won!"
-                text_color = (0, 255, 0)  # Green for win
-            elif game.is_end_game() == 2:
-                message = "Game Over!"
-                text_color = (255, 0, 0)  # Red for game over
-
-            game_state_font = pygame.font.Font(None, 60)
-            text = game_state_font.render(message, True, text_color)
-            text_rect = text.get_rect(
-                center=(
-                    GRID_OFFSET_X + GRID_WIDTH // 2,
-                    GRID_OFFSET_Y + GRID_WIDTH // 2,
-                )
-            )
-            screen.blit(text, text_rect)
+        """
+        Draw the end of game overlay once when the game ends, returns the
+        rects that changed
+        """
+        end_game = game.is_end_game()
+        if end_game == drawn_end_game[0]:
+            return []
+        drawn_end_game[0] = end_game
+        if not end_game:
+            return []
+
+        # Create a semi-transparent overlay
+        overlay = pygame.Surface((GRID_WIDTH, GRID_WIDTH), pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 180))
+        screen.blit(overlay, grid_rect)
+
+        if end_game == 1:
+            message = "You Won!"
+            text_color = (0, 255, 0)  # Green for win
+        else:
+            message = "Game Over!"
+            text_color = (255, 0, 0)  # Red for game over
+
+        text = game_state_font.render(message, True, text_color)
+        text_rect = text.get_rect(center=grid_rect.center)
+        screen.blit(text, text_rect)
+
+        restart_text = restart_font.render(
+            "Press R to Restart", True, TEXT_COLOR_LIGHT
+        )
+        restart_rect = restart_text.get_rect(
+            center=(grid_rect.centerx, grid_rect.centery + 50)
+        )
+        screen.blit(restart_text, restart_rect)
+        return [grid_rect]
 
-            restart_font = pygame.font.Font(None, 36)
-            restart_text = restart_font.render(
-                "Press R to Restart", True, TEXT_COLOR_LIGHT
+    def draw_hint(recommender: AsyncRecommender):
+        """
+        Draw the best move found so far by the background search, returns
+        the rects that changed
+        """
+        if recommender.busy or recommender.best is not None:
+            best = recommender.best
+            hint = "Thinking..." if best is None else (
+                f"Best move: {best.move} (iteration {best.iteration}"
+                + (")" if best.final else ", thinking...)")
             )
-            restart_rect = restart_text.get_rect(
-                center=(
-                    GRID_OFFSET_X + GRID_WIDTH // 2,
-                    GRID_OFFSET_Y + GRID_WIDTH // 2 + 50,
-                )
+        else:
+            hint = ""
+        if hint == drawn_hint[0]:
+            return []
+        drawn_hint[0] = hint
+
+        screen.fill(BACKGROUND_COLOR, hint_rect)
+        text = font.render(hint, True, TEXT_COLOR_LIGHT)
+        screen.blit(text, text.get_rect(center=hint_rect.center))
+        return [hint_rect]
+
+    def draw_status(autoplayer: AutoPlayer):
+        """
+        Draw the auto-play speed and live counters, returns the rects that
+        changed
+        """
+        if autoplayer.moves_per_second is UNLIMITED:
+            speed = "unlimited"
+        else:
+            speed = f"{autoplayer.moves_per_second}/s"
+        if autoplayer.running:
+            status = (
+                f"Auto {speed}: {autoplayer.rate:.0f} moves/s, "
+                f"engine {autoplayer.latency * 1000:.2f} ms"
             )
-            screen.blit(restart_text, restart_rect)
+        elif autoplayer.result:
+            status = f"Auto-play ended: {autoplayer.result}"
+        else:
+            status = f"A: auto-play ({speed}), +/-: speed"
+        if status == drawn_status[0]:
+            return []
+        drawn_status[0] = status
 
+        screen.fill(BACKGROUND_COLOR, status_rect)
+        text = font.render(status, True, TEXT_COLOR_LIGHT)
+        screen.blit(text, text.get_rect(center=status_rect.center))
+        return [status_rect]
 
     # Game instance creation
-    zack_ai_engine = ZackAIEngine()
-    game = Game2048(grid_size=GRID_SIZE, ai_engine=zack_ai_engine)
+    def make_engine():
+        if args.server is not None:
+            from src.server_2048 import RemoteAIEngine
+
+            return RemoteAIEngine(args.server or None)
+        return create_engine(args.engine)
+
+    ai_engine = make_engine()
+    game = create_game(
+        grid_size=GRID_SIZE,
+        max_score=args.max_score,
+        backend=args.backend,
+        ai_engine=ai_engine,
+    )
     game.start_game()
+    # Searches run on a background thread so the window never freezes, with
+    # an engine of their own as engines keep state between moves
+    recommender = AsyncRecommender(make_engine())
+    autoplayer = AutoPlayer(game, args.speed or UNLIMITED)
     clock = pygame.time.Clock()
 
     running = True
-    gaming = True
+    idle = False
+    elapsed = 0.0
     while running:
-        for event in pygame.event.get():
+        if idle:
+            # Nothing changed last frame, sleep until input arrives
+            events = [pygame.event.wait(IDLE_WAIT_MS)] + pygame.event.get()
+        else:
+            events = pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
             elif event.type == pygame.KEYDOWN and not game.is_end_game():
@@ -146,25 +315,52 @@ def main():
                 elif event.key == pygame.K_DOWN:
                     moved = game.move_down()
                 elif event.key == pygame.K_SPACE:
-                    move = game.recommend_next_move()
+                    recommender.request(game.board)
+                elif event.key == pygame.K_a:
+                    autoplayer.toggle()
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS):
+                    autoplayer.change_speed(1)
+                elif event.key == pygame.K_MINUS:
+                    autoplayer.change_speed(-1)
                 if moved:
+                    # The pending recommendation was for the previous board
+                    recommender.cancel()
                     game.generate_tile()
-                    LOG.info("Game state updated after move")
+                    LOG.debug("Game state updated after move")
                     if game.is_game_over():
                         LOG.info("Game is over !")
                     elif game.is_game_win():
                         LOG.info(
-                            "Congratulations, you have won the game, press R to restart!"
+                            "Congratulations, you have won the game, "
+                            "press R to restart!"
                         )
             elif game.is_end_game() and event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_r:
+                    recommender.cancel()
+                    autoplayer.stop()
                     game.start_game()
+                    invalidate()
 
-        draw_grid(game)
-        draw_game_state(game)
-        pygame.display.flip()
-        clock.tick(60)
+        # In unlimited mode this simulates for a whole frame, only the
+        # last board of the frame is drawn
+        if autoplayer.advance(elapsed):
+            recommender.cancel()
+
+        dirty_rects = (
+            draw_grid(game)
+            + draw_game_state(game)
+            + draw_hint(recommender)
+            + draw_status(autoplayer)
+        )
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+        # Keep polling while a search may still improve its recommendation
+        busy = recommender.busy or autoplayer.running
+        idle = not dirty_rects and not busy
+        elapsed = clock.tick(60) / 1000
 
+    recommender.close()
+    autoplayer.close()
     pygame.quit()
 
 if __name__ == "__main__":
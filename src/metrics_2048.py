@@ -0,0 +1,258 @@
+import bisect
+import functools
+import json
+import time
+from collections import defaultdict
+
+# Upper bounds (seconds) of the latency histogram buckets, roughly three
+# per decade from 1us to 10s; anything slower lands in +Inf
+DEFAULT_BUCKETS = tuple(
+    float(f"{scale}e{exponent}")
+    for exponent in range(-6, 1)
+    for scale in (1, 2.5, 5)
+) + (10.0,)
+
+MOVE_METHODS = ("move_left", "move_right", "move_up", "move_down")
+GAME_METHODS = (
+    "move_left",
+    "move_right",
+    "move_up",
+    "move_down",
+    "generate_tile",
+    "is_game_over",
+    "is_game_win",
+    "recommend_next_move",
+)
+ENGINE_METHODS = ("recommend_next_move", "analyse")
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their count and sum"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q quantile, q in [0, 1]"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank and seen:
+                return bound
+        return float("inf")
+
+    def cumulative(self):
+        """(upper bound, observations at or below it) pairs, +Inf last"""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+def _key(name: str, labels: dict):
+    return name, tuple(sorted(labels.items()))
+
+
+def _escape(value) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def _format_labels(labels, extra=()) -> str:
+    pairs = tuple(labels) + tuple(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Metrics:
+    """
+    Counters and latency histograms, keyed by name and labels. Every
+    observation is also passed to each of hooks as
+    hook(name, labels, seconds), for callers who want the raw events.
+    Nothing is recorded for objects that were not instrumented, see
+    instrument_game and instrument_engine.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counters = defaultdict(int)
+        self.histograms = {}
+        self.hooks = []
+
+    def __repr__(self):
+        return (
+            f"Metrics({len(self.counters)} counters, "
+            f"{len(self.histograms)} histograms)"
+        )
+
+    def inc(self, name: str, value=1, **labels) -> None:
+        self.counters[_key(name, labels)] += value
+
+    def _histogram(self, name: str, labels: dict) -> Histogram:
+        key = _key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(self.buckets)
+        return histogram
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        self._histogram(name, labels).observe(seconds)
+        for hook in self.hooks:
+            hook(name, labels, seconds)
+
+    def timed(self, function, name: str, **labels):
+        """Wraps function so every call is observed under name and labels"""
+        histogram = self._histogram(name, labels)
+        clock = time.perf_counter
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                histogram.observe(elapsed)
+                for hook in self.hooks:
+                    hook(name, labels, elapsed)
+
+        return wrapper
+
+    def reset(self) -> None:
+        self.counters.clear()
+        self.histograms.clear()
+
+    def snapshot(self) -> dict:
+        """Everything recorded so far, as plain JSON types"""
+        return {
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ],
+            "histograms": [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "p50": histogram.quantile(0.5),
+                    "p99": histogram.quantile(0.99),
+                    "buckets": [
+                        ["+Inf" if bound == float("inf") else bound, count]
+                        for bound, count in histogram.cumulative()
+                    ],
+                }
+                for (name, labels), histogram in sorted(
+                    self.histograms.items()
+                )
+            ],
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix="zacks_2048") -> str:
+        """The Prometheus text exposition format"""
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            metric = f"{prefix}_{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            metric = f"{prefix}_{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            for bound, count in histogram.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f"{metric}_bucket{_format_labels(labels, [('le', le)])}"
+                    f" {count}"
+                )
+            lines.append(
+                f"{metric}_sum{_format_labels(labels)} {histogram.sum!r}"
+            )
+            lines.append(
+                f"{metric}_count{_format_labels(labels)} {histogram.count}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+def instrument(obj, metrics: Metrics, name: str, methods, **labels):
+    """
+    Replaces methods of obj, on that instance only, with timed wrappers
+    observed as name with an extra method label. Objects that are not
+    instrumented run their plain methods, so metrics cost nothing unless
+    asked for. Returns obj.
+    """
+    for method in methods:
+        function = getattr(obj, method, None)
+        if function is None:
+            continue
+        setattr(
+            obj, method, metrics.timed(function, name, method=method, **labels)
+        )
+    return obj
+
+
+def uninstrument(obj, methods) -> None:
+    """Restores the plain methods of an instrumented obj"""
+    for method in methods:
+        obj.__dict__.pop(method, None)
+
+
+def instrument_game(game, metrics: Metrics, methods=GAME_METHODS):
+    """
+    Times game's moves, spawns, end checks and engine calls, and counts
+    moves by whether they changed the board
+    """
+    instrument(game, metrics, "game_call_seconds", methods)
+    for method in MOVE_METHODS:
+        if method in methods:
+            setattr(game, method, _count_moves(getattr(game, method), metrics))
+    return game
+
+
+def _count_moves(move, metrics: Metrics):
+    counters = metrics.counters
+    move_name = move.__name__.removeprefix("move_")
+    keys = {
+        changed: _key(
+            "moves_total", {"move": move_name, "changed": str(changed).lower()}
+        )
+        for changed in (True, False)
+    }
+
+    @functools.wraps(move)
+    def wrapper():
+        changed = move()
+        counters[keys[bool(changed)]] += 1
+        return changed
+
+    return wrapper
+
+
+def instrument_engine(engine, metrics: Metrics, methods=ENGINE_METHODS):
+    """Times an engine's recommendations, labelled with its repr"""
+    return instrument(
+        engine, metrics, "engine_call_seconds", methods, engine=repr(engine)
+    )
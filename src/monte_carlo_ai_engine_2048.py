@@ -0,0 +1,229 @@
+import logging
+import time
+import numpy as np
+from src.base_ai_engine_2048 import AIEngine2048, Analysis
+from src.batch_game_2048 import (
+    MOVES,
+    BatchGame2048,
+    afterstates,
+    apply_moves,
+)
+from src.utils import Keys2048
+
+LOG = logging.getLogger(__name__)
+
+# Playout policies: a uniformly random legal move, or the legal move merging
+# the most (ties broken at random)
+POLICIES = ("random", "greedy")
+# Playouts per root move and batch under a time budget, small enough to
+# check the clock often without losing much vectorization
+TIMED_BATCH_SIZE = 32
+
+
+class MonteCarloAIEngine(AIEngine2048):
+    """
+    Values every legal root move by the mean score of random playouts of up
+    to depth moves after it. All playouts of a move run together as one
+    BatchGame2048, so they share its moves and spawns exactly. Playouts are
+    played batch_size per root move at a time (all at once, or
+    TIMED_BATCH_SIZE with a time_budget) until playouts per move are done
+    or time_budget seconds are spent. The clock is checked after every
+    playout move. A batch cut short is dropped, unless it is the first,
+    whose playouts are then all as short; the analysis depth says how deep
+    they went.
+    """
+
+    def __init__(
+        self,
+        playouts=100,
+        depth=20,
+        time_budget=None,
+        batch_size=None,
+        policy="random",
+        numbers_to_be_generated=(2, 4),
+        seed=None,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(
+                f"Unknown policy {policy!r}, choose from {', '.join(POLICIES)}"
+            )
+        if playouts < 1:
+            raise ValueError("At least one playout per move is needed")
+        self.playouts = playouts
+        self.depth = depth
+        self.time_budget = time_budget
+        if batch_size is None:
+            batch_size = playouts
+            if time_budget is not None:
+                batch_size = min(playouts, TIMED_BATCH_SIZE)
+        self.batch_size = batch_size
+        self.policy = policy
+        self.numbers_to_be_generated = numbers_to_be_generated
+        self.rng = np.random.default_rng(seed)
+        # Totals over every search, see playouts_per_second
+        self.playouts_played = 0
+        self.search_seconds = 0.0
+
+    def __repr__(self):
+        return (
+            f"Monte Carlo AI Engine ({self.playouts} {self.policy} playouts "
+            f"of {self.depth} moves)"
+        )
+
+    def fingerprint(self) -> str:
+        return (
+            f"{self!r} time_budget={self.time_budget!r} "
+            f"numbers={self.numbers_to_be_generated!r}"
+        )
+
+    @property
+    def playouts_per_second(self) -> float:
+        if not self.search_seconds:
+            return 0.0
+        return self.playouts_played / self.search_seconds
+
+    def recommend_next_move(self, board) -> Keys2048:
+        """
+        Returns the best move for board, or Keys2048.LEFT if no move is legal
+        """
+        return self.analyse(board).move
+
+    def analyse(self, board) -> Analysis:
+        """
+        Returns the best move for board with its mean playout score (the
+        root move's merges included), (Keys2048.LEFT, None, 0) if no move
+        is legal
+        """
+        return self.analyse_batch([board])[0]
+
+    def recommend_batch(self, boards):
+        if len({len(board) for board in boards}) > 1:
+            return super().recommend_batch(boards)
+        return [analysis.move for analysis in self.analyse_batch(boards)]
+
+    def analyse_batch(self, boards):
+        """
+        Like analyse for every board of a sequence of boards of one size,
+        all their playouts played as one batch
+        """
+        start = time.perf_counter()
+        after, root_scores, masks = afterstates(
+            np.array(boards, dtype=np.int64)
+        )
+        # Every legal (board, move) pair, boards in order then moves
+        roots, moves = np.nonzero(masks[:, None] >> np.arange(len(MOVES)) & 1)
+        results = [Analysis(Keys2048.LEFT, None, 0)] * len(boards)
+        if not roots.size:
+            return results
+
+        deadline = None
+        if self.time_budget is not None:
+            deadline = start + self.time_budget
+        totals = np.zeros(len(roots))
+        played = 0
+        depth = self.depth
+        while played < self.playouts:
+            count = min(self.batch_size, self.playouts - played)
+            scores, steps = self._playouts(
+                after[roots, moves], count, deadline
+            )
+            if steps < self.depth and not played:
+                depth = steps
+            elif steps < depth:
+                break
+            totals += scores
+            played += count
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+        values = root_scores[roots, moves] + totals / played
+
+        elapsed = time.perf_counter() - start
+        self.playouts_played += played * len(roots)
+        self.search_seconds += elapsed
+        LOG.debug(
+            "%d playouts in %.3fs (%.0f playouts/s)",
+            played * len(roots),
+            elapsed,
+            played * len(roots) / elapsed if elapsed else 0.0,
+        )
+        for root, move, value in zip(roots, moves, values):
+            best = results[root]
+            if best.score is None or value > best.score:
+                results[root] = Analysis(MOVES[move], float(value), depth)
+        return results
+
+    def playout_scores(self, boards, count: int):
+        """
+        Spawns a tile on every board of a (k, grid, grid) array and plays
+        count playouts from each. Returns the k summed playout scores.
+        """
+        return self._playouts(boards, count)[0]
+
+    def _playouts(self, boards, count: int, deadline=None):
+        """
+        playout_scores, stopping once perf_counter() passes deadline after
+        at least one move. Also returns the number of moves played, depth
+        unless cut short.
+        """
+        k, grid_size = len(boards), boards.shape[-1]
+        batch = BatchGame2048(
+            k * count,
+            grid_size=grid_size,
+            boards=np.repeat(boards, count, axis=0),
+            numbers_to_be_generated=self.numbers_to_be_generated,
+        )
+        batch.rng = self.rng
+        batch.generate_tile()
+        steps = self.depth
+        for step in range(1, self.depth + 1):
+            if not self._play_step(batch):
+                break
+            if deadline is not None and time.perf_counter() > deadline:
+                steps = step
+                break
+        return batch.scores.reshape(k, count).sum(axis=1), steps
+
+    def _play_step(self, batch: BatchGame2048) -> bool:
+        """
+        Plays one policy move and spawn on every board that still has a
+        legal move, returns False once none has
+        """
+        boards = batch.boards
+        n = len(boards)
+        new_boards = boards.copy()
+        gained = np.zeros(n, dtype=boards.dtype)
+        moved = np.zeros(n, dtype=bool)
+        if self.policy == "greedy":
+            order = self._greedy_order(boards)
+        else:
+            order = self.rng.random((n, len(MOVES))).argsort(axis=1)
+        # Moves are tried in order of preference, most boards only need the
+        # first one
+        pending = np.arange(n)
+        for attempt in range(len(MOVES)):
+            slid, changed, score = apply_moves(
+                boards[pending], order[pending, attempt]
+            )
+            done = pending[changed]
+            new_boards[done] = slid[changed]
+            gained[done] = score[changed]
+            moved[done] = True
+            pending = pending[~changed]
+            if not pending.size:
+                break
+        if not moved.any():
+            return False
+        batch.boards = new_boards
+        batch.scores += gained
+        batch.generate_tile(moved)
+        return True
+
+    def _greedy_order(self, boards):
+        """
+        Moves of every board ordered by how much they merge, ties broken at
+        random
+        """
+        gained = afterstates(boards)[1]
+        # Merges always score 4 or more, the noise only breaks ties
+        keys = gained + self.rng.random(gained.shape)
+        return (-keys).argsort(axis=1)
@@ -0,0 +1,398 @@
+import argparse
+import hashlib
+import logging
+import os
+import random
+import struct
+import sys
+import time
+import numpy as np
+from src.base_ai_engine_2048 import AIEngine2048
+from src import bitboard_2048
+from src.afterstates_2048 import MOVES
+from src.utils import Keys2048
+
+LOG = logging.getLogger(__name__)
+
+# Cells are bitboard nibble indices, 4 * row + column. These are the four
+# 6-tuples of Yeh et al. (2016): 4 * 16**6 float32 weights, 256MB.
+DEFAULT_TUPLES = (
+    (0, 1, 2, 3, 4, 5),
+    (4, 5, 6, 7, 8, 9),
+    (0, 1, 2, 4, 5, 6),
+    (4, 5, 6, 8, 9, 10),
+)
+TUPLE_VALUES = 16  # one entry per tile exponent
+SHIFTS = range(0, 64, 4)  # of the 16 bitboard nibbles
+_NIBBLE_SHIFTS = np.array(SHIFTS, dtype=np.uint64)
+
+WEIGHTS_ENV_VAR = "ZACKS_2048_NTUPLE_WEIGHTS"
+DEFAULT_WEIGHTS_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "zacks_2048", "ntuple.bin"
+)
+
+# magic, version, number of tuples, tuple length, then the tuple cells and
+# float32 weights starting at the next multiple of WEIGHTS_ALIGNMENT
+MAGIC = b"Z48N"
+VERSION = 1
+HEADER = struct.Struct("<4sBBB")
+WEIGHTS_ALIGNMENT = 64
+WEIGHTS_DTYPE = np.dtype("<f4")
+
+
+def symmetric_cells(cell: int):
+    """
+    The 8 images of a cell under the rotations and reflections of the board
+    """
+    i, j = divmod(cell, 4)
+    images = []
+    for _ in range(4):
+        i, j = j, 3 - i  # rotate a quarter turn
+        images.append(4 * i + j)
+        images.append(4 * i + 3 - j)  # and mirror
+    return images
+
+
+def _weights_offset(tuples) -> int:
+    size = HEADER.size + sum(len(cells) for cells in tuples)
+    return -(-size // WEIGHTS_ALIGNMENT) * WEIGHTS_ALIGNMENT
+
+
+class NTupleNetwork:
+    """
+    Value function of a bitboard: the sum, over every tuple and each of its
+    8 symmetric placements, of the weight indexed by the tile exponents
+    under it. All tuples share one flat weights array, tuple t owning
+    weights[t * 16**length : (t + 1) * 16**length]. Networks memory mapped
+    read only by load_network pickle as their path, so worker processes
+    map the file again rather than receive a copy of the weights.
+    """
+
+    def __init__(self, tuples=DEFAULT_TUPLES, weights=None):
+        tuples = tuple(tuple(cells) for cells in tuples)
+        if not tuples or len({len(cells) for cells in tuples}) != 1:
+            raise ValueError("Tuples must all have the same, non zero length")
+        self.tuples = tuples
+        self.table_size = TUPLE_VALUES ** len(tuples[0])
+        size = len(tuples) * self.table_size
+        if weights is None:
+            weights = np.zeros(size, dtype=WEIGHTS_DTYPE)
+        elif weights.shape != (size,):
+            raise ValueError(f"Expected {size} weights, got {weights.shape}")
+        self.weights = weights
+
+        # One row per placement of every tuple: the cells it covers, from
+        # the least significant index digit, and its table offset
+        placements = [
+            (t, image)
+            for t, cells in enumerate(tuples)
+            for image in zip(*(symmetric_cells(cell) for cell in cells))
+        ]
+        self._cells = np.array([image for _, image in placements])
+        self._offsets = np.array([t * self.table_size for t, _ in placements])
+        self._digits = TUPLE_VALUES ** np.arange(len(tuples[0]))
+
+    @property
+    def n_features(self) -> int:
+        return len(self._offsets)
+
+    def __repr__(self):
+        length = len(self.tuples[0])
+        return f"NTupleNetwork({len(self.tuples)} {length}-tuples)"
+
+    def __getstate__(self):
+        if isinstance(self.weights, np.memmap) and self.weights.mode == "r":
+            return {"path": self.weights.filename}
+        return {"tuples": self.tuples, "weights": self.weights}
+
+    def __setstate__(self, state):
+        if "path" in state:
+            network = load_network(state["path"])
+            state = {"tuples": network.tuples, "weights": network.weights}
+        self.__init__(state["tuples"], state["weights"])
+
+    def fingerprint(self) -> str:
+        """Tuples and a digest of the weights"""
+        digest = hashlib.blake2b(np.ascontiguousarray(self.weights))
+        return f"NTupleNetwork({self.tuples!r}, {digest.hexdigest()})"
+
+    def indices(self, bitboard: int):
+        """Weight index of every feature of bitboard"""
+        nibbles = np.array([(bitboard >> shift) & 0xF for shift in SHIFTS])
+        return nibbles[self._cells] @ self._digits + self._offsets
+
+    def value(self, bitboard: int) -> float:
+        return float(self.weights[self.indices(bitboard)].sum())
+
+    def values(self, bitboards):
+        """Values of a sequence of bitboards, evaluated together"""
+        nibbles = (
+            np.array(bitboards, dtype=np.uint64)[:, None] >> _NIBBLE_SHIFTS
+        )
+        indices = (nibbles & 0xF).astype(np.int64)[:, self._cells]
+        return self.weights[indices @ self._digits + self._offsets].sum(axis=1)
+
+    def update(self, bitboard: int, delta: float) -> None:
+        """Adds delta to every feature weight of bitboard"""
+        # np.add.at, since a symmetric board can hit one weight twice
+        np.add.at(self.weights, self.indices(bitboard), delta)
+
+    def learn(self, bitboard: int, target: float, rate: float) -> float:
+        """
+        Moves the value of bitboard about rate of the way to target, sharing
+        the change out over its features. Returns the new value.
+        """
+        indices = self.indices(bitboard)
+        error = target - float(self.weights[indices].sum())
+        np.add.at(self.weights, indices, rate * error / self.n_features)
+        return float(self.weights[indices].sum())
+
+    def best_afterstate(self, bitboard: int):
+        """
+        Returns (move, afterstate, score) maximising score plus the value of
+        the afterstate, or None if no move is legal
+        """
+        best, best_value = None, float("-inf")
+        for move_key, move in bitboard_2048.MOVES:
+            afterstate, score = move(bitboard)
+            if afterstate == bitboard:
+                continue
+            value = score + self.value(afterstate)
+            if value > best_value:
+                best, best_value = (move_key, afterstate, score), value
+        return best
+
+
+def save_network(network: NTupleNetwork, path: str) -> None:
+    """
+    Writes the network to path atomically, so concurrent processes never see
+    a half written file
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    header = HEADER.pack(
+        MAGIC, VERSION, len(network.tuples), len(network.tuples[0])
+    ) + bytes(cell for cells in network.tuples for cell in cells)
+    offset = _weights_offset(network.tuples)
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(offset, b"\0"))
+        f.write(np.asarray(network.weights, dtype=WEIGHTS_DTYPE).tobytes())
+    os.replace(tmp_path, path)
+
+
+def load_network(path: str, writable=False) -> NTupleNetwork:
+    """
+    Maps a network written by save_network. Read only networks are memory
+    mapped, so every process loading the same file shares one copy of the
+    weights in the page cache; writable ones are copied into memory.
+    Raises ValueError if the file is not a complete network.
+    """
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"{path} is not an n-tuple network")
+        magic, version, n_tuples, length = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an n-tuple network")
+        cells = f.read(n_tuples * length)
+    tuples = [cells[t * length : (t + 1) * length] for t in range(n_tuples)]
+
+    size = n_tuples * TUPLE_VALUES**length
+    offset = _weights_offset(tuples)
+    if os.path.getsize(path) != offset + size * WEIGHTS_DTYPE.itemsize:
+        raise ValueError(f"{path} is truncated")
+    weights = np.memmap(
+        path, dtype=WEIGHTS_DTYPE, mode="r", offset=offset, shape=(size,)
+    )
+    if writable:
+        weights = np.array(weights)
+    return NTupleNetwork(tuples, weights)
+
+
+def play_episode(
+    network: NTupleNetwork,
+    rng: random.Random,
+    learning_rate=0.1,
+    trace_decay=0.0,
+    numbers_to_be_generated=(2, 4),
+):
+    """
+    Plays one self-play game greedily on bitboards and then learns from it,
+    walking the afterstates backwards towards their lambda-returns
+    (trace_decay is lambda, 0 gives TD(0) targets), see NTupleNetwork.learn
+    for learning_rate.
+    Returns (score, max tile).
+    """
+    bitboard = 0
+    for _ in range(2):
+        bitboard = bitboard_2048.spawn_tile(
+            bitboard, rng, numbers_to_be_generated
+        )
+
+    afterstates, rewards = [], []
+    score = 0
+    while True:
+        best = network.best_afterstate(bitboard)
+        if best is None:
+            break
+        _, afterstate, reward = best
+        afterstates.append(afterstate)
+        rewards.append(reward)
+        score += reward
+        bitboard = bitboard_2048.spawn_tile(
+            afterstate, rng, numbers_to_be_generated
+        )
+
+    # The last afterstate led to a lost game, its return is 0. rewards[t]
+    # was gained on the way into afterstates[t], so the return of
+    # afterstates[t] starts with rewards[t + 1].
+    target = 0.0
+    for t in range(len(afterstates) - 1, -1, -1):
+        value = network.learn(afterstates[t], target, learning_rate)
+        target = rewards[t] + (1 - trace_decay) * value + trace_decay * target
+    return score, bitboard_2048.exponent_to_tile(
+        bitboard_2048.max_exponent(bitboard)
+    )
+
+
+def train(
+    network: NTupleNetwork,
+    episodes: int,
+    learning_rate=0.1,
+    trace_decay=0.0,
+    seed=None,
+    log_every=1000,
+):
+    """
+    Trains network by self-play, logging the mean score every log_every
+    episodes. Returns the score of every episode.
+    """
+    rng = random.Random(seed)
+    scores = []
+    start = time.perf_counter()
+    for episode in range(1, episodes + 1):
+        score, _ = play_episode(network, rng, learning_rate, trace_decay)
+        scores.append(score)
+        if log_every and episode % log_every == 0:
+            recent = scores[-log_every:]
+            LOG.info(
+                "Episode %d: mean score %.1f, %.1f episodes/s",
+                episode,
+                sum(recent) / len(recent),
+                episode / (time.perf_counter() - start),
+            )
+    return scores
+
+
+class NTupleAIEngine(AIEngine2048):
+    """
+    Plays the move whose afterstate the n-tuple network values highest.
+    Without a network it loads the one at path, by default
+    $ZACKS_2048_NTUPLE_WEIGHTS then ~/.cache/zacks_2048/ntuple.bin, and
+    raises ValueError if there is none.
+    network.value also works as the evaluate function of
+    ExpectimaxAIEngine.
+    """
+
+    def __init__(self, network: NTupleNetwork = None, path: str = None):
+        if network is None:
+            path = path or os.environ.get(WEIGHTS_ENV_VAR)
+            path = path or DEFAULT_WEIGHTS_PATH
+            try:
+                network = load_network(path)
+            except (OSError, ValueError) as e:
+                raise ValueError(
+                    f"No n-tuple network ({e}), train one with "
+                    "zacks-2048-train-ntuple"
+                ) from e
+            LOG.debug("Loaded %s from %s", network, path)
+        self.network = network
+
+    def __repr__(self):
+        return f"N-Tuple AI Engine ({self.network})"
+
+    def fingerprint(self) -> str:
+        return f"N-Tuple AI Engine ({self.network.fingerprint()})"
+
+    def recommend_next_move(self, board) -> Keys2048:
+        """
+        Returns the best move for board, or Keys2048.LEFT if no move is legal
+        """
+        best = self.network.best_afterstate(bitboard_2048.to_bitboard(board))
+        return best[0] if best else Keys2048.LEFT
+
+    def recommend_batch(self, boards):
+        """
+        Like recommend_next_move for every board, valuing the afterstates
+        of all of them in one network call
+        """
+        # (board index, move, score, afterstate) of every legal move
+        candidates = []
+        for i, board in enumerate(boards):
+            afterstates, scores, legal = bitboard_2048.afterstates(
+                bitboard_2048.to_bitboard(board)
+            )
+            for k, move in enumerate(MOVES):
+                if legal >> k & 1:
+                    candidates.append((i, move, scores[k], afterstates[k]))
+        moves = [Keys2048.LEFT] * len(boards)
+        if not candidates:
+            return moves
+        best = [float("-inf")] * len(boards)
+        values = self.network.values(
+            [afterstate for *_, afterstate in candidates]
+        )
+        for (i, move, score, _), value in zip(candidates, values):
+            value = score + float(value)
+            if value > best[i]:
+                best[i], moves[i] = value, move
+        return moves
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Trains an n-tuple network by TD self-play"
+    )
+    parser.add_argument("-n", "--episodes", type=int, default=10_000)
+    parser.add_argument("--learning-rate", type=float, default=0.1)
+    parser.add_argument(
+        "--lambda", dest="trace_decay", type=float, default=0.0
+    )
+    parser.add_argument("--seed", type=int)
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=os.environ.get(WEIGHTS_ENV_VAR) or DEFAULT_WEIGHTS_PATH,
+    )
+    parser.add_argument(
+        "--resume", action="store_true", help="continue from --output"
+    )
+    parser.add_argument("--log-every", type=int, default=1000)
+    parser.add_argument("--log-level", default="INFO")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level)
+
+    if args.resume:
+        network = load_network(args.output, writable=True)
+    else:
+        network = NTupleNetwork()
+    LOG.info("Training %s for %d episodes", network, args.episodes)
+    train(
+        network,
+        args.episodes,
+        args.learning_rate,
+        args.trace_decay,
+        args.seed,
+        args.log_every,
+    )
+    save_network(network, args.output)
+    LOG.info("Saved %s to %s", network, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
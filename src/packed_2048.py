@@ -0,0 +1,311 @@
+from src import game_record_2048
+from src.afterstates_2048 import Afterstates
+from src.game_2048 import Game2048
+from src.utils import Keys2048
+
+# A board of any size packed into one arbitrary precision integer, one byte
+# per cell holding the log2 of its tile (0 for an empty cell). Cell (i, j)
+# is byte n * i + j of `rows`; `columns` holds the transposed board, cell
+# (i, j) at byte n * j + i, so vertical moves slide it exactly like
+# horizontal moves slide `rows`. Exponents stay below 128 so that the zero
+# byte tests below never carry into a neighbouring byte.
+
+CELL_BITS = 8
+CELL_MASK = 0xFF
+MAX_EXPONENT = 127
+
+# Row moves are memoised per grid size, entries are
+# (new row, score, new row spread over the other orientation)
+_MAX_ROW_CACHE = 1 << 20
+_row_caches = {}
+
+
+def tile_to_exponent(value: int) -> int:
+    if value == 0:
+        return 0
+    exponent = value.bit_length() - 1
+    if value != 1 << exponent or not 1 <= exponent <= MAX_EXPONENT:
+        raise ValueError(f"Tile {value} can not be packed")
+    return exponent
+
+
+def exponent_to_tile(exponent: int) -> int:
+    return 1 << exponent if exponent else 0
+
+
+def repeat_byte(byte: int, count: int) -> int:
+    """byte repeated in the count lowest bytes of an integer"""
+    return int.from_bytes(bytes((byte,)) * count, "little")
+
+
+def zero_bytes(packed: int, low_bits: int, high_bits: int) -> int:
+    """
+    Returns high_bits (0x80 in every byte of interest) restricted to the
+    bytes of packed that are zero. low_bits is 0x7F in the same bytes.
+    """
+    # A byte below 0x80 plus 0x7F sets its high bit unless it was 0
+    return ~(((packed & low_bits) + low_bits) | packed | low_bits) & high_bits
+
+
+def to_packed(board):
+    """Returns the (rows, columns) integers of a square list of lists"""
+    n = len(board)
+    if any(len(row) != n for row in board):
+        raise ValueError("Packed boards must be square")
+    exponents = [[tile_to_exponent(value) for value in row] for row in board]
+    rows = int.from_bytes(
+        bytes(e for row in exponents for e in row), "little"
+    )
+    columns = int.from_bytes(
+        bytes(e for column in zip(*exponents) for e in column), "little"
+    )
+    return rows, columns
+
+
+def from_packed(rows: int, grid_size: int):
+    cells = rows.to_bytes(grid_size * grid_size, "little")
+    return [
+        [exponent_to_tile(e) for e in cells[i : i + grid_size]]
+        for i in range(0, grid_size * grid_size, grid_size)
+    ]
+
+
+def _slide_row(row: int, grid_size: int, to_left: bool):
+    cells = list(row.to_bytes(grid_size, "little"))
+    if not to_left:
+        cells.reverse()
+    tiles = [e for e in cells if e]
+    merged = []
+    score = 0
+    i = 0
+    while i < len(tiles):
+        if i + 1 < len(tiles) and tiles[i] == tiles[i + 1]:
+            exponent = tiles[i] + 1
+            if exponent > MAX_EXPONENT:
+                raise ValueError("Tile too large to be packed")
+            merged.append(exponent)
+            score += 1 << exponent
+            i += 2
+        else:
+            merged.append(tiles[i])
+            i += 1
+    merged += [0] * (grid_size - len(merged))
+    if not to_left:
+        merged.reverse()
+    new_row = int.from_bytes(bytes(merged), "little")
+    spread = 0
+    for j, exponent in enumerate(merged):
+        spread |= exponent << (CELL_BITS * grid_size * j)
+    return new_row, score, spread
+
+
+def _row_cache(grid_size: int):
+    caches = _row_caches.get(grid_size)
+    if caches is None:
+        caches = _row_caches[grid_size] = ({}, {})
+    return caches
+
+
+def slide(packed: int, grid_size: int, to_left: bool):
+    """
+    Slides every row of packed to the left (or right).
+    Returns (new packed, new transposed packed, score).
+    """
+    left, right = _row_cache(grid_size)
+    cache = left if to_left else right
+    row_bits = CELL_BITS * grid_size
+    row_mask = (1 << row_bits) - 1
+    new_packed = new_transposed = score = 0
+    for i in range(grid_size):
+        row = (packed >> (row_bits * i)) & row_mask
+        entry = cache.get(row)
+        if entry is None:
+            if len(cache) >= _MAX_ROW_CACHE:
+                cache.clear()
+            entry = cache[row] = _slide_row(row, grid_size, to_left)
+        new_row, row_score, spread = entry
+        new_packed |= new_row << (row_bits * i)
+        new_transposed |= spread << (CELL_BITS * i)
+        score += row_score
+    return new_packed, new_transposed, score
+
+
+class PackedGame2048(Game2048):
+    """
+    Game2048 on packed integers (see above), for any grid size and tiles up
+    to 2**127. Every move is one memoised table lookup per row, and the end
+    of game checks are a handful of whole board integer operations.
+    Like BitboardGame2048, every read of `board` decodes a fresh copy.
+    """
+
+    def __init__(
+        self,
+        grid_size=4,
+        board=None,
+        numbers_to_be_generated=(2, 4),
+        max_score=2048,
+        ai_engine=None,
+        seed=None,
+        rng=None,
+    ):
+        for number in numbers_to_be_generated:
+            tile_to_exponent(number)
+        self._win_exponent = tile_to_exponent(max_score)
+        cells = grid_size * grid_size
+        self._low_bits = repeat_byte(0x7F, cells)
+        self._high_bits = repeat_byte(0x80, cells)
+        # Pairs (i, j), (i, j + 1) are tested at byte (i, j), never j = n - 1
+        self._pair_bits = self._high_bits & ~sum(
+            0x80 << (CELL_BITS * (grid_size * i + grid_size - 1))
+            for i in range(grid_size)
+        )
+        self.rows = self.columns = 0
+        super().__init__(
+            grid_size=grid_size,
+            board=board,
+            numbers_to_be_generated=numbers_to_be_generated,
+            max_score=max_score,
+            ai_engine=ai_engine,
+            seed=seed,
+            rng=rng,
+        )
+
+    @property
+    def board(self):
+        return from_packed(self.rows, self.grid_size)
+
+    @board.setter
+    def board(self, board):
+        if len(board) != self.grid_size:
+            raise ValueError(f"Expected a {self.grid_size}x{self.grid_size}")
+        self.rows, self.columns = to_packed(board)
+        self._start_history()
+
+    def _empty_cells(self):
+        """Row-major indices of the empty cells"""
+        zeros = zero_bytes(self.rows, self._low_bits, self._high_bits)
+        cells = []
+        while zeros:
+            lowest = zeros & -zeros
+            cells.append((lowest.bit_length() - 1) >> 3)
+            zeros ^= lowest
+        return cells
+
+    def generate_tile(self) -> None:
+        empty_cells = self._empty_cells()
+        if empty_cells:
+            # The same draws as Game2048.generate_tile
+            cell = empty_cells[self.rng.randrange(len(empty_cells))]
+            num_generated = self.rng.choice(self.numbers_to_be_generated)
+            x, y = divmod(cell, self.grid_size)
+            self.place_tile(x, y, num_generated)
+
+    def place_tile(self, x, y, value) -> None:
+        n = self.grid_size
+        exponent = tile_to_exponent(value)
+        row_shift = CELL_BITS * (n * x + y)
+        column_shift = CELL_BITS * (n * y + x)
+        self.rows = self.rows & ~(CELL_MASK << row_shift) | (
+            exponent << row_shift
+        )
+        self.columns = self.columns & ~(CELL_MASK << column_shift) | (
+            exponent << column_shift
+        )
+        if self._recording:
+            self.history.append(
+                game_record_2048.spawn_byte(
+                    n * x + y,
+                    self.numbers_to_be_generated.index(value),
+                    len(self.numbers_to_be_generated),
+                )
+            )
+
+    def is_game_win(self):
+        target = self.rows ^ (self._win_exponent * (self._high_bits >> 7))
+        if zero_bytes(target, self._low_bits, self._high_bits):
+            self._end_game = 1
+            return True
+        return False
+
+    def is_game_over(self):
+        low, high, pairs = self._low_bits, self._high_bits, self._pair_bits
+        if zero_bytes(self.rows, low, high):
+            return False
+        # No empty cell left, so a zero byte of a xor is an equal pair
+        for packed in (self.rows, self.columns):
+            if zero_bytes(packed ^ (packed >> CELL_BITS), low, pairs):
+                return False
+        self._end_game = 2
+        return True
+
+    @property
+    def max_tile(self):
+        cells = self.grid_size * self.grid_size
+        return exponent_to_tile(max(self.rows.to_bytes(cells, "little")))
+
+    @property
+    def empty_count(self):
+        return zero_bytes(
+            self.rows, self._low_bits, self._high_bits
+        ).bit_count()
+
+    def _slide(self, move_key, to_left, vertical):
+        if self._recording:
+            self.history.append(game_record_2048.move_byte(move_key))
+        if vertical:
+            columns, rows, score = slide(
+                self.columns, self.grid_size, to_left
+            )
+        else:
+            rows, columns, score = slide(self.rows, self.grid_size, to_left)
+        is_changed = rows != self.rows
+        self.rows, self.columns = rows, columns
+        self.score += score
+        return is_changed
+
+    def move_left(self):
+        return self._slide(Keys2048.LEFT, to_left=True, vertical=False)
+
+    def move_right(self):
+        return self._slide(Keys2048.RIGHT, to_left=False, vertical=False)
+
+    def move_up(self):
+        return self._slide(Keys2048.UP, to_left=True, vertical=True)
+
+    def move_down(self):
+        return self._slide(Keys2048.DOWN, to_left=False, vertical=True)
+
+    def _transpose(self):
+        self.rows, self.columns = self.columns, self.rows
+
+    def _packed_afterstates(self):
+        """Afterstates with the boards as packed rows integers"""
+        n = self.grid_size
+        boards = []
+        scores = []
+        legal = 0
+        for k, (packed, to_left) in enumerate(
+            (
+                (self.rows, True),
+                (self.rows, False),
+                (self.columns, True),
+                (self.columns, False),
+            )
+        ):
+            new_packed, new_transposed, score = slide(packed, n, to_left)
+            if new_packed != packed:
+                legal |= 1 << k
+            boards.append(new_packed if k < 2 else new_transposed)
+            scores.append(score)
+        return Afterstates(tuple(boards), tuple(scores), legal)
+
+    def afterstates(self):
+        rows, scores, legal = self._packed_afterstates()
+        return Afterstates(
+            tuple(from_packed(packed, self.grid_size) for packed in rows),
+            scores,
+            legal,
+        )
+
+    def legal_moves(self) -> int:
+        return self._packed_afterstates().legal
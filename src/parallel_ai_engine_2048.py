@@ -0,0 +1,160 @@
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from src.base_ai_engine_2048 import AIEngine2048, fingerprint
+from src import bitboard_2048
+from src.utils import Keys2048
+
+LOG = logging.getLogger(__name__)
+
+# Engine of the current worker process, set once by the pool initializer so
+# that it (and any tables it holds) is shipped to every worker only once
+_worker_engine = None
+
+
+def _init_worker(engine: AIEngine2048) -> None:
+    global _worker_engine
+    _worker_engine = engine
+
+
+def _score_bitboards(bitboards, deadline):
+    values = []
+    for i, bitboard in enumerate(bitboards):
+        time_budget = None
+        if deadline is not None:
+            # Boards left in the chunk share what is left of the move's budget
+            time_budget = max(0.0, deadline - time.time()) / (
+                len(bitboards) - i
+            )
+        values.append(
+            _worker_engine.score_position(
+                bitboard_2048.from_bitboard(bitboard), time_budget=time_budget
+            )
+        )
+    return values
+
+
+class ParallelAIEngine(AIEngine2048):
+    """
+    Wraps an engine implementing score_position and searches the root in
+    parallel: every (legal move, spawn outcome) pair at the root becomes one
+    task for a persistent ProcessPoolExecutor, so up to
+    4 * empty cells * len(numbers_to_be_generated) cores can be kept busy.
+    Boards travel as 64-bit bitboards. Engines without score_position, and
+    boards a bitboard can not hold, are delegated to the wrapped engine.
+    All tasks of a move share the wrapped engine's time_budget, if it has
+    one, so a move takes about as long as it would serially.
+    """
+
+    def __init__(
+        self,
+        engine: AIEngine2048,
+        max_workers=None,
+        numbers_to_be_generated=(2, 4),
+    ):
+        self.engine = engine
+        self.max_workers = max_workers or os.cpu_count()
+        self.numbers_to_be_generated = numbers_to_be_generated
+        self._spawn_exponents = [
+            bitboard_2048.tile_to_exponent(number)
+            for number in numbers_to_be_generated
+        ]
+        self._pool = None
+
+    def __repr__(self):
+        return f"Parallel {self.engine} on {self.max_workers} workers"
+
+    def fingerprint(self) -> str:
+        return (
+            f"Parallel {fingerprint(self.engine)} "
+            f"numbers={self.numbers_to_be_generated!r}"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        return state
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            LOG.info("Starting %d search workers", self.max_workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self.engine,),
+            )
+        return self._pool
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _to_bitboard(self, board):
+        if type(self.engine).score_position is AIEngine2048.score_position:
+            return None
+        try:
+            return bitboard_2048.to_bitboard(board)
+        except ValueError:
+            return None
+
+    def recommend_next_move(self, board) -> Keys2048:
+        """
+        Returns the move with the best expected value at the deepest depth
+        every root task finished, or Keys2048.LEFT if no move is legal
+        """
+        bitboard = self._to_bitboard(board)
+        if bitboard is None:
+            return self.engine.recommend_next_move(board)
+        time_budget = getattr(self.engine, "time_budget", None)
+        # An absolute wall clock time, the same in every worker process
+        deadline = None if time_budget is None else time.time() + time_budget
+
+        roots = []  # (move, score gained, number of spawn outcomes)
+        tasks = []
+        for move_key, move in bitboard_2048.MOVES:
+            afterstate, score = move(bitboard)
+            if afterstate == bitboard:
+                continue
+            cells = bitboard_2048.empty_cells(afterstate)
+            for cell in cells:
+                for exponent in self._spawn_exponents:
+                    tasks.append(afterstate | exponent << (4 * cell))
+            roots.append(
+                (move_key, score, len(cells) * len(self._spawn_exponents))
+            )
+        if not roots:
+            return Keys2048.LEFT
+
+        chunk_size = -(-len(tasks) // self.max_workers)
+        chunks = [
+            tasks[i : i + chunk_size]
+            for i in range(0, len(tasks), chunk_size)
+        ]
+        results = [
+            values
+            for chunk_values in self.pool.map(
+                _score_bitboards, chunks, itertools.repeat(deadline)
+            )
+            for values in chunk_values
+        ]
+        depth = min(len(values) for values in results)
+
+        best_move, best_value = None, float("-inf")
+        start = 0
+        for move_key, score, outcomes in roots:
+            spawned = results[start : start + outcomes]
+            start += outcomes
+            value = score + sum(v[depth - 1] for v in spawned) / outcomes
+            if value > best_value:
+                best_move, best_value = move_key, value
+        return best_move
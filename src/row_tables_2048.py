@@ -0,0 +1,189 @@
+import logging
+import os
+import sys
+from array import array
+from typing import NamedTuple
+
+LOG = logging.getLogger(__name__)
+
+# A 4-cell row in log2 encoding fits in 16 bits (one nibble per cell, cell j
+# in bits [4 * j, 4 * j + 4)), so every possible row can be slid once up
+# front and every later move becomes a handful of table lookups.
+
+ROW_LENGTH = 4
+ROW_COUNT = 1 << 16
+ROW_MASK = 0xFFFF
+NIBBLE_MASK = 0xF
+MAX_EXPONENT = 0xF
+
+TILES = [0] + [1 << exponent for exponent in range(1, MAX_EXPONENT + 1)]
+
+# Tiles encode_row accepts. 32768 is left out on purpose: two of them
+# would merge into 65536, which a nibble can not hold.
+ROW_EXPONENTS = {tile: exponent for exponent, tile in enumerate(TILES[:-1])}
+
+CACHE_ENV_VAR = "ZACKS_2048_ROW_TABLES"
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "zacks_2048", "row_tables.bin"
+)
+_CACHE_MAGIC = b"R2048T01"
+
+
+class RowTables(NamedTuple):
+    left: array  # row -> row slid to the left
+    right: array  # row -> row slid to the right
+    score: array  # row -> sum of merged tiles, the same in both directions
+    changed_left: array  # row -> 1 if sliding left changes the row
+    changed_right: array  # row -> 1 if sliding right changes the row
+
+
+def reverse_row(row: int) -> int:
+    """
+    Mirrors the four nibbles of a 16-bit row: [a, b, c, d] -> [d, c, b, a]
+    """
+    return (
+        ((row & 0x000F) << 12)
+        | ((row & 0x00F0) << 4)
+        | ((row >> 4) & 0x00F0)
+        | ((row >> 12) & 0x000F)
+    )
+
+
+def slide_row_left(row: int):
+    """
+    Slides a 16-bit row to the left, merging each equal pair at most once,
+    exactly like Game2048.slide_row_left.
+    Returns (new_row, score) where score is the sum of the merged tiles.
+    """
+    new_row = 0
+    score = 0
+    target = 0  # nibble position the next tile is written to
+    pending = 0  # exponent waiting for a possible merge, 0 if none
+    for j in range(ROW_LENGTH):
+        exponent = (row >> (4 * j)) & NIBBLE_MASK
+        if not exponent:
+            continue
+        # Two 32768 tiles have nowhere to merge into, so they stay apart
+        if exponent == pending and exponent < MAX_EXPONENT:
+            new_row |= (exponent + 1) << (4 * target)
+            score += 1 << (exponent + 1)
+            target += 1
+            pending = 0
+        else:
+            if pending:
+                new_row |= pending << (4 * target)
+                target += 1
+            pending = exponent
+    if pending:
+        new_row |= pending << (4 * target)
+    return new_row, score
+
+
+def slide_row_right(row: int):
+    new_row, score = slide_row_left(reverse_row(row))
+    return reverse_row(new_row), score
+
+
+def encode_row(row) -> int:
+    """
+    Packs a list of four tiles into a 16-bit row.
+    Raises KeyError for tiles that have no table entry.
+    """
+    return (
+        ROW_EXPONENTS[row[0]]
+        | ROW_EXPONENTS[row[1]] << 4
+        | ROW_EXPONENTS[row[2]] << 8
+        | ROW_EXPONENTS[row[3]] << 12
+    )
+
+
+def decode_row(row: int):
+    return [
+        TILES[row & NIBBLE_MASK],
+        TILES[(row >> 4) & NIBBLE_MASK],
+        TILES[(row >> 8) & NIBBLE_MASK],
+        TILES[(row >> 12) & NIBBLE_MASK],
+    ]
+
+
+def build_row_tables() -> RowTables:
+    left = array("H", bytes(2 * ROW_COUNT))
+    right = array("H", bytes(2 * ROW_COUNT))
+    score = array("I", bytes(4 * ROW_COUNT))
+    changed_left = array("B", bytes(ROW_COUNT))
+    changed_right = array("B", bytes(ROW_COUNT))
+    for row in range(ROW_COUNT):
+        left[row], score[row] = slide_row_left(row)
+        right[row], _ = slide_row_right(row)
+        changed_left[row] = left[row] != row
+        changed_right[row] = right[row] != row
+    return RowTables(left, right, score, changed_left, changed_right)
+
+
+def save_row_tables(tables: RowTables, path: str) -> None:
+    """
+    Writes the tables to path atomically, so concurrent processes never see
+    a half written file
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_CACHE_MAGIC)
+        for table in tables:
+            if sys.byteorder == "big":
+                table = array(table.typecode, table)
+                table.byteswap()
+            table.tofile(f)
+    os.replace(tmp_path, path)
+
+
+def load_row_tables(path: str) -> RowTables:
+    """
+    Reads tables written by save_row_tables.
+    Raises ValueError if the file is not a complete table cache.
+    """
+    tables = []
+    with open(path, "rb") as f:
+        if f.read(len(_CACHE_MAGIC)) != _CACHE_MAGIC:
+            raise ValueError(f"{path} is not a row table cache")
+        try:
+            for typecode in ("H", "H", "I", "B", "B"):
+                table = array(typecode)
+                table.fromfile(f, ROW_COUNT)
+                if sys.byteorder == "big":
+                    table.byteswap()
+                tables.append(table)
+        except EOFError:
+            raise ValueError(f"{path} is truncated")
+    return RowTables(*tables)
+
+
+_row_tables = None
+
+
+def get_row_tables(path: str = None) -> RowTables:
+    """
+    Returns the process wide row tables, loading them from the on-disk cache
+    or building (and caching) them on first use.
+    The cache location defaults to $ZACKS_2048_ROW_TABLES, then
+    ~/.cache/zacks_2048/row_tables.bin
+    """
+    global _row_tables
+    if _row_tables is not None:
+        return _row_tables
+
+    path = path or os.environ.get(CACHE_ENV_VAR) or DEFAULT_CACHE_PATH
+    try:
+        _row_tables = load_row_tables(path)
+        LOG.debug("Loaded row tables from %s", path)
+        return _row_tables
+    except (OSError, ValueError) as e:
+        LOG.debug("Could not load row tables from %s: %s", path, e)
+
+    _row_tables = build_row_tables()
+    try:
+        save_row_tables(_row_tables, path)
+        LOG.debug("Saved row tables to %s", path)
+    except OSError as e:
+        LOG.warning("Could not save row tables to %s: %s", path, e)
+    return _row_tables
@@ -0,0 +1,403 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.base_ai_engine_2048 import AIEngine2048
+from src.engines_2048 import ENGINES, create_engine
+from src.metrics_2048 import Metrics
+from src.utils import Keys2048
+
+LOG = logging.getLogger(__name__)
+
+# Clients and server talk in JSON lines over a Unix socket:
+#
+#   {"board": [[0, 2, ...], ...]}   ->  {"move": "left"}
+#   {"stats": true}                 ->  {"queue_depth": 0, ...}
+#
+# and any request that can not be answered gets {"error": "..."} back.
+
+SOCKET_ENV_VAR = "ZACKS_2048_SOCKET"
+DEFAULT_SOCKET_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "zacks_2048", "engine.sock"
+)
+LATENCY = "server_request_seconds"
+BATCH_LATENCY = "server_batch_seconds"
+
+
+def socket_path(path: str = None) -> str:
+    """path, else $ZACKS_2048_SOCKET, else the default socket path"""
+    return path or os.environ.get(SOCKET_ENV_VAR) or DEFAULT_SOCKET_PATH
+
+
+def _check_board(board):
+    if (
+        not isinstance(board, list)
+        or not board
+        or any(
+            not isinstance(row, list)
+            or len(row) != len(board)
+            or not all(isinstance(v, int) and v >= 0 for v in row)
+            for row in board
+        )
+    ):
+        raise ValueError("A board is a square list of lists of tiles")
+
+
+class RecommendationServer:
+    """
+    Serves one engine's recommendations on a Unix socket. Requests arriving
+    within max_wait seconds of each other, or while the engine is busy with
+    the previous batch, are answered together by one
+    engine.recommend_batch call of up to max_batch boards (identical boards
+    are only evaluated once). The engine runs on a single worker thread, so
+    it never sees two batches at once.
+    """
+
+    def __init__(
+        self,
+        engine: AIEngine2048,
+        path: str = None,
+        max_batch=64,
+        max_wait=0.002,
+    ):
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.engine = engine
+        self.path = socket_path(path)
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.metrics = Metrics()
+        # Writer and handler task of every connected client
+        self._clients = {}
+        self._queue = None
+        self._server = None
+        self._batcher = None
+        self._stopped = None
+        self._loop = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def __repr__(self):
+        return f"RecommendationServer({self.engine} on {self.path})"
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> dict:
+        """Queue depth, request and batch counts and latencies"""
+        counters = self.metrics.counters
+        requests = counters[("server_requests_total", ())]
+        batches = counters[("server_batches_total", ())]
+        latency = self.metrics.histograms.get((LATENCY, ()))
+        return {
+            "queue_depth": self.queue_depth,
+            "clients": len(self._clients),
+            "requests": requests,
+            "errors": counters[("server_errors_total", ())],
+            "batches": batches,
+            "mean_batch_size": requests / batches if batches else 0.0,
+            "latency_ms": {
+                "p50": latency.quantile(0.5) * 1000 if latency else 0.0,
+                "p99": latency.quantile(0.99) * 1000 if latency else 0.0,
+            },
+        }
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._stopped = asyncio.Event()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if os.path.exists(self.path):
+            if _is_served(self.path):
+                raise ValueError(f"A server is already running on {self.path}")
+            # Left behind by a server that did not shut down cleanly
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(
+            self._handle_client, self.path
+        )
+        self._batcher = asyncio.create_task(self._batch_loop())
+        LOG.info("Serving %s on %s", self.engine, self.path)
+
+    async def close(self) -> None:
+        self._server.close()
+        # Hanging up makes every handler read EOF and return
+        for writer in self._clients:
+            writer.close()
+        await asyncio.gather(*self._clients.values())
+        await self._server.wait_closed()
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        self._executor.shutdown()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def serve_forever(self, ready: threading.Event = None) -> None:
+        """Serves until shutdown(), setting ready once accepting clients"""
+        await self.start()
+        if threading.current_thread() is threading.main_thread():
+            self._loop.add_signal_handler(signal.SIGTERM, self._stopped.set)
+        if ready is not None:
+            ready.set()
+        try:
+            await self._stopped.wait()
+        finally:
+            await self.close()
+
+    def shutdown(self) -> None:
+        """Stops serve_forever, callable from any thread"""
+        self._loop.call_soon_threadsafe(self._stopped.set)
+
+    async def recommend(self, board) -> Keys2048:
+        """Queues board for the next batch and waits for its move"""
+        future = self._loop.create_future()
+        await self._queue.put((board, future))
+        return await future
+
+    async def _handle_client(self, reader, writer) -> None:
+        self._clients[writer] = asyncio.current_task()
+        try:
+            while line := await reader.readline():
+                response = await self._respond(line)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self._clients[writer]
+            writer.close()
+
+    async def _respond(self, line: bytes) -> dict:
+        start = time.perf_counter()
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Requests are JSON objects")
+            if request.get("stats"):
+                return self.stats()
+            board = request.get("board")
+            _check_board(board)
+            self.metrics.inc("server_requests_total")
+            move = await self.recommend(board)
+        except Exception as e:
+            self.metrics.inc("server_errors_total")
+            return {"error": str(e)}
+        self.metrics.observe(LATENCY, time.perf_counter() - start)
+        return {"move": str(move)}
+
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            if self._queue.empty():
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+            else:
+                batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _batch_loop(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            start = time.perf_counter()
+            # Identical boards are evaluated once
+            keys = [tuple(map(tuple, board)) for board, _ in batch]
+            unique = list(dict.fromkeys(keys))
+            try:
+                moves = await self._loop.run_in_executor(
+                    self._executor, self._recommend_batch, unique
+                )
+            except Exception as e:
+                LOG.exception("Engine failed on a batch")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.metrics.inc("server_batches_total")
+            self.metrics.observe(BATCH_LATENCY, time.perf_counter() - start)
+            results = dict(zip(unique, moves))
+            for key, (_, future) in zip(keys, batch):
+                result = results[key]
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _recommend_batch(self, keys):
+        """
+        Runs on the engine thread. A board the engine rejects fails alone,
+        the rest of its batch is answered one by one.
+        """
+        boards = [[list(row) for row in key] for key in keys]
+        try:
+            return self.engine.recommend_batch(boards)
+        except Exception:
+            if len(boards) == 1:
+                raise
+        results = []
+        for board in boards:
+            try:
+                results.append(self.engine.recommend_next_move(board))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+def _is_served(path: str) -> bool:
+    """Whether a server accepts connections on the socket at path"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+    return True
+
+
+class RemoteAIEngine(AIEngine2048):
+    """
+    Engine answering from a RecommendationServer, so the engine is loaded
+    once by the server instead of by every client. Connects on first use
+    and keeps the connection open; safe to share between threads.
+    """
+
+    def __init__(self, path: str = None, timeout=30.0):
+        self.path = socket_path(path)
+        self.timeout = timeout
+        self._socket = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Remote AI Engine on {self.path}"
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_socket"] = state["_reader"] = state["_lock"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self._socket, self._reader = sock, sock.makefile("rb")
+
+    def _exchange(self, data: bytes) -> bytes:
+        try:
+            self._socket.sendall(data)
+            line = self._reader.readline()
+        except OSError:
+            self._close()
+            raise
+        if not line:
+            self._close()
+            raise ConnectionError(f"Server on {self.path} hung up")
+        return line
+
+    def _call(self, request: dict) -> dict:
+        data = json.dumps(request).encode() + b"\n"
+        with self._lock:
+            if self._socket is None:
+                self._connect()
+                line = self._exchange(data)
+            else:
+                try:
+                    line = self._exchange(data)
+                except (ConnectionError, FileNotFoundError):
+                    # The server restarted since the last call, retry once.
+                    # Not on timeouts: the server may still answer, and
+                    # would then evaluate the request twice.
+                    self._connect()
+                    line = self._exchange(data)
+        response = json.loads(line)
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response
+
+    def recommend_next_move(self, board) -> Keys2048:
+        response = self._call({"board": [list(row) for row in board]})
+        return Keys2048(response["move"])
+
+    def stats(self) -> dict:
+        """The server's RecommendationServer.stats()"""
+        return self._call({"stats": True})
+
+    def _close(self) -> None:
+        if self._socket is not None:
+            self._reader.close()
+            self._socket.close()
+            self._socket = self._reader = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serves AI engine recommendations on a Unix socket"
+    )
+    parser.add_argument(
+        "-e", "--engine", choices=sorted(ENGINES), default="expectimax"
+    )
+    parser.add_argument(
+        "--socket",
+        help=f"socket path (default ${SOCKET_ENV_VAR} or "
+        f"{DEFAULT_SOCKET_PATH})",
+    )
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=2.0,
+        help="how long a request waits for others to batch with",
+    )
+    parser.add_argument("--log-level", default="INFO")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level)
+    server = RecommendationServer(
+        create_engine(args.engine),
+        args.socket,
+        max_batch=args.max_batch,
+        max_wait=args.max_wait_ms / 1000,
+    )
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    except ValueError as e:
+        sys.exit(str(e))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+from src.bitboard_2048 import transpose
+from src.utils import Keys2048
+
+# A transform is a 3 bit code applied in this order: mirror every row
+# left/right, mirror the rows top/bottom, then transpose. The 8 codes are
+# the 8 rotations and reflections of a square board.
+FLIP_ROWS = 1
+FLIP_COLUMNS = 2
+TRANSPOSE = 4
+IDENTITY = 0
+TRANSFORMS = range(8)
+
+_MIRRORED = {
+    FLIP_ROWS: {Keys2048.LEFT: Keys2048.RIGHT, Keys2048.RIGHT: Keys2048.LEFT},
+    FLIP_COLUMNS: {Keys2048.UP: Keys2048.DOWN, Keys2048.DOWN: Keys2048.UP},
+    TRANSPOSE: {
+        Keys2048.LEFT: Keys2048.UP,
+        Keys2048.UP: Keys2048.LEFT,
+        Keys2048.RIGHT: Keys2048.DOWN,
+        Keys2048.DOWN: Keys2048.RIGHT,
+    },
+}
+
+MASK = 0xFFFFFFFFFFFFFFFF
+
+
+def flip_rows(bitboard: int) -> int:
+    """Mirrors a bitboard left/right, nibble (i, j) -> (i, 3 - j)"""
+    # Swap the nibbles of every byte, then the bytes of every row
+    low, high = bitboard & 0x0F0F0F0F0F0F0F0F, bitboard >> 4
+    bitboard = low << 4 | high & 0x0F0F0F0F0F0F0F0F
+    low, high = bitboard & 0x00FF00FF00FF00FF, bitboard >> 8
+    return low << 8 | high & 0x00FF00FF00FF00FF
+
+
+def flip_columns(bitboard: int) -> int:
+    """Mirrors a bitboard top/bottom, nibble (i, j) -> (3 - i, j)"""
+    # Swap the rows of every half, then the halves
+    low, high = bitboard & 0x0000FFFF0000FFFF, bitboard >> 16
+    bitboard = low << 16 | high & 0x0000FFFF0000FFFF
+    return (bitboard << 32 | bitboard >> 32) & MASK
+
+
+def transform_bitboard(bitboard: int, transform: int) -> int:
+    if transform & FLIP_ROWS:
+        bitboard = flip_rows(bitboard)
+    if transform & FLIP_COLUMNS:
+        bitboard = flip_columns(bitboard)
+    if transform & TRANSPOSE:
+        bitboard = transpose(bitboard)
+    return bitboard
+
+
+def symmetric_bitboards(bitboard: int):
+    """All 8 images of bitboard, indexed by transform"""
+    rows = flip_rows(bitboard)
+    images = [bitboard, rows, flip_columns(bitboard), flip_columns(rows)]
+    return images + [transpose(image) for image in images]
+
+
+def canonical_bitboard(bitboard: int):
+    """
+    Returns (canonical, transform): the smallest of the 8 images of
+    bitboard, which all its rotations and reflections share, and the
+    transform that maps bitboard onto it
+    """
+    images = symmetric_bitboards(bitboard)
+    canonical = min(images)
+    return canonical, images.index(canonical)
+
+
+def canonical_key(bitboard: int) -> int:
+    """canonical_bitboard without the transform, for cache keys"""
+    rows = flip_rows(bitboard)
+    columns = flip_columns(bitboard)
+    both = flip_columns(rows)
+    return min(
+        bitboard,
+        rows,
+        columns,
+        both,
+        transpose(bitboard),
+        transpose(rows),
+        transpose(columns),
+        transpose(both),
+    )
+
+
+def transform_board(board, transform: int):
+    """transform_bitboard for list boards of any size, returns a copy"""
+    board = [list(row) for row in board]
+    if transform & FLIP_ROWS:
+        board = [row[::-1] for row in board]
+    if transform & FLIP_COLUMNS:
+        board = board[::-1]
+    if transform & TRANSPOSE:
+        board = [list(column) for column in zip(*board)]
+    return board
+
+
+def canonical_board(board):
+    """
+    canonical_bitboard for list boards of any size, ordering images as
+    tuples of rows. Returns (canonical board, transform).
+    """
+    images = [transform_board(board, transform) for transform in TRANSFORMS]
+    transform = min(TRANSFORMS, key=lambda t: images[t])
+    return images[transform], transform
+
+
+def inverse(transform: int) -> int:
+    """The transform undoing transform"""
+    if not transform & TRANSPOSE:
+        return transform
+    # Transposing turns a row mirror into a column mirror and back
+    flips = 0
+    if transform & FLIP_ROWS:
+        flips |= FLIP_COLUMNS
+    if transform & FLIP_COLUMNS:
+        flips |= FLIP_ROWS
+    return TRANSPOSE | flips
+
+
+def transform_move(move: Keys2048, transform: int) -> Keys2048:
+    """
+    The move on the transformed board that matches move on the original
+    board
+    """
+    for step in (FLIP_ROWS, FLIP_COLUMNS, TRANSPOSE):
+        if transform & step:
+            move = _MIRRORED[step].get(move, move)
+    return move
+
+
+def move_from_canonical(move: Keys2048, transform: int) -> Keys2048:
+    """
+    Maps a move recommended for the canonical board back to the board that
+    canonical_bitboard/canonical_board returned transform for
+    """
+    return transform_move(move, inverse(transform))
+
+
+class SymmetryProbe:
+    """
+    Measures what canonical keys buy a cache: every observed bitboard is
+    looked up in two unbounded key sets, one keyed by the board itself and
+    one by its canonical form, counting the hits of each
+    """
+
+    def __init__(self):
+        self.lookups = 0
+        self.raw_hits = 0
+        self.canonical_hits = 0
+        self._raw_keys = set()
+        self._canonical_keys = set()
+
+    def __repr__(self):
+        return (
+            f"SymmetryProbe({self.lookups} lookups, hit rate "
+            f"{self.raw_hit_rate:.1%} raw, "
+            f"{self.canonical_hit_rate:.1%} canonical)"
+        )
+
+    def observe(self, bitboard: int) -> None:
+        self.lookups += 1
+        if bitboard in self._raw_keys:
+            self.raw_hits += 1
+        else:
+            self._raw_keys.add(bitboard)
+        key = canonical_key(bitboard)
+        if key in self._canonical_keys:
+            self.canonical_hits += 1
+        else:
+            self._canonical_keys.add(key)
+
+    @property
+    def raw_hit_rate(self) -> float:
+        return self.raw_hits / self.lookups if self.lookups else 0.0
+
+    @property
+    def canonical_hit_rate(self) -> float:
+        return self.canonical_hits / self.lookups if self.lookups else 0.0
+
+    def summary(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "raw_hit_rate": self.raw_hit_rate,
+            "canonical_hit_rate": self.canonical_hit_rate,
+            "raw_entries": len(self._raw_keys),
+            "canonical_entries": len(self._canonical_keys),
+        }
@@ -0,0 +1,552 @@
+import argparse
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+import numpy as np
+from src.afterstates_2048 import MOVES, legal_moves, moves_from_mask
+from src.base_ai_engine_2048 import AIEngine2048, Analysis, fingerprint
+from src.batch_game_2048 import afterstates
+from src.engines_2048 import ENGINES, create_engine
+from src.utils import Keys2048
+
+LOG = logging.getLogger(__name__)
+
+# Positions are keyed like bitboards: the exponent of cell (i, j) in nibble
+# grid_size * i + j of a 64-bit integer, so the key of a 4x4 board is its
+# bitboard. Boards up to 4x4 with tiles up to 32768 have a key.
+MAX_GRID_SIZE = 4
+MAX_EXPONENT = 15
+_SHIFTS = 4 * np.arange(MAX_GRID_SIZE**2, dtype=np.uint64)
+
+# A table file is a header, then an open addressing hash table of capacity
+# slots (a power of two, at most half full) stored as three arrays: keys
+# (uint64, 0 for a free slot, no position has key 0), win probabilities
+# (uint16 fixed point, UNKNOWN in opening books) and moves (uint8 index
+# into MOVES, NO_MOVE for positions that are won or lost already). A key
+# lives in the first slot at or after its _hash_slots slot that is not
+# taken by another key.
+MAGIC = b"Z48T"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBBH2xQQ")
+DATA_OFFSET = 64
+NO_MOVE = 0xFF
+UNKNOWN = 0xFFFF
+PROBABILITY_SCALE = UNKNOWN - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_MASK = (1 << 64) - 1
+# Positions expanded per NumPy call, bounding memory to ~100 MB
+CHUNK = 1 << 15
+# Opening book positions searched per engine.recommend_batch call
+BOOK_BATCH = 256
+
+
+class Table(NamedTuple):
+    grid_size: int
+    max_score: int  # win tile of a tablebase, None for an opening book
+    numbers_to_be_generated: tuple
+    plies: int  # depth of an opening book, None for a tablebase
+    keys: np.ndarray  # sorted position keys
+    moves: np.ndarray  # index into MOVES of each best move, or NO_MOVE
+    probabilities: np.ndarray  # win probabilities, NaN in opening books
+
+
+def _exponent(tile: int, what="Tile") -> int:
+    exponent = tile.bit_length() - 1
+    if tile != 1 << exponent or not 1 <= exponent <= MAX_EXPONENT:
+        raise ValueError(f"{what} {tile} is not a power of two up to 32768")
+    return exponent
+
+
+def board_key(board) -> int:
+    """
+    Key of a square list of lists board, None if the board has no key
+    (larger than 4x4, or tiles that are no powers of two up to 32768)
+    """
+    key = 0
+    shift = 0
+    if len(board) > MAX_GRID_SIZE:
+        return None
+    for row in board:
+        if len(row) != len(board):
+            return None
+        for tile in row:
+            if tile:
+                exponent = tile.bit_length() - 1
+                if tile != 1 << exponent or exponent > MAX_EXPONENT:
+                    return None
+                key |= exponent << shift
+            shift += 4
+    return key
+
+
+def _exponents(keys, grid_size):
+    cells = grid_size * grid_size
+    return (keys[:, None] >> _SHIFTS[:cells] & np.uint64(0xF)).astype(np.int64)
+
+
+def _boards(keys, grid_size):
+    exponents = _exponents(keys, grid_size)
+    tiles = np.where(exponents > 0, np.left_shift(1, exponents), 0)
+    return tiles.reshape(-1, grid_size, grid_size)
+
+
+def _keys(boards):
+    flat = boards.reshape(len(boards), -1)
+    # frexp(2**e) is (0.5, e + 1), exact for every tile that has a key
+    exponents = np.maximum(np.frexp(flat)[1] - 1, 0).astype(np.uint64)
+    return (exponents << _SHIFTS[: flat.shape[1]]).sum(axis=1, dtype=np.uint64)
+
+
+def _successors(keys, grid_size, spawns):
+    """
+    Every position one move and spawn away from each of keys, as
+    (children (N, 4, cells, spawns), legal (N, 4, cells) true where the
+    child exists, legal move masks (N,)). spawns are spawn exponents.
+    """
+    n = len(keys)
+    cells = grid_size * grid_size
+    after, _, masks = afterstates(_boards(keys, grid_size))
+    after = after.reshape(n, len(MOVES), cells)
+    after_keys = _keys(after.reshape(-1, cells)).reshape(n, len(MOVES))
+    moved = (masks[:, None] >> np.arange(len(MOVES)) & 1).astype(bool)
+    legal = (after == 0) & moved[:, :, None]
+    children = after_keys[:, :, None, None] | (spawns << _SHIFTS[:cells, None])
+    return children, legal, masks
+
+
+def _chunks(keys):
+    for start in range(0, len(keys), CHUNK):
+        yield keys[start : start + CHUNK]
+
+
+def _spawn_exponents(numbers_to_be_generated):
+    return np.array(
+        [
+            _exponent(number, "Spawned number")
+            for number in numbers_to_be_generated
+        ],
+        dtype=np.uint64,
+    )
+
+
+def start_positions(grid_size=4):
+    """
+    Keys of every board Game2048.start_game can deal: any non empty set of
+    cells holding a 2
+    """
+    cells = grid_size * grid_size
+    subsets = np.arange(1, 1 << cells, dtype=np.uint64)
+    bits = subsets[:, None] >> np.arange(cells, dtype=np.uint64) & np.uint64(1)
+    return (bits << _SHIFTS[:cells]).sum(axis=1, dtype=np.uint64)
+
+
+def _levels(grid_size, max_score, numbers_to_be_generated):
+    """
+    Yields the reachable positions of each tile sum, in increasing order.
+    Every turn adds a spawned number to the tile sum, so all the parents of
+    a position come before it.
+    """
+    win = _exponent(max_score, "max_score")
+    spawns = _spawn_exponents(numbers_to_be_generated)
+    pending = {}
+    starts = start_positions(grid_size)
+    for count in range(1, grid_size * grid_size + 1):
+        pending[2 * count] = [starts[np.bitwise_count(starts) == count]]
+    while pending:
+        total = min(pending)
+        keys = np.unique(np.concatenate(pending.pop(total)))
+        yield keys
+        # Won positions end the game
+        playing = keys[~(_exponents(keys, grid_size) == win).any(axis=1)]
+        for chunk in _chunks(playing):
+            children, legal, _ = _successors(chunk, grid_size, spawns)
+            for k, number in enumerate(numbers_to_be_generated):
+                pending.setdefault(total + number, []).append(
+                    np.unique(children[..., k][legal])
+                )
+
+
+def reachable_positions(grid_size, max_score, numbers_to_be_generated=(2, 4)):
+    """Sorted keys of every position reachable from a start position"""
+    return np.sort(
+        np.concatenate(
+            list(_levels(grid_size, max_score, numbers_to_be_generated))
+        )
+    )
+
+
+def build_tablebase(
+    grid_size=3, max_score=32, numbers_to_be_generated=(2, 4)
+) -> Table:
+    """
+    Solves every position reachable from a start position by retrograde
+    expectimax: positions are valued from the highest tile sum down, so
+    every child is valued before its parents. A position is worth 1 once
+    won, 0 once over (checked first, like headless_2048 does) and otherwise
+    the best move's mean value over every spawn.
+    """
+    if not 2 <= grid_size <= MAX_GRID_SIZE:
+        raise ValueError(f"Tablebases cover grids of 2 to {MAX_GRID_SIZE}")
+    win = _exponent(max_score, "max_score")
+    spawns = _spawn_exponents(numbers_to_be_generated)
+    start = time.perf_counter()
+    levels = list(_levels(grid_size, max_score, numbers_to_be_generated))
+    keys = np.sort(np.concatenate(levels))
+    LOG.info(
+        "Found %d positions in %.1fs", len(keys), time.perf_counter() - start
+    )
+
+    probabilities = np.zeros(len(keys))
+    moves = np.full(len(keys), NO_MOVE, dtype=np.uint8)
+    for level in reversed(levels):
+        for chunk in _chunks(level):
+            index = np.searchsorted(keys, chunk)
+            children, legal, masks = _successors(chunk, grid_size, spawns)
+            won = (_exponents(chunk, grid_size) == win).any(axis=1)
+            legal &= ~won[:, None, None]
+            spawned = np.broadcast_to(legal[..., None], children.shape)
+            values = np.zeros(children.shape)
+            values[spawned] = probabilities[
+                np.searchsorted(keys, children[spawned])
+            ]
+            counts = legal.sum(axis=2) * len(spawns)
+            expected = values.sum(axis=(2, 3)) / np.maximum(counts, 1)
+            expected[counts == 0] = -1
+            playing = (masks != 0) & ~won
+            probabilities[index] = np.where(
+                playing, expected.max(axis=1), won & (masks != 0)
+            )
+            moves[index] = np.where(playing, expected.argmax(axis=1), NO_MOVE)
+    LOG.info("Solved in %.1fs", time.perf_counter() - start)
+    return Table(
+        grid_size,
+        max_score,
+        tuple(numbers_to_be_generated),
+        None,
+        keys,
+        moves,
+        probabilities,
+    )
+
+
+def opening_positions(plies, grid_size=4, numbers_to_be_generated=(2, 4)):
+    """Sorted keys of every position within plies moves of a start"""
+    spawns = _spawn_exponents(numbers_to_be_generated)
+    seen = frontier = np.sort(start_positions(grid_size))
+    for _ in range(plies):
+        found = [
+            np.unique(children[legal])
+            for chunk in _chunks(frontier)
+            for children, legal, _ in [_successors(chunk, grid_size, spawns)]
+        ]
+        frontier = np.setdiff1d(
+            np.unique(np.concatenate(found)), seen, assume_unique=True
+        )
+        seen = np.union1d(seen, frontier)
+    return seen
+
+
+# Engine of every opening book worker process, set by the pool initializer
+_worker_engine = None
+
+
+def _init_worker(engine: AIEngine2048) -> None:
+    global _worker_engine
+    _worker_engine = engine
+
+
+def _engine_moves(boards):
+    moves = _worker_engine.recommend_batch(boards)
+    return np.array([MOVES.index(move) for move in moves], dtype=np.int64)
+
+
+def build_opening_book(
+    plies,
+    engine: AIEngine2048,
+    grid_size=4,
+    numbers_to_be_generated=(2, 4),
+    processes=None,
+) -> Table:
+    """
+    The moves engine recommends for every position within plies moves of
+    a start position, searched once ahead of time. Positions are spread
+    over processes worker processes (all CPUs if 0, in this process if
+    None) in batches of BOOK_BATCH. Moves that would not change the board
+    are left out, for the fallback engine to decide.
+    """
+    start = time.perf_counter()
+    keys = opening_positions(plies, grid_size, numbers_to_be_generated)
+    LOG.info("Searching %d book positions", len(keys))
+    masks = np.concatenate(
+        [afterstates(_boards(chunk, grid_size))[2] for chunk in _chunks(keys)]
+    )
+    playing = np.flatnonzero(masks)
+    index = [
+        playing[offset : offset + BOOK_BATCH]
+        for offset in range(0, len(playing), BOOK_BATCH)
+    ]
+    batches = [
+        _boards(keys[positions], grid_size).tolist() for positions in index
+    ]
+    moves = np.full(len(keys), NO_MOVE, dtype=np.uint8)
+    if processes is None:
+        _init_worker(engine)
+        results = map(_engine_moves, batches)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(
+            processes or None, initializer=_init_worker, initargs=(engine,)
+        )
+        results = executor.map(_engine_moves, batches)
+    try:
+        for done, (positions, batch_moves) in enumerate(zip(index, results)):
+            legal = masks[positions] >> batch_moves & 1
+            moves[positions] = np.where(legal, batch_moves, NO_MOVE)
+            LOG.debug("Searched batch %d of %d", done + 1, len(index))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    LOG.info("Built the book in %.1fs", time.perf_counter() - start)
+    return Table(
+        grid_size,
+        None,
+        tuple(numbers_to_be_generated),
+        plies,
+        keys,
+        moves,
+        np.full(len(keys), np.nan),
+    )
+
+
+def _hash_slots(keys, bits):
+    return (keys * np.uint64(_GOLDEN)) >> np.uint64(64 - bits)
+
+
+def save_table(table: Table, path: str) -> None:
+    """Writes a table for TablebaseAIEngine, atomically like save_network"""
+    n = len(table.keys)
+    bits = max(4, (2 * n - 1).bit_length())
+    capacity = 1 << bits
+    keys = np.zeros(capacity, dtype="<u8")
+    probabilities = np.full(capacity, UNKNOWN, dtype="<u2")
+    moves = np.full(capacity, NO_MOVE, dtype=np.uint8)
+    stored = np.where(
+        np.isnan(table.probabilities),
+        UNKNOWN,
+        np.rint(np.nan_to_num(table.probabilities) * PROBABILITY_SCALE),
+    ).astype(np.uint16)
+
+    # Linear probing, one probe of every pending key at a time: a key only
+    # moves on from a slot that another key holds
+    home = _hash_slots(table.keys, bits)
+    pending = np.arange(n)
+    probe = 0
+    while pending.size:
+        slots = (home[pending] + np.uint64(probe)) & np.uint64(capacity - 1)
+        free = keys[slots] == 0
+        slots, first = np.unique(slots[free], return_index=True)
+        placed = pending[free][first]
+        keys[slots] = table.keys[placed]
+        probabilities[slots] = stored[placed]
+        moves[slots] = table.moves[placed]
+        pending = np.setdiff1d(pending, placed, assume_unique=True)
+        probe += 1
+
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        table.grid_size,
+        _exponent(table.max_score) if table.max_score else 0,
+        table.plies or 0,
+        sum(
+            1 << int(e)
+            for e in _spawn_exponents(table.numbers_to_be_generated)
+        ),
+        capacity,
+        n,
+    )
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(DATA_OFFSET, b"\0"))
+        f.write(keys.tobytes())
+        f.write(probabilities.tobytes())
+        f.write(moves.tobytes())
+    os.replace(tmp_path, path)
+
+
+class TablebaseAIEngine(AIEngine2048):
+    """
+    Plays the stored moves of a tablebase or opening book written by
+    save_table. The file is memory mapped and every lookup is one hash
+    probe or a few, so processes share one copy and load instantly.
+    Positions the table does not hold are left to fallback, or to the first
+    legal move without one.
+    """
+
+    def __init__(self, path: str, fallback: AIEngine2048 = None):
+        self.path = path
+        self.fallback = fallback
+        self._open()
+
+    def _open(self) -> None:
+        with open(self.path, "rb") as f:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError(f"{self.path} is not a tablebase")
+            (
+                magic,
+                version,
+                self.grid_size,
+                win,
+                plies,
+                spawn_mask,
+                capacity,
+                self.entries,
+            ) = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{self.path} is not a tablebase")
+            if os.fstat(f.fileno()).st_size != DATA_OFFSET + 11 * capacity:
+                raise ValueError(f"{self.path} is truncated")
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.max_score = 1 << win if win else None
+        self.plies = None if win else plies
+        self.numbers_to_be_generated = tuple(
+            1 << e for e in range(MAX_EXPONENT + 1) if spawn_mask >> e & 1
+        )
+        view = memoryview(self._buffer)
+        end = DATA_OFFSET + 8 * capacity
+        self._keys = view[DATA_OFFSET:end].cast("Q")
+        self._probabilities = view[end : end + 2 * capacity].cast("H")
+        self._moves = view[end + 2 * capacity :]
+        self._shift = 64 - capacity.bit_length() + 1
+        self._slot_mask = capacity - 1
+
+    def __repr__(self):
+        size = f"{self.grid_size}x{self.grid_size}"
+        if self.max_score is None:
+            return f"Opening book of {size} boards, {self.plies} plies deep"
+        return f"Tablebase of {size} boards up to {self.max_score}"
+
+    def fingerprint(self) -> str:
+        return (
+            f"{self!r} {os.path.abspath(self.path)} entries={self.entries} "
+            f"fallback={fingerprint(self.fallback)}"
+        )
+
+    def __getstate__(self):
+        # Every process maps the file on its own
+        return {"path": self.path, "fallback": self.fallback}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+    def __len__(self):
+        return self.entries
+
+    def _slot(self, key: int):
+        slot = (key * _GOLDEN & _MASK) >> self._shift
+        while True:
+            stored = self._keys[slot]
+            if stored == key:
+                return slot
+            if not stored:
+                return None
+            slot = slot + 1 & self._slot_mask
+
+    def lookup(self, board) -> Analysis:
+        """
+        The stored move and win probability (None in opening books) of
+        board, None if the table does not hold it or it has no move left
+        """
+        if len(board) != self.grid_size:
+            return None
+        key = board_key(board)
+        slot = None if not key else self._slot(key)
+        if slot is None or self._moves[slot] == NO_MOVE:
+            return None
+        stored = self._probabilities[slot]
+        probability = None if stored == UNKNOWN else stored / PROBABILITY_SCALE
+        return Analysis(MOVES[self._moves[slot]], probability, None)
+
+    def analyse(self, board) -> Analysis:
+        analysis = self.lookup(board)
+        if analysis is not None:
+            return analysis
+        if self.fallback is not None:
+            return self.fallback.analyse(board)
+        moves = moves_from_mask(legal_moves(board))
+        return Analysis(moves[0] if moves else Keys2048.LEFT, None, None)
+
+    def recommend_next_move(self, board) -> Keys2048:
+        return self.analyse(board).move
+
+    def close(self) -> None:
+        for view in (self._keys, self._probabilities, self._moves):
+            view.release()
+        self._buffer.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Solves small boards exactly into a tablebase, or "
+        "searches the first plies of 4x4 games into an opening book"
+    )
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument(
+        "--grid-size",
+        type=int,
+        help="3 for a tablebase, 4 for an opening book by default",
+    )
+    parser.add_argument("--max-score", type=int, default=32)
+    parser.add_argument(
+        "--book-plies",
+        type=int,
+        help="build an opening book this many moves deep instead",
+    )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        choices=sorted(ENGINES),
+        default="expectimax",
+        help="engine searching the opening book positions",
+    )
+    parser.add_argument(
+        "-j",
+        "--processes",
+        type=int,
+        help="opening book worker processes, 0 for one per CPU",
+    )
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+    if args.grid_size is None:
+        # The bitboard engines only search 4x4 boards
+        args.grid_size = 3 if args.book_plies is None else 4
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level)
+    if args.book_plies is not None:
+        table = build_opening_book(
+            args.book_plies,
+            create_engine(args.engine),
+            grid_size=args.grid_size,
+            processes=args.processes,
+        )
+    else:
+        table = build_tablebase(args.grid_size, args.max_score)
+    save_table(table, args.output)
+    LOG.info("Wrote %d positions to %s", len(table.keys), args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+import argparse
+import json
+import logging
+import math
+import os
+import statistics
+import sys
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+from src.engines_2048 import ENGINES, create_engine
+from src.game_2048 import Game2048
+from src.headless_2048 import GameResult, play_game
+
+LOG = logging.getLogger(__name__)
+
+METRICS = ("score", "won")
+
+# Engines and game settings of the current worker process, set once by the
+# pool initializer so every engine is shipped to every worker only once
+_worker_engines = None
+_worker_settings = None
+
+
+class EngineStats(NamedTuple):
+    engine: str
+    games: int
+    win_rate: float
+    win_rate_interval: tuple  # (low, high)
+    mean_score: float
+    score_interval: tuple
+    max_tiles: dict  # tile -> games that ended with it as the largest
+
+
+class Comparison(NamedTuple):
+    leader: str
+    other: str
+    metric: str
+    mean_difference: float  # leader minus other, over matched seeds
+    interval: tuple
+    significant: bool  # the interval excludes 0
+
+
+class TournamentResult(NamedTuple):
+    stats: list  # EngineStats, best first
+    comparisons: list  # Comparison of the leader against every other
+    seeds: int  # seeds every engine played
+    stopped_early: bool
+
+
+def z_score(confidence: float) -> float:
+    """Two sided normal quantile, 1.96 for 0.95"""
+    return statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def wilson_interval(successes: int, n: int, z: float):
+    if n == 0:
+        return (0.0, 1.0)
+    p = successes / n
+    centre = (p + z * z / (2 * n)) / (1 + z * z / n)
+    margin = (
+        z
+        * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+        / (1 + z * z / n)
+    )
+    return (max(0.0, centre - margin), min(1.0, centre + margin))
+
+
+def mean_interval(values, z: float):
+    """Normal approximation interval of the mean, infinite below 2 values"""
+    mean = statistics.fmean(values) if values else 0.0
+    if len(values) < 2:
+        return (-math.inf, math.inf)
+    margin = z * statistics.stdev(values) / math.sqrt(len(values))
+    return (mean - margin, mean + margin)
+
+
+def metric_value(result: GameResult, metric: str) -> float:
+    if metric == "won":
+        return 1.0 if result.result == "won" else 0.0
+    return float(result.score)
+
+
+def engine_stats(engine: str, results, z: float) -> EngineStats:
+    scores = [result.score for result in results]
+    wins = sum(result.result == "won" for result in results)
+    return EngineStats(
+        engine=engine,
+        games=len(results),
+        win_rate=wins / len(results) if results else 0.0,
+        win_rate_interval=wilson_interval(wins, len(results), z),
+        mean_score=statistics.fmean(scores) if scores else 0.0,
+        score_interval=mean_interval(scores, z),
+        max_tiles=dict(
+            sorted(Counter(result.max_tile for result in results).items())
+        ),
+    )
+
+
+def compare(leader, other, results, metric: str, z: float) -> Comparison:
+    """
+    Paired comparison of two engines over the seeds both played. Both
+    played each seed from the same random stream, so the per seed
+    differences vary far less than the scores themselves.
+    """
+    by_seed = {result.seed: result for result in results[other]}
+    differences = [
+        metric_value(result, metric)
+        - metric_value(by_seed[result.seed], metric)
+        for result in results[leader]
+        if result.seed in by_seed
+    ]
+    low, high = mean_interval(differences, z)
+    return Comparison(
+        leader=leader,
+        other=other,
+        metric=metric,
+        mean_difference=statistics.fmean(differences) if differences else 0.0,
+        interval=(low, high),
+        significant=low > 0 or high < 0,
+    )
+
+
+def _init_worker(engines: dict, settings: dict) -> None:
+    global _worker_engines, _worker_settings
+    _worker_engines, _worker_settings = engines, settings
+
+
+def _play(engine: str, seed: int) -> GameResult:
+    game = Game2048(
+        grid_size=_worker_settings["grid_size"],
+        max_score=_worker_settings["max_score"],
+        ai_engine=_worker_engines[engine],
+        seed=seed,
+    )
+    return play_game(
+        game, seed, seed, _worker_settings["max_moves"], latencies=[]
+    )
+
+
+def run_tournament(
+    engines: dict,
+    max_games=1000,
+    min_games=30,
+    batch_size=None,
+    seed=0,
+    confidence=0.95,
+    metric="score",
+    early_stop=True,
+    grid_size=4,
+    max_score=2048,
+    max_moves=100_000,
+    max_workers=None,
+) -> TournamentResult:
+    """
+    Plays every engine of engines (name -> AIEngine2048) on seeds seed,
+    seed + 1, ... in batches of batch_size seeds, on a process pool of
+    max_workers (0 plays in this process).
+
+    After every batch, once min_games seeds were played, the leader on
+    metric is compared with every other engine. With early_stop the
+    tournament ends as soon as the leader is significantly ahead of all of
+    them, or after max_games seeds. The confidence is split over the
+    comparisons (Bonferroni); repeated looks still make early stopping
+    somewhat optimistic, raise confidence or min_games to compensate.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}, choose from {METRICS}")
+    if len(engines) < 2:
+        raise ValueError("A tournament needs at least two engines")
+    max_workers = os.cpu_count() if max_workers is None else max_workers
+    batch_size = batch_size or max(max_workers, 1) * 4
+    alpha = (1 - confidence) / (len(engines) - 1)
+    z = z_score(1 - alpha)
+
+    settings = {
+        "grid_size": grid_size,
+        "max_score": max_score,
+        "max_moves": max_moves,
+    }
+    pool = None
+    if max_workers:
+        pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(engines, settings),
+        )
+    else:
+        _init_worker(engines, settings)
+
+    results = defaultdict(list)
+    played = 0
+    stopped_early = False
+    try:
+        while played < max_games:
+            seeds = range(
+                seed + played, seed + min(played + batch_size, max_games)
+            )
+            tasks = [(engine, s) for s in seeds for engine in engines]
+            if pool is None:
+                outcomes = [_play(*task) for task in tasks]
+            else:
+                outcomes = pool.map(_play, *zip(*tasks))
+            for (engine, _), outcome in zip(tasks, outcomes):
+                results[engine].append(outcome)
+            played += len(seeds)
+
+            comparisons = _compare_leader(results, metric, z)
+            LOG.info(
+                "%d seeds: %s",
+                played,
+                ", ".join(
+                    f"{c.leader} - {c.other} {c.mean_difference:+.2f}"
+                    for c in comparisons
+                ),
+            )
+            if (
+                early_stop
+                and played >= min_games
+                and all(c.significant for c in comparisons)
+            ):
+                stopped_early = played < max_games
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    stats = sorted(
+        (engine_stats(engine, results[engine], z) for engine in engines),
+        key=lambda s: s.win_rate if metric == "won" else s.mean_score,
+        reverse=True,
+    )
+    return TournamentResult(
+        stats=stats,
+        comparisons=_compare_leader(results, metric, z),
+        seeds=played,
+        stopped_early=stopped_early,
+    )
+
+
+def _compare_leader(results, metric, z):
+    def mean(engine):
+        return statistics.fmean(
+            metric_value(result, metric) for result in results[engine]
+        )
+
+    leader = max(results, key=mean)
+    return [
+        compare(leader, other, results, metric, z)
+        for other in results
+        if other != leader
+    ]
+
+
+def format_tournament(tournament: TournamentResult) -> str:
+    lines = [
+        f"{tournament.seeds} seeds per engine"
+        + (", stopped early" if tournament.stopped_early else "")
+    ]
+    for s in tournament.stats:
+        tiles = ", ".join(
+            f"{tile}: {count}" for tile, count in s.max_tiles.items()
+        )
+        lines += [
+            f"{s.engine}",
+            f"  win rate    {s.win_rate:.1%} "
+            f"[{s.win_rate_interval[0]:.1%}, {s.win_rate_interval[1]:.1%}]",
+            f"  mean score  {s.mean_score:.1f} "
+            f"[{s.score_interval[0]:.1f}, {s.score_interval[1]:.1f}]",
+            f"  max tile    {tiles}",
+        ]
+    for c in tournament.comparisons:
+        verdict = "significant" if c.significant else "not significant"
+        lines.append(
+            f"{c.leader} - {c.other} ({c.metric}): "
+            f"{c.mean_difference:+.2f} "
+            f"[{c.interval[0]:.2f}, {c.interval[1]:.2f}], {verdict}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Plays AI engines against each other on matched seeds"
+    )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        dest="engines",
+        action="append",
+        choices=sorted(ENGINES),
+        help="engine to enter, at least two",
+    )
+    parser.add_argument("--max-games", type=int, default=1000)
+    parser.add_argument("--min-games", type=int, default=30)
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--metric", choices=METRICS, default="score")
+    parser.add_argument(
+        "--no-early-stop", dest="early_stop", action="store_false"
+    )
+    parser.add_argument("--grid-size", type=int, default=4)
+    parser.add_argument("--max-score", type=int, default=2048)
+    parser.add_argument("--max-moves", type=int, default=100_000)
+    parser.add_argument("-j", "--workers", type=int)
+    parser.add_argument("-o", "--output", help="write the results as JSON")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+    if args.engines is not None and len(set(args.engines)) < 2:
+        parser.error("a tournament needs at least two engines")
+    return args
+
+
+def create_engines(names=None) -> dict:
+    """
+    The engines named, or by default every registered engine that can be
+    built here: engines needing files that are missing, like an n-tuple
+    network nobody trained, are left out
+    """
+    if names is not None:
+        return {name: create_engine(name) for name in names}
+    engines = {}
+    for name in sorted(ENGINES):
+        try:
+            engines[name] = create_engine(name)
+        except ValueError as e:
+            LOG.warning("Leaving out %s: %s", name, e)
+    return engines
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level)
+
+    try:
+        engines = create_engines(args.engines)
+    except ValueError as e:
+        sys.exit(str(e))
+    if len(engines) < 2:
+        sys.exit("Fewer than two engines can be built here")
+    tournament = run_tournament(
+        engines,
+        max_games=args.max_games,
+        min_games=args.min_games,
+        batch_size=args.batch_size,
+        seed=args.seed,
+        confidence=args.confidence,
+        metric=args.metric,
+        early_stop=args.early_stop,
+        grid_size=args.grid_size,
+        max_score=args.max_score,
+        max_moves=args.max_moves,
+        max_workers=args.workers,
+    )
+    print(format_tournament(tournament))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "seeds": tournament.seeds,
+                    "stopped_early": tournament.stopped_early,
+                    "stats": [s._asdict() for s in tournament.stats],
+                    "comparisons": [
+                        c._asdict() for c in tournament.comparisons
+                    ],
+                },
+                f,
+                indent=2,
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,5 @@
-from base_ai_engine_2048 import AIEngine2048
-from utils import Keys2048
+from src.base_ai_engine_2048 import AIEngine2048
+from src.utils import Keys2048
 
 
 class ZackAIEngine(AIEngine2048):
@@ -0,0 +1,19 @@
+import os
+from src import row_tables_2048
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def row_tables_cache(tmp_path_factory):
+    """
+    Keeps the row tables cache of the tests, and of the processes they
+    start, out of the user's home directory
+    """
+    path = str(tmp_path_factory.mktemp("row_tables") / "row_tables.bin")
+    previous = os.environ.get(row_tables_2048.CACHE_ENV_VAR)
+    os.environ[row_tables_2048.CACHE_ENV_VAR] = path
+    yield path
+    if previous is None:
+        del os.environ[row_tables_2048.CACHE_ENV_VAR]
+    else:
+        os.environ[row_tables_2048.CACHE_ENV_VAR] = previous
@@ -0,0 +1,67 @@
+import random
+from src import afterstates_2048
+from src.afterstates_2048 import MOVES, moves_from_mask
+from src.backends_2048 import BACKENDS
+from src.game_2048 import Game2048
+from src.utils import Keys2048
+import pytest
+
+
+def random_board(rng, grid_size):
+    return [
+        [rng.choice([0, 0, 2, 2, 4, 8, 16, 32768]) for _ in range(grid_size)]
+        for _ in range(grid_size)
+    ]
+
+
+def reference_afterstates(board):
+    """What engines did before: clone the game once per move"""
+    boards, scores, legal = [], [], 0
+    for k, move in enumerate(MOVES):
+        game = Game2048(grid_size=len(board), board=board)
+        if getattr(game, f"move_{move}")():
+            legal |= 1 << k
+        boards.append(game.board)
+        scores.append(game.score)
+    return tuple(boards), tuple(scores), legal
+
+
+@pytest.mark.parametrize("grid_size", [2, 3, 4, 5, 6])
+def test_matches_moving_a_copy(grid_size):
+    rng = random.Random(grid_size)
+    for _ in range(200):
+        board = random_board(rng, grid_size)
+        expected = reference_afterstates(board)
+        assert afterstates_2048.afterstates(board) == expected
+        assert afterstates_2048.legal_moves(board) == expected[2]
+
+
+def test_leaves_the_board_untouched():
+    board = [[2, 2, 0, 0], [0, 4, 0, 4], [0, 0, 0, 0], [8, 0, 8, 16]]
+    copy = [row[:] for row in board]
+    boards, scores, legal = afterstates_2048.afterstates(board)
+    assert board == copy
+    assert boards[0] == [[4, 0, 0, 0], [8, 0, 0, 0], [0] * 4, [16, 16, 0, 0]]
+    assert scores[0] == 4 + 8 + 16
+    assert moves_from_mask(legal) == list(MOVES)
+
+
+def test_stuck_and_one_way_boards():
+    stuck = [[2, 4], [4, 2]]
+    assert afterstates_2048.afterstates(stuck).legal == 0
+    assert afterstates_2048.legal_moves(stuck) == 0
+    only_right_and_down = [[2, 0], [0, 0]]
+    mask = afterstates_2048.legal_moves(only_right_and_down)
+    assert moves_from_mask(mask) == [Keys2048.RIGHT, Keys2048.DOWN]
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+def test_games_query_moves_without_moving(backend):
+    board = [[2, 2, 0, 0], [0, 4, 0, 4], [0, 0, 0, 0], [8, 0, 8, 16]]
+    game = BACKENDS[backend](board=board)
+    game.score = 7
+    assert game.afterstates() == reference_afterstates(board)
+    assert game.legal_moves() == afterstates_2048.ALL_MOVES
+    assert game.board == board
+    assert game.score == 7
+    assert not game.history
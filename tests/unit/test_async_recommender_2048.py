@@ -0,0 +1,145 @@
+import threading
+import time
+from src.async_recommender_2048 import AsyncRecommender, Recommendation
+from src.base_ai_engine_2048 import AIEngine2048
+from src.expectimax_ai_engine_2048 import ExpectimaxAIEngine
+from src.utils import Keys2048
+import pytest
+
+board = [[0, 4, 0, 2], [8, 16, 2, 0], [0, 2, 0, 0], [4, 0, 0, 128]]
+
+
+class FixedAIEngine(AIEngine2048):
+    def __repr__(self):
+        return "Fixed AI Engine"
+
+    def recommend_next_move(self, board) -> Keys2048:
+        return Keys2048.DOWN
+
+
+class BlockingAIEngine(AIEngine2048):
+    """Yields UP, then waits until it is told to stop or released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.stopped = threading.Event()
+
+    def __repr__(self):
+        return "Blocking AI Engine"
+
+    def recommend_next_move(self, board) -> Keys2048:
+        return Keys2048.UP
+
+    def iter_recommendations(self, board, should_stop=None):
+        self.board = board
+        yield Keys2048.UP
+        while not self.release.wait(0.001):
+            if should_stop():
+                self.stopped.set()
+                return
+        yield Keys2048.RIGHT
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def make_recommender():
+    recommenders = []
+
+    def make(engine):
+        recommender = AsyncRecommender(engine)
+        recommenders.append(recommender)
+        return recommender
+
+    yield make
+    for recommender in recommenders:
+        recommender.close()
+
+
+def test_request_does_not_block(make_recommender):
+    engine = BlockingAIEngine()
+    recommender = make_recommender(engine)
+    start = time.perf_counter()
+    recommender.request(board)
+    assert time.perf_counter() - start < 0.5
+    assert recommender.busy
+
+    wait_until(lambda: recommender.best is not None)
+    assert recommender.best == Recommendation(Keys2048.UP, 1, False)
+    engine.release.set()
+    wait_until(lambda: not recommender.busy)
+    assert recommender.best == Recommendation(Keys2048.RIGHT, 2, True)
+
+
+def test_cancel_stops_the_search(make_recommender):
+    engine = BlockingAIEngine()
+    recommender = make_recommender(engine)
+    recommender.request(board)
+    wait_until(lambda: recommender.best is not None)
+
+    recommender.cancel()
+    assert recommender.best is None
+    assert not recommender.busy
+    assert engine.stopped.wait(5)
+    assert recommender.best is None
+
+
+def test_new_request_replaces_the_old_one(make_recommender):
+    engine = BlockingAIEngine()
+    recommender = make_recommender(engine)
+    recommender.request(board)
+    wait_until(lambda: recommender.best is not None)
+
+    recommender.request(board)
+    assert recommender.best is None
+    assert engine.stopped.wait(5)
+    engine.release.set()
+    wait_until(lambda: not recommender.busy)
+    assert recommender.best == Recommendation(Keys2048.RIGHT, 2, True)
+
+
+def test_engine_without_anytime_search(make_recommender):
+    recommender = make_recommender(FixedAIEngine())
+    recommender.request(board)
+    wait_until(lambda: not recommender.busy)
+    assert recommender.best == Recommendation(Keys2048.DOWN, 1, True)
+
+
+def test_request_copies_the_board(make_recommender):
+    engine = BlockingAIEngine()
+    recommender = make_recommender(engine)
+    moving_board = [row[:] for row in board]
+    recommender.request(moving_board)
+    moving_board[0][0] = 2048
+    engine.release.set()
+    wait_until(lambda: not recommender.busy)
+    assert engine.board == board
+
+
+def test_expectimax_streams_every_depth(make_recommender):
+    engine = ExpectimaxAIEngine(max_depth=3, time_budget=10)
+    moves = list(engine.iter_recommendations(board))
+    assert len(moves) == 3
+    assert moves[-1] == engine.recommend_next_move(board)
+
+    recommender = make_recommender(engine)
+    recommender.request(board)
+    wait_until(lambda: not recommender.busy)
+    assert recommender.best == Recommendation(moves[-1], 3, True)
+
+
+def test_expectimax_stops_when_asked():
+    engine = ExpectimaxAIEngine(max_depth=6, time_budget=10)
+    engine.table.clear()
+    start = time.perf_counter()
+    moves = list(
+        engine.iter_recommendations(board, should_stop=lambda: True)
+    )
+    assert time.perf_counter() - start < 1
+    # Depth 1 only evaluates leaves, the first chance node stops the search
+    assert len(moves) == 1
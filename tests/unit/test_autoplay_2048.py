@@ -0,0 +1,190 @@
+from src.autoplay_2048 import SPEEDS, UNLIMITED, AutoPlayer
+from src.base_ai_engine_2048 import AIEngine2048
+from src.expectimax_ai_engine_2048 import ExpectimaxAIEngine
+from src.game_2048 import Game2048
+from src.utils import Keys2048
+import time
+import pytest
+
+
+class FakeClock:
+    """Advances by tick seconds every time it is read"""
+
+    def __init__(self, tick=0.0):
+        self.now = 0.0
+        self.tick = tick
+
+    def __call__(self):
+        self.now += self.tick
+        return self.now
+
+
+class CyclingAIEngine(AIEngine2048):
+    def __init__(self):
+        self.calls = 0
+
+    def __repr__(self):
+        return "Cycling AI Engine"
+
+    def recommend_next_move(self, board) -> Keys2048:
+        self.calls += 1
+        return (Keys2048.LEFT, Keys2048.DOWN, Keys2048.RIGHT, Keys2048.UP)[
+            self.calls % 4
+        ]
+
+
+class FixedAIEngine(AIEngine2048):
+    def __repr__(self):
+        return "Fixed AI Engine"
+
+    def recommend_next_move(self, board) -> Keys2048:
+        return Keys2048.LEFT
+
+
+class SlowAIEngine(CyclingAIEngine):
+    def __repr__(self):
+        return "Slow AI Engine"
+
+    def recommend_next_move(self, board) -> Keys2048:
+        time.sleep(0.2)
+        return super().recommend_next_move(board)
+
+
+@pytest.fixture
+def make_player():
+    players = []
+
+    def make(engine=None, clock=None, **kwargs):
+        game = Game2048(ai_engine=engine or CyclingAIEngine(), seed=7)
+        game.start_game()
+        player = AutoPlayer(game, clock=clock or FakeClock(), **kwargs)
+        players.append(player)
+        return player
+
+    yield make
+    for player in players:
+        player.close()
+
+
+def test_does_nothing_until_started(make_player):
+    player = make_player()
+    assert player.advance(1.0) == 0
+    assert player.game.ai_engine.calls == 0
+
+
+def test_paced_by_moves_per_second(make_player):
+    player = make_player(moves_per_second=10)
+    player.game.board = [[2, 0, 0, 0]] * 4
+    player.start()
+    # 25ms at 10 moves/s makes a quarter of a move due, none is played
+    assert player.advance(0.025) == 0
+    assert player.moves == 0
+    assert player.advance(0.1) == 1
+
+
+def test_catch_up_is_bounded(make_player):
+    player = make_player(moves_per_second=10)
+    player.start()
+    # A 10s hiccup does not turn into 100 moves in one frame
+    player.advance(10.0)
+    assert player.moves == 1
+
+
+def test_unlimited_fills_the_frame_budget(make_player):
+    player = make_player(
+        clock=time.perf_counter, moves_per_second=UNLIMITED, frame_budget=0.05
+    )
+    player.start()
+    start = time.perf_counter()
+    assert player.advance(0.0) > 1
+    assert time.perf_counter() - start < 0.5
+
+
+def test_slow_engine_does_not_hold_up_frames(make_player):
+    player = make_player(
+        engine=SlowAIEngine(),
+        clock=time.perf_counter,
+        moves_per_second=UNLIMITED,
+        frame_budget=0.01,
+    )
+    player.start()
+    start = time.perf_counter()
+    assert player.advance(0.0) == 0
+    assert time.perf_counter() - start < 0.15
+    # The move keeps coming while frames are drawn, then gets played
+    moves = 0
+    while not moves and time.perf_counter() - start < 5:
+        moves = player.advance(0.01)
+    assert moves == 1
+
+
+def test_move_for_an_old_board_is_dropped(make_player):
+    player = make_player(moves_per_second=1)
+    player.game.board = [[2, 0, 0, 0]] * 4
+    player.start()
+    # Nothing is due yet, the engine is asked for the move ahead of time
+    assert player.advance(0.0) == 0
+    # The board changes under the pending request, like after a key press
+    player.game.move_down()
+    assert player.step()
+    assert player.game.ai_engine.calls == 2
+    assert player.moves == 1
+
+
+def test_stops_when_the_engine_stalls(make_player):
+    player = make_player(engine=FixedAIEngine(), moves_per_second=UNLIMITED)
+    player.game.board = [[2, 0, 0, 0]] * 4
+    player.start()
+    assert player.advance(0.0) == 0
+    assert not player.running
+    assert player.result == "stalled"
+
+
+def test_plays_a_game_to_the_end(make_player):
+    engine = ExpectimaxAIEngine(max_depth=1)
+    player = make_player(
+        engine=engine, moves_per_second=UNLIMITED, frame_budget=60.0
+    )
+    player.start()
+    moves = player.advance(0.0)
+    assert not player.running
+    assert player.result in ("won", "over", "stalled")
+    assert moves == player.moves > 0
+    assert player.game.is_end_game() or player.result == "stalled"
+
+
+def test_counters(make_player):
+    clock = FakeClock()
+    player = make_player(clock=clock, moves_per_second=UNLIMITED)
+    player.start()
+    moves = player.advance(0.0)
+    assert player.rate == pytest.approx(moves)
+    assert player.latency == 0.0
+    clock.now += 10
+    assert player.rate == 0
+    assert player.latency == 0
+
+
+@pytest.mark.parametrize(
+    "speed, steps, expected",
+    [
+        (10, 1, 30),
+        (10, -1, 5),
+        (SPEEDS[0], -1, SPEEDS[0]),
+        (UNLIMITED, 1, UNLIMITED),
+        (UNLIMITED, -1, SPEEDS[-2]),
+        (7, 1, UNLIMITED),
+    ],
+)
+def test_change_speed(make_player, speed, steps, expected):
+    player = make_player(moves_per_second=speed)
+    player.change_speed(steps)
+    assert player.moves_per_second == expected
+
+
+def test_toggle(make_player):
+    player = make_player()
+    player.toggle()
+    assert player.running
+    player.toggle()
+    assert not player.running
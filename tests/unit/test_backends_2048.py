@@ -0,0 +1,98 @@
+import random
+from src.backends_2048 import BACKENDS, create_game, select_backend
+from src.bitboard_2048 import BitboardGame2048
+from src.game_2048 import Game2048
+from src.packed_2048 import PackedGame2048
+import pytest
+
+# (grid_size, max_score) every fast backend able to play it is checked on
+configurations = [
+    (3, 2048),
+    (4, 2048),
+    (4, 1 << 15),
+    (5, 2048),
+    (6, 1 << 17),
+    (8, 1 << 20),
+]
+MOVES = ["left", "right", "up", "down"]
+
+
+def backends_for(grid_size, max_score):
+    return [
+        name
+        for name in BACKENDS
+        if name != "list"
+        and (name != "bitboard" or (grid_size == 4 and max_score <= 1 << 15))
+    ]
+
+
+def assert_same_state(game, reference):
+    assert game.board == reference.board
+    assert game.score == reference.score
+    assert game.max_tile == reference.max_tile
+    assert game.empty_count == reference.empty_count
+    assert game.is_game_win() == reference.is_game_win()
+    assert game.is_game_over() == reference.is_game_over()
+    assert game.is_end_game() == reference.is_end_game()
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize(
+    "grid_size, max_score, backend",
+    [
+        (grid_size, max_score, backend)
+        for grid_size, max_score in configurations
+        for backend in backends_for(grid_size, max_score)
+    ],
+)
+def test_seeded_games_match_reference(grid_size, max_score, backend, seed):
+    reference = Game2048(grid_size=grid_size, max_score=max_score, seed=seed)
+    game = create_game(
+        grid_size=grid_size, max_score=max_score, backend=backend, seed=seed
+    )
+    reference.start_game()
+    game.start_game()
+    assert_same_state(game, reference)
+
+    move_rng = random.Random(seed)
+    for _ in range(300):
+        move = move_rng.choice(MOVES)
+        moved = getattr(reference, f"move_{move}")()
+        assert getattr(game, f"move_{move}")() == moved
+        if moved:
+            reference.generate_tile()
+            game.generate_tile()
+        assert_same_state(game, reference)
+        if reference.is_end_game():
+            break
+    assert game.history == reference.history
+
+
+@pytest.mark.parametrize("backend", ["list", "packed"])
+def test_tiles_beyond_bitboards(backend):
+    board = [[1 << 40, 1 << 40, 1 << 17, 0, 2]] + [[0] * 5 for _ in range(4)]
+    game = create_game(
+        grid_size=5, max_score=1 << 41, backend=backend, board=board
+    )
+    assert game.move_left()
+    assert game.board[0] == [1 << 41, 1 << 17, 2, 0, 0]
+    assert game.score == 1 << 41
+    assert game.is_game_win()
+
+
+def test_select_backend():
+    assert select_backend(4, 2048) == "bitboard"
+    assert select_backend(4, 1 << 15) == "bitboard"
+    assert select_backend(4, 1 << 16) == "packed"
+    assert select_backend(8, 2048) == "packed"
+    assert select_backend(4, 2000) == "list"
+    assert select_backend(5, 2048, (2, 3)) == "list"
+    assert select_backend(5, 1 << 128) == "list"
+
+
+def test_create_game():
+    assert type(create_game()) is BitboardGame2048
+    assert type(create_game(grid_size=6)) is PackedGame2048
+    assert type(create_game(backend="list")) is Game2048
+    with pytest.raises(ValueError):
+        create_game(backend="abacus")
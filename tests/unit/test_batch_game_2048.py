@@ -0,0 +1,95 @@
+import random
+from src.game_2048 import Game2048
+from src.batch_game_2048 import BatchGame2048, MOVES, NO_MOVE, afterstates
+import numpy as np
+import pytest
+
+
+def random_board(rng, grid_size):
+    return [
+        [rng.choice([0, 0, 2, 2, 4, 8, 16]) for _ in range(grid_size)]
+        for _ in range(grid_size)
+    ]
+
+
+@pytest.mark.parametrize("grid_size", [2, 3, 4, 5, 6])
+def test_moves_match_reference(grid_size):
+    rng = random.Random(grid_size)
+    boards = [random_board(rng, grid_size) for _ in range(200)]
+    moves = [rng.randrange(len(MOVES)) for _ in boards]
+
+    batch = BatchGame2048(len(boards), grid_size=grid_size, boards=boards)
+    changed = batch.move(moves)
+
+    for k, (board, code) in enumerate(zip(boards, moves)):
+        game = Game2048(grid_size=grid_size, board=[r[:] for r in board])
+        moved = getattr(game, f"move_{MOVES[code]}")()
+        assert changed[k] == moved
+        assert batch.boards[k].tolist() == game.board
+
+
+def test_move_score_and_skip():
+    boards = [
+        [[2, 2, 2, 2], [4, 4, 0, 0], [0, 0, 0, 0], [8, 0, 0, 8]],
+        [[2, 2, 2, 2], [4, 4, 0, 0], [0, 0, 0, 0], [8, 0, 0, 8]],
+    ]
+    batch = BatchGame2048(2, boards=boards)
+    changed = batch.move([0, NO_MOVE])
+    assert changed.tolist() == [True, False]
+    assert batch.scores.tolist() == [4 + 4 + 8 + 16, 0]
+    assert batch.boards[1].tolist() == boards[1]
+
+
+def test_generate_tile_respects_mask():
+    batch = BatchGame2048(3, seed=0)
+    batch.boards[2] = 2
+    batch.generate_tile(np.array([True, False, True]))
+    non_zero = (batch.boards != 0).sum(axis=(1, 2))
+    assert non_zero.tolist() == [1, 0, 16]
+    assert set(batch.boards[0].ravel()) <= {0, 2, 4}
+
+
+def test_start_game():
+    batch = BatchGame2048(500, seed=1)
+    batch.start_game()
+    non_zero = (batch.boards != 0).sum(axis=(1, 2))
+    assert non_zero.min() >= 1 and non_zero.max() <= 16
+    assert set(np.unique(batch.boards)) <= {0, 2}
+    assert not batch.is_end_game().any()
+
+
+def test_end_game_masks():
+    boards = [
+        [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]],
+        [[2048, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]],
+        [[2, 2, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]],
+    ]
+    batch = BatchGame2048(3, boards=boards)
+    assert batch.is_game_over().tolist() == [True, False, False]
+    assert batch.is_game_win().tolist() == [False, True, False]
+    assert batch.is_end_game().tolist() == [2, 1, 0]
+
+
+def test_step_runs_games_to_the_end():
+    batch = BatchGame2048(64, seed=2)
+    batch.start_game()
+    rng = np.random.default_rng(3)
+    for _ in range(2000):
+        if batch.is_end_game().all():
+            break
+        batch.step(rng.integers(0, len(MOVES), size=batch.n_games))
+    assert batch.is_end_game().all()
+    assert (batch.scores > 0).all()
+
+
+@pytest.mark.parametrize("grid_size", [2, 4, 5])
+def test_afterstates_match_moves(grid_size):
+    rng = random.Random(grid_size)
+    boards = np.array([random_board(rng, grid_size) for _ in range(100)])
+    new_boards, scores, legal = afterstates(boards)
+    for code in range(len(MOVES)):
+        batch = BatchGame2048(len(boards), grid_size, boards=boards)
+        changed = batch.move(np.full(len(boards), code))
+        assert (new_boards[:, code] == batch.boards).all()
+        assert (scores[:, code] == batch.scores).all()
+        assert ((legal >> code & 1) == changed).all()
@@ -0,0 +1,45 @@
+import json
+from benchmarks import bench_2048
+from benchmarks.bench_2048 import BenchmarkResult
+import pytest
+
+
+def test_compare_flags_slowdowns_over_threshold():
+    baseline = {"results": {"a": 100.0, "b": 100.0, "c": 100.0}}
+    results = [
+        BenchmarkResult("a", 105.0, 1),
+        BenchmarkResult("b", 120.0, 1),
+        BenchmarkResult("new", 500.0, 1),
+    ]
+    regressions = bench_2048.compare(results, baseline, threshold=0.1)
+    assert [regression.name for regression in regressions] == ["b"]
+    assert regressions[0].ratio == 1.2
+
+
+def test_benchmark_names_are_unique():
+    names = [name for name, _, _ in bench_2048.all_benchmarks(1)]
+    assert len(names) == len(set(names))
+    assert "bitboard/4x4/move_up" in names
+    assert "engine/expectimax/recommend_next_move" in names
+
+
+def test_main_saves_and_compares_baseline(tmp_path):
+    baseline = str(tmp_path / "baseline.json")
+    args = ["-n", "5", "-r", "1", "-k", "4x4/move_left"]
+    assert bench_2048.main(args + ["--save-baseline", baseline]) == 0
+    with open(baseline) as f:
+        data = json.load(f)
+    assert set(data["results"]) == {
+        "list/4x4/move_left",
+        "packed/4x4/move_left",
+        "bitboard/4x4/move_left",
+    }
+    assert bench_2048.main(
+        args + ["--baseline", baseline, "--threshold", "1000"]
+    ) == 0
+
+
+def test_main_needs_a_saved_baseline(tmp_path):
+    baseline = str(tmp_path / "baseline.json")
+    with pytest.raises(SystemExit, match="--save-baseline"):
+        bench_2048.main(["--baseline", baseline])
@@ -0,0 +1,119 @@
+import random
+from src.game_2048 import Game2048
+from src import bitboard_2048
+from src.bitboard_2048 import BitboardGame2048
+import pytest
+
+
+board_cases = [
+    [[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]],
+    [[2, 2, 0, 0], [0, 0, 0, 0], [2, 0, 0, 2], [0, 0, 0, 2]],
+    [[2, 2, 2, 2], [0, 0, 0, 0], [4, 4, 4, 4], [8, 8, 8, 8]],
+    [
+        [2, 4, 8, 16],
+        [32, 64, 128, 256],
+        [512, 1024, 2048, 4096],
+        [8192, 16384, 32768, 2],
+    ],
+    [[2, 0, 4, 0], [0, 8, 0, 16], [2, 0, 4, 0], [0, 0, 0, 0]],
+    [[32768, 32768, 2, 2], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]],
+]
+
+
+@pytest.mark.parametrize("board", board_cases)
+def test_round_trip(board):
+    bitboard = bitboard_2048.to_bitboard(board)
+    assert bitboard_2048.from_bitboard(bitboard) == board
+
+
+@pytest.mark.parametrize("value", [3, 1, 65536, -2])
+def test_unsupported_tile(value):
+    with pytest.raises(ValueError):
+        bitboard_2048.tile_to_exponent(value)
+
+
+@pytest.mark.parametrize("board", board_cases)
+def test_transpose(board):
+    bitboard = bitboard_2048.transpose(bitboard_2048.to_bitboard(board))
+    assert bitboard_2048.from_bitboard(bitboard) == [
+        list(column) for column in zip(*board)
+    ]
+
+
+@pytest.mark.parametrize("board", board_cases)
+def test_count_empty(board):
+    bitboard = bitboard_2048.to_bitboard(board)
+    expected = sum(v == 0 for row in board for v in row)
+    assert bitboard_2048.count_empty(bitboard) == expected
+
+
+@pytest.mark.parametrize("move", ["left", "right", "up", "down"])
+@pytest.mark.parametrize("board", board_cases[:5])
+def test_moves_match_reference(board, move):
+    reference = Game2048(board=[row[:] for row in board])
+    bitboard_game = BitboardGame2048(board=board)
+    assert getattr(bitboard_game, f"move_{move}")() == getattr(
+        reference, f"move_{move}"
+    )()
+    assert bitboard_game.board == reference.board
+
+
+def test_move_score():
+    bitboard = bitboard_2048.to_bitboard(board_cases[2])
+    _, score = bitboard_2048.move_left(bitboard)
+    assert score == 4 + 4 + 8 + 8 + 16 + 16
+
+
+def test_is_game_over():
+    board = [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]]
+    game = BitboardGame2048(board=board)
+    assert game.is_game_over()
+    assert game.is_end_game() == 2
+
+    board[3][3] = 4
+    game = BitboardGame2048(board=board)
+    assert not game.is_game_over()
+
+
+def test_is_game_win():
+    game = BitboardGame2048(board=[[2048, 0, 0, 0]] + [[0] * 4] * 3)
+    assert game.is_game_win()
+    assert game.is_end_game() == 1
+    assert not BitboardGame2048(board=board_cases[2]).is_game_win()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_seeded_rollout_matches_reference(seed):
+    reference = Game2048(seed=seed)
+    bitboard_game = BitboardGame2048(seed=seed)
+    moves = ["left", "up", "right", "down"]
+
+    reference.start_game()
+    bitboard_game.start_game()
+    assert bitboard_game.board == reference.board
+
+    move_rng = random.Random(seed)
+    for _ in range(200):
+        move = move_rng.choice(moves)
+        moved = getattr(reference, f"move_{move}")()
+        assert getattr(bitboard_game, f"move_{move}")() == moved
+        if moved:
+            reference.generate_tile()
+            bitboard_game.generate_tile()
+        assert bitboard_game.board == reference.board
+        assert bitboard_game.score == reference.score
+        assert bitboard_game.max_tile == reference.max_tile
+        assert bitboard_game.empty_count == reference.empty_count
+        assert bitboard_game.is_game_over() == reference.is_game_over()
+
+
+@pytest.mark.parametrize("board", board_cases)
+def test_afterstates_match_moves(board):
+    bitboard = bitboard_2048.to_bitboard(board)
+    bitboards, scores, legal = bitboard_2048.afterstates(bitboard)
+    for k, (_, move) in enumerate(bitboard_2048.MOVES):
+        new_bitboard, score = move(bitboard)
+        assert bitboards[k] == new_bitboard
+        assert scores[k] == score
+        assert (legal >> k & 1) == (new_bitboard != bitboard)
+    assert bitboard_2048.legal_moves(bitboard) == legal
@@ -0,0 +1,184 @@
+import pickle
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from src.base_ai_engine_2048 import AIEngine2048, Analysis
+from src.cached_ai_engine_2048 import CachedAIEngine, board_key
+from src.expectimax_ai_engine_2048 import ExpectimaxAIEngine
+from src.game_2048 import Game2048
+from src.symmetry_2048 import TRANSFORMS, canonical_board, transform_board
+from src.utils import Keys2048
+import pytest
+
+board = [[0, 4, 0, 2], [8, 16, 2, 0], [0, 2, 0, 0], [4, 0, 0, 128]]
+
+
+class CountingAIEngine(AIEngine2048):
+    def __init__(self, name="counting"):
+        self.name = name
+        self.calls = 0
+
+    def __repr__(self):
+        return f"Counting AI Engine {self.name}"
+
+    def recommend_next_move(self, board) -> Keys2048:
+        self.calls += 1
+        return Keys2048.DOWN
+
+
+def distinct_boards(count):
+    boards = []
+    for k in range(count):
+        cell, exponent = divmod(k, 11)
+        b = [[0] * 4 for _ in range(4)]
+        b[cell // 4][cell % 4] = 2 ** (exponent + 1)
+        boards.append(b)
+    return boards
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache.sqlite")
+
+
+def test_board_key():
+    assert board_key([[0, 2], [4, 2048]]) == bytes([0, 1, 2, 11])
+    # 3 would share a byte with 2
+    with pytest.raises(ValueError):
+        board_key([[0, 3], [4, 2048]])
+
+
+def test_second_lookup_hits(path):
+    engine = CountingAIEngine()
+    cached = CachedAIEngine(engine, path)
+    assert cached.recommend_next_move(board) == Keys2048.DOWN
+    assert cached.recommend_next_move(board) == Keys2048.DOWN
+    assert engine.calls == 1
+    assert (cached.hits, cached.misses) == (1, 1)
+    assert cached.hit_rate == 0.5
+    assert cached.count() == 1
+
+
+def test_stores_score_and_depth(path):
+    engine = ExpectimaxAIEngine(max_depth=2, time_budget=10)
+    expected = engine.analyse(board)
+    assert expected.depth == 2
+    cached = CachedAIEngine(engine, path)
+    cached.analyse(board)
+    restarted = CachedAIEngine(engine, path, warm_start=0)
+    assert restarted.analyse(board) == expected
+    assert restarted.hits == 1
+
+
+def test_persists_across_restarts(path):
+    CachedAIEngine(CountingAIEngine(), path).recommend_next_move(board)
+    engine = CountingAIEngine()
+    restarted = CachedAIEngine(engine, path, warm_start=0)
+    assert restarted.recommend_next_move(board) == Keys2048.DOWN
+    assert engine.calls == 0
+
+
+def test_engines_do_not_share_entries(path):
+    CachedAIEngine(CountingAIEngine("a"), path).recommend_next_move(board)
+    engine = CountingAIEngine("b")
+    CachedAIEngine(engine, path).recommend_next_move(board)
+    assert engine.calls == 1
+
+
+def test_engines_configured_apart_do_not_share_entries(path):
+    def evaluate_empty(bitboard):
+        return float(bin(bitboard).count("0"))
+
+    plain = ExpectimaxAIEngine(max_depth=2, time_budget=10)
+    tuned = ExpectimaxAIEngine(
+        max_depth=2, time_budget=10, evaluate=evaluate_empty
+    )
+    assert repr(plain) == repr(tuned)
+    CachedAIEngine(plain, path).analyse(board)
+    cached = CachedAIEngine(tuned, path)
+    assert cached.analyse(board) == tuned.analyse(board)
+    assert cached.misses == 1
+    named = CachedAIEngine(plain, path, namespace="weights 1")
+    named.analyse(board)
+    assert (named.namespace, named.misses) == ("weights 1", 1)
+
+
+def test_warm_start_loads_the_newest_entries(path):
+    boards = distinct_boards(10)
+    first = CachedAIEngine(CountingAIEngine(), path)
+    for b in boards:
+        first.recommend_next_move(b)
+    first.close()
+
+    engine = CountingAIEngine()
+    warm = CachedAIEngine(engine, path, warm_start=4)
+    # Served from memory even once the file is gone
+    with sqlite3.connect(path) as connection:
+        connection.execute("DELETE FROM recommendations")
+    for b in boards[-4:]:
+        warm.recommend_next_move(b)
+    assert engine.calls == 0
+    warm.recommend_next_move(boards[0])
+    assert engine.calls == 1
+
+
+def test_evicts_the_oldest_entries(path):
+    boards = distinct_boards(30)
+    cached = CachedAIEngine(CountingAIEngine(), path, max_entries=10)
+    for b in boards:
+        cached.recommend_next_move(b)
+    assert cached.count() == 10
+
+    engine = CountingAIEngine()
+    restarted = CachedAIEngine(engine, path, warm_start=0)
+    for b in boards[-10:]:
+        restarted.recommend_next_move(b)
+    assert engine.calls == 0
+    restarted.recommend_next_move(boards[0])
+    assert engine.calls == 1
+
+
+def test_canonical_entries_are_shared_by_symmetries(path):
+    engine = ExpectimaxAIEngine(max_depth=2, time_budget=10)
+    cached = CachedAIEngine(engine, path, canonical=True)
+    canonical, _ = canonical_board(board)
+    expected = Game2048(board=canonical)
+    getattr(expected, f"move_{engine.recommend_next_move(canonical)}")()
+
+    for t in TRANSFORMS:
+        image = transform_board(board, t)
+        game = Game2048(board=image)
+        assert getattr(game, f"move_{cached.recommend_next_move(image)}")()
+        # The move played is the canonical move, seen through the symmetry
+        assert (
+            canonical_board(game.board)[0]
+            == canonical_board(expected.board)[0]
+        )
+    assert (cached.hits, cached.misses) == (7, 1)
+    assert cached.count() == 1
+
+
+def test_pickles_without_its_connection(path):
+    cached = CachedAIEngine(CountingAIEngine(), path)
+    cached.recommend_next_move(board)
+    copy = pickle.loads(pickle.dumps(cached))
+    assert copy.recommend_next_move(board) == Keys2048.DOWN
+    assert copy.engine.calls == 1  # the original's count, nothing new
+
+
+def analyse_in_worker(cached, boards):
+    return [cached.analyse(b) for b in boards]
+
+
+def test_shared_by_worker_processes(path):
+    boards = distinct_boards(20)
+    cached = CachedAIEngine(CountingAIEngine(), path)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        futures = [
+            pool.submit(analyse_in_worker, cached, boards) for _ in range(4)
+        ]
+        results = [future.result() for future in futures]
+    assert all(
+        result == [Analysis(Keys2048.DOWN, None, None)] * 20
+        for result in results
+    )
+    assert cached.count() == 20
@@ -0,0 +1,99 @@
+from src.game_2048 import Game2048
+from src.expectimax_ai_engine_2048 import (
+    ExpectimaxAIEngine,
+    TranspositionTable,
+)
+from src.utils import Keys2048
+import time
+import pytest
+
+
+def test_transposition_table_evicts_least_recently_used():
+    table = TranspositionTable(maxsize=2)
+    table.put("a", 1.0)
+    table.put("b", 2.0)
+    assert table.get("a") == 1.0
+    table.put("c", 3.0)
+    assert len(table) == 2
+    assert table.get("b") is None
+    assert table.get("a") == 1.0
+    assert table.get("c") == 3.0
+    assert (table.hits, table.misses) == (3, 1)
+
+
+recommend_cases = [
+    # Only moving up or down merges the column of 2s
+    (
+        [[2, 4, 8, 16], [2, 16, 4, 8], [32, 8, 16, 4], [4, 32, 2, 64]],
+        {Keys2048.UP, Keys2048.DOWN},
+    ),
+    # Only right is legal
+    (
+        [[2, 0, 0, 0], [4, 0, 0, 0], [8, 0, 0, 0], [16, 0, 0, 0]],
+        {Keys2048.RIGHT},
+    ),
+]
+
+
+@pytest.mark.parametrize("board, expected", recommend_cases)
+def test_recommends_legal_move(board, expected):
+    engine = ExpectimaxAIEngine(max_depth=2)
+    assert engine.recommend_next_move(board) in expected
+
+
+def test_no_legal_move():
+    board = [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]]
+    assert ExpectimaxAIEngine().recommend_next_move(board) == Keys2048.LEFT
+
+
+def test_respects_time_budget():
+    engine = ExpectimaxAIEngine(max_depth=8, time_budget=0.05)
+    board = [[2, 4, 0, 0], [0, 8, 0, 2], [0, 0, 4, 0], [2, 0, 0, 0]]
+    start = time.perf_counter()
+    engine.recommend_next_move(board)
+    assert time.perf_counter() - start < 1.0
+
+
+def test_plays_better_than_random():
+    engine = ExpectimaxAIEngine(max_depth=2)
+    game = Game2048(seed=0, ai_engine=engine)
+    game.board = [[2, 2, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
+    for _ in range(300):
+        move = game.recommend_next_move()
+        assert getattr(game, f"move_{move}")()
+        game.generate_tile()
+        if game.is_game_over():
+            break
+    assert max(max(row) for row in game.board) >= 256
+
+
+def test_transposition_table_hit_rate():
+    table = TranspositionTable()
+    assert table.hit_rate == 0.0
+    table.put("a", 1.0)
+    table.get("a")
+    table.get("b")
+    assert table.hit_rate == 0.5
+
+
+def test_symmetric_table_shares_entries():
+    board = [[2, 4, 0, 0], [0, 8, 0, 2], [0, 0, 4, 0], [2, 0, 0, 0]]
+    plain = ExpectimaxAIEngine(max_depth=3, time_budget=10)
+    symmetric = ExpectimaxAIEngine(
+        max_depth=3, time_budget=10, symmetric_table=True
+    )
+    assert plain.recommend_next_move(board) == symmetric.recommend_next_move(
+        board
+    )
+    assert len(symmetric.table) < len(plain.table)
+    assert symmetric.table.hit_rate > plain.table.hit_rate
+
+
+def test_searches_keep_their_own_deadline():
+    board = [[2, 4, 0, 0], [0, 8, 0, 2], [0, 0, 4, 0], [2, 0, 0, 0]]
+    engine = ExpectimaxAIEngine(max_depth=3, time_budget=0)
+    moves = engine.iter_recommendations(board)
+    next(moves)
+    # A search timing out in between must not stop the unbounded one
+    assert engine.analyse(board).depth == 1
+    assert len(list(moves)) == 2
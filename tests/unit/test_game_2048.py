@@ -300,3 +300,91 @@ def test_is_game_win(game, input_board, expected_game_over):
     game_instance = game(input_board)
     ans = game_instance.is_game_over()
     assert expected_game_over == ans
+
+
+def test_seeded_games_are_reproducible():
+    games = [Game2048(seed=42) for _ in range(2)]
+    for game in games:
+        game.start_game()
+        for move in ["left", "up", "right", "down"] * 10:
+            if getattr(game, f"move_{move}")():
+                game.generate_tile()
+    assert games[0].board == games[1].board
+
+
+def test_games_own_their_random_stream():
+    import random
+
+    rng = random.Random(7)
+    game = Game2048(rng=rng)
+    assert game.rng is rng
+
+    expected = Game2048(seed=3)
+    expected.start_game()
+    random.seed(0)
+    game = Game2048(seed=3)
+    random.random()
+    game.start_game()
+    assert game.board == expected.board
+
+
+def test_generate_tile_after_board_replaced(game):
+    game = game([[2, 2, 2, 2], [2, 2, 2, 2], [2, 2, 2, 2], [2, 2, 2, 0]])
+    game.generate_tile()
+    assert all(cell != 0 for row in game.board for cell in row)
+
+    game.board = [[0, 2, 2, 2], [2, 2, 2, 2], [2, 2, 2, 2], [2, 2, 2, 2]]
+    game.generate_tile()
+    assert game.board[0][0] in game.numbers_to_be_generated
+
+
+def rescanned_state(board):
+    g = len(board)
+    pairs = sum(
+        board[i][j] != 0 and board[i][j] == board[i][j + 1]
+        for i in range(g)
+        for j in range(g - 1)
+    ) + sum(
+        board[i][j] != 0 and board[i][j] == board[i + 1][j]
+        for i in range(g - 1)
+        for j in range(g)
+    )
+    empty = sum(v == 0 for row in board for v in row)
+    return empty, max(max(row) for row in board), pairs
+
+
+@pytest.mark.parametrize("grid_size", [2, 3, 4, 5, 8])
+def test_incremental_state_matches_rescan(grid_size):
+    game = Game2048(grid_size=grid_size, max_score=64, seed=grid_size)
+    game.start_game()
+    moves = ["left", "up", "right", "down"]
+    for k in range(300):
+        moved = getattr(game, f"move_{moves[k * 7 % 4]}")()
+        if moved:
+            game.generate_tile()
+        if k % 50 == 0:
+            game._transpose()
+        empty, max_tile, pairs = rescanned_state(game.board)
+        assert game.empty_count == empty
+        assert game.max_tile == max_tile
+        assert game._equal_pairs == pairs
+        assert game.is_game_win() == any(
+            v == 64 for row in game.board for v in row
+        )
+        assert game.is_game_over() == (empty == 0 and pairs == 0)
+
+
+score_cases = [
+    ([[2, 2, 2, 2], [0, 0, 0, 0], [4, 4, 4, 4], [8, 8, 8, 8]], "left", 56),
+    ([[2, 2, 2, 2], [0, 0, 0, 0], [4, 4, 4, 4], [8, 8, 8, 8]], "up", 0),
+    ([[2, 0, 0, 0], [2, 0, 0, 0], [4, 0, 0, 0], [4, 0, 0, 0]], "down", 12),
+    ([[3, 3, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]], "right", 6),
+]
+
+
+@pytest.mark.parametrize("input_board,move,expected_score", score_cases)
+def test_score(game, input_board, move, expected_score):
+    game_instance = game(input_board)
+    getattr(game_instance, f"move_{move}")()
+    assert game_instance.score == expected_score
+    assert input_board != game_instance.board or expected_score == 0
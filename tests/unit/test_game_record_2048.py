@@ -0,0 +1,114 @@
+import io
+from src.bitboard_2048 import BitboardGame2048
+from src.game_2048 import Game2048
+from src import game_record_2048
+from src.game_record_2048 import Move, Spawn
+from src.utils import Keys2048
+import pytest
+
+
+def play(game, moves=200):
+    game.start_game()
+    for k in range(moves):
+        if getattr(game, f"move_{list(Keys2048)[k * 5 % 4]}")():
+            game.generate_tile()
+    return game
+
+
+def test_history_is_one_byte_per_event():
+    game = Game2048(board=[[2, 2, 0, 0], [0] * 4, [0] * 4, [0] * 4], seed=1)
+    game.move_left()
+    game.generate_tile()
+    spawned_board = [row[:] for row in game.board]
+    game.move_left()
+    assert len(game.history) == 3
+    events = list(
+        game_record_2048.iter_events(
+            game_record_2048.GameRecord(
+                4, 2048, (2, 4), 1, game.initial_board, bytes(game.history)
+            )
+        )
+    )
+    assert events[0] == Move(Keys2048.LEFT)
+    assert isinstance(events[1], Spawn)
+    assert spawned_board[events[1].x][events[1].y] == events[1].value
+    assert events[2] == Move(Keys2048.LEFT)
+
+
+@pytest.mark.parametrize("game_class", [Game2048, BitboardGame2048])
+def test_write_read_and_replay(tmp_path, game_class):
+    path = str(tmp_path / "games.bin")
+    games = [play(game_class(seed=seed)) for seed in range(3)]
+    games.append(play(Game2048(grid_size=8, seed=9)))
+    with open(path, "wb") as f:
+        for game in games:
+            game_record_2048.write_game(f, game)
+
+    records = list(game_record_2048.read_games(path))
+    assert len(records) == len(games)
+    for record, game in zip(records, games):
+        assert record.seed == game.seed
+        assert record.grid_size == game.grid_size
+        assert record.initial_board == game.initial_board
+        assert len(record.events) == len(game.history)
+        replayed = game_record_2048.replay(record)
+        assert replayed.board == game.board
+        assert replayed.score == game.score
+
+
+def test_game_without_seed(tmp_path):
+    path = str(tmp_path / "games.bin")
+    with open(path, "wb") as f:
+        game_record_2048.write_game(f, play(Game2048(rng=None)))
+    (record,) = game_record_2048.read_games(path)
+    assert record.seed is None
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "games.bin"
+    path.write_bytes(b"")
+    assert list(game_record_2048.read_games(str(path))) == []
+
+
+# Cut in the header, in the spawnable numbers, and in the events
+@pytest.mark.parametrize(
+    "cut",
+    [game_record_2048.HEADER.size - 3, game_record_2048.HEADER.size + 5, -1],
+)
+def test_truncated_file(tmp_path, cut):
+    path = str(tmp_path / "games.bin")
+    with open(path, "wb") as f:
+        game_record_2048.write_game(f, play(Game2048(seed=0)))
+    with open(path, "r+b") as f:
+        f.truncate(cut if cut > 0 else f.seek(0, 2) + cut)
+    with pytest.raises(ValueError):
+        list(game_record_2048.read_games(path))
+
+
+def test_board_too_large_to_record():
+    game = Game2048(grid_size=9, seed=0)
+    play(game, 10)
+    assert len(game.history) == 0
+    with pytest.raises(ValueError):
+        game_record_2048.check_spawn_range(9, 2)
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [
+        dict(seed=2**63),
+        dict(seed="abc"),
+        dict(seed=1, board=[[3, 0, 0, 0], [0] * 4, [0] * 4, [0] * 4]),
+    ],
+)
+def test_unrecordable_games_are_not_recorded(caplog, settings):
+    games = [Game2048(**settings)]
+    if "board" not in settings:
+        games.append(BitboardGame2048(**settings))
+    assert "Not recording the game" in caplog.text
+    for game in games:
+        game.generate_tile()
+        game.move_down()
+        assert len(game.history) == 0
+        with pytest.raises(ValueError):
+            game_record_2048.write_game(io.BytesIO(), game)
@@ -0,0 +1,80 @@
+import csv
+import json
+import sys
+from src import headless_2048
+from src.base_ai_engine_2048 import AIEngine2048
+from src.utils import Keys2048
+import pytest
+
+
+class CyclingAIEngine(AIEngine2048):
+    def __init__(self):
+        self.moves = 0
+
+    def __repr__(self):
+        return "Cycling AI Engine"
+
+    def recommend_next_move(self, board) -> Keys2048:
+        self.moves += 1
+        return list(Keys2048)[self.moves % 4]
+
+
+class AlwaysLeftAIEngine(AIEngine2048):
+    def __repr__(self):
+        return "Always Left AI Engine"
+
+    def recommend_next_move(self, board) -> Keys2048:
+        return Keys2048.LEFT
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert headless_2048.percentile(values, 50) == 50
+    assert headless_2048.percentile(values, 99) == 99
+    assert headless_2048.percentile([], 50) == 0.0
+
+
+def test_run_simulation_is_reproducible():
+    first = headless_2048.run_simulation(CyclingAIEngine(), 3, seed=7)[0]
+    second = headless_2048.run_simulation(CyclingAIEngine(), 3, seed=7)[0]
+    assert first == second
+    assert [result.seed for result in first] == [7, 8, 9]
+
+
+def test_stalled_engine_ends_game():
+    results, latencies, _ = headless_2048.run_simulation(
+        AlwaysLeftAIEngine(), 1
+    )
+    assert results[0].result == "stalled"
+    assert len(latencies) == results[0].moves + 1
+
+
+def test_move_limit():
+    results, latencies, _ = headless_2048.run_simulation(
+        CyclingAIEngine(), 2, grid_size=6, seed=0, max_moves=5
+    )
+    assert [result.result for result in results] == ["move_limit"] * 2
+    assert len(latencies) == 10
+
+
+@pytest.mark.parametrize("suffix", [".json", ".csv"])
+def test_main_writes_results(tmp_path, capsys, suffix):
+    path = str(tmp_path / f"results{suffix}")
+    assert (
+        headless_2048.main(
+            ["-n", "2", "-e", "zack", "--seed", "1", "-o", path]
+        )
+        == 0
+    )
+    assert "games/s" in capsys.readouterr().out
+    assert "pygame" not in sys.modules
+
+    with open(path) as f:
+        if suffix == ".json":
+            data = json.load(f)
+            assert data["summary"]["games"] == 2
+            assert len(data["games"]) == 2
+        else:
+            rows = list(csv.DictReader(f))
+            assert len(rows) == 2
+            assert rows[0]["seed"] == "1"
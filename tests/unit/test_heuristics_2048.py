@@ -0,0 +1,166 @@
+import pickle
+import random
+import numpy as np
+from src import bitboard_2048, headless_2048
+from src.cached_ai_engine_2048 import CachedAIEngine
+from src.engines_2048 import create_engine
+from src.expectimax_ai_engine_2048 import ExpectimaxAIEngine
+from src.heuristics_2048 import (
+    DEFAULT_WEIGHTS,
+    FEATURES,
+    Heuristic,
+    HeuristicAIEngine,
+    board_features,
+    load_weights,
+    play_games,
+    save_weights,
+    tune,
+)
+from src.symmetry_2048 import symmetric_bitboards
+from src.utils import Keys2048
+import pytest
+
+board = [[2, 4, 8, 0], [0, 4, 0, 0], [0, 0, 0, 2], [1024, 0, 0, 0]]
+
+
+def random_board(rng):
+    return [
+        [rng.choice([0, 0, 2, 2, 4, 8, 64, 2048]) for _ in range(4)]
+        for _ in range(4)
+    ]
+
+
+def test_features():
+    features = dict(zip(FEATURES, board_features(np.array(board))))
+    assert features == {
+        "empty": 10,
+        # Smaller of rise and fall in exponents: 2 on row 0 (1, 2, 3, 0),
+        # 2 on row 1 (0, 2, 0, 0), 1 on column 0 (1, 0, 0, 10) and 1 on
+        # column 3 (0, 0, 1, 0)
+        "monotonicity": -6,
+        # 2-4, 4-8 on row 0, 4-4 on column 1
+        "smoothness": -2,
+        # 4 over 4 on column 1
+        "merges": 1,
+        "corner": 10,
+    }
+
+
+def test_bitboards_value_like_batches():
+    heuristic = Heuristic()
+    rng = random.Random(1)
+    boards = [random_board(rng) for _ in range(200)]
+    scores = heuristic.scores(np.array(boards))
+    for b, score in zip(boards, scores):
+        bitboard = bitboard_2048.to_bitboard(b)
+        assert heuristic(bitboard) == pytest.approx(score)
+        # Same value for every rotation and reflection
+        for image in symmetric_bitboards(bitboard):
+            assert heuristic(image) == pytest.approx(score)
+
+
+def test_weights():
+    assert Heuristic().weights == DEFAULT_WEIGHTS
+    only_empty = Heuristic({"empty": 2})
+    assert only_empty.score(board) == 20
+    assert repr(only_empty) == "Heuristic(empty=2)"
+    with pytest.raises(ValueError, match="Unknown features"):
+        Heuristic({"snake": 1})
+    copy = pickle.loads(pickle.dumps(only_empty))
+    assert copy(bitboard_2048.to_bitboard(board)) == 20
+
+
+def test_save_and_load_weights(tmp_path):
+    path = str(tmp_path / "weights.json")
+    save_weights({"empty": 1.5, "corner": 3}, path)
+    assert load_weights(path) == {"empty": 1.5, "corner": 3}
+    (tmp_path / "list.json").write_text("[1, 2]")
+    with pytest.raises(ValueError):
+        load_weights(str(tmp_path / "list.json"))
+
+
+def test_engine_batch_matches_one_by_one():
+    engine = create_engine("heuristic")
+    assert isinstance(engine, HeuristicAIEngine)
+    rng = random.Random(2)
+    stuck = [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]]
+    boards = [random_board(rng) for _ in range(30)] + [stuck]
+    moves = engine.recommend_batch(boards)
+    assert moves == [engine.recommend_next_move(b) for b in boards]
+    assert engine.analyse(stuck) == (Keys2048.LEFT, None, 0)
+    assert engine.recommend_batch([[[2, 0], [0, 0]], board]) == [
+        engine.recommend_next_move([[2, 0], [0, 0]]),
+        engine.recommend_next_move(board),
+    ]
+
+
+def test_engine_plays_legal_moves():
+    engine = HeuristicAIEngine()
+    only_vertical = [[2, 4, 8, 16], [2, 8, 16, 32], [0, 0, 0, 0], [0] * 4]
+    analysis = engine.analyse(only_vertical)
+    assert analysis.move in (Keys2048.UP, Keys2048.DOWN)
+    # 2 + 2 merge on column 0
+    assert analysis.score >= 4
+
+
+def test_expectimax_evaluates_with_a_heuristic():
+    engine = ExpectimaxAIEngine(max_depth=2, evaluate=Heuristic())
+    assert engine.recommend_next_move(board) in list(Keys2048)
+
+
+def test_play_games():
+    first = play_games(Heuristic(), games=8, max_moves=100, seed=3)
+    second = play_games(Heuristic(), games=8, max_moves=100, seed=3)
+    assert np.array_equal(first, second)
+    # The heuristic beats chasing merge points alone
+    assert play_games(Heuristic(), games=16, seed=4).mean() > (
+        play_games(Heuristic({}), games=16, seed=4).mean()
+    )
+
+
+@pytest.mark.parametrize("method", ["cem", "random"])
+def test_tune(method):
+    settings = dict(
+        method=method,
+        generations=2,
+        population=4,
+        games=4,
+        max_moves=30,
+        seed=5,
+    )
+    result = tune(**settings)
+    assert set(result.weights) == set(FEATURES)
+    assert len(result.history) == 2
+    assert result.fitness == result.history[-1][0]
+    assert tune(processes=2, **settings) == result
+    with pytest.raises(ValueError):
+        tune(method="annealing")
+
+
+def test_headless_weights(tmp_path, capsys):
+    path = str(tmp_path / "weights.json")
+    save_weights(DEFAULT_WEIGHTS, path)
+    args = ["-e", "heuristic", "--weights", path, "-n", "2", "--seed", "1"]
+    assert headless_2048.main(args) == 0
+    assert "games       2" in capsys.readouterr().out
+    with pytest.raises(SystemExit):
+        headless_2048.main(["-e", "zack", "--weights", path])
+
+
+def test_headless_caches_by_weights(tmp_path, monkeypatch):
+    cache = str(tmp_path / "cache.sqlite")
+    namespaces = []
+    real = CachedAIEngine.__init__
+
+    def record(self, engine, path, **kwargs):
+        real(self, engine, path, **kwargs)
+        namespaces.append(self.namespace)
+
+    monkeypatch.setattr(CachedAIEngine, "__init__", record)
+    for weights in (DEFAULT_WEIGHTS, {"empty": 1}):
+        path = str(tmp_path / "weights.json")
+        save_weights(weights, path)
+        args = ["-e", "heuristic", "--weights", path, "--cache", cache]
+        assert headless_2048.main(args + ["-n", "1"]) == 0
+    assert len(set(namespaces)) == 2
+    assert all(" weights " in namespace for namespace in namespaces)
@@ -0,0 +1,134 @@
+import json
+from src.base_ai_engine_2048 import AIEngine2048
+from src.game_2048 import Game2048
+from src.metrics_2048 import (
+    GAME_METHODS,
+    Histogram,
+    Metrics,
+    instrument_engine,
+    instrument_game,
+    uninstrument,
+)
+from src.utils import Keys2048
+
+board = [[2, 2, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 4]]
+
+
+class FixedAIEngine(AIEngine2048):
+    def __repr__(self):
+        return 'Fixed "AI" Engine'
+
+    def recommend_next_move(self, board) -> Keys2048:
+        return Keys2048.LEFT
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(1.0, 2.0, 5.0))
+    for value in (0.5, 1.0, 1.5, 3.0, 10.0):
+        histogram.observe(value)
+    assert histogram.count == 5
+    assert histogram.sum == 16.0
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.cumulative() == [
+        (1.0, 2),
+        (2.0, 3),
+        (5.0, 4),
+        (float("inf"), 5),
+    ]
+    assert histogram.quantile(0.5) == 2.0
+    assert histogram.quantile(1.0) == float("inf")
+    assert Histogram().quantile(0.5) == float("inf")
+
+
+def test_counters_and_hooks():
+    metrics = Metrics()
+    events = []
+    metrics.hooks.append(lambda *event: events.append(event))
+    metrics.inc("games_total")
+    metrics.inc("games_total", 2)
+    metrics.observe("latency_seconds", 0.25, engine="x")
+    assert metrics.snapshot()["counters"] == [
+        {"name": "games_total", "labels": {}, "value": 3}
+    ]
+    assert events == [("latency_seconds", {"engine": "x"}, 0.25)]
+
+
+def test_uninstrumented_game_is_untouched():
+    game = Game2048(board=board)
+    assert "move_left" not in vars(game)
+    metrics = Metrics()
+    instrument_game(game, metrics)
+    assert "move_left" in vars(game)
+    uninstrument(game, GAME_METHODS)
+    assert "move_left" not in vars(game)
+    game.move_left()
+    assert all(h.count == 0 for h in metrics.histograms.values())
+    assert not metrics.counters
+
+
+def test_instrument_game():
+    metrics = Metrics()
+    game = instrument_game(
+        Game2048(board=board, ai_engine=FixedAIEngine()), metrics
+    )
+    assert game.move_left()
+    assert not game.move_left()
+    game.generate_tile()
+    game.is_game_over()
+    assert game.recommend_next_move() == Keys2048.LEFT
+
+    snapshot = metrics.snapshot()
+    calls = {
+        h["labels"]["method"]: h["count"] for h in snapshot["histograms"]
+    }
+    assert calls["move_left"] == 2
+    assert calls["move_up"] == 0
+    assert calls["generate_tile"] == 1
+    assert calls["is_game_over"] == 1
+    assert calls["recommend_next_move"] == 1
+    moves = {
+        (c["labels"]["move"], c["labels"]["changed"]): c["value"]
+        for c in snapshot["counters"]
+    }
+    assert moves == {("left", "true"): 1, ("left", "false"): 1}
+
+
+def test_instrument_engine():
+    metrics = Metrics()
+    engine = instrument_engine(FixedAIEngine(), metrics)
+    engine.recommend_next_move(board)
+    (histogram,) = [
+        h
+        for h in metrics.snapshot()["histograms"]
+        if h["labels"]["method"] == "recommend_next_move"
+    ]
+    assert histogram["count"] == 1
+    assert histogram["labels"]["engine"] == 'Fixed "AI" Engine'
+
+
+def test_json_export():
+    metrics = Metrics()
+    metrics.observe("latency_seconds", 0.002)
+    data = json.loads(metrics.to_json())
+    (histogram,) = data["histograms"]
+    assert histogram["count"] == 1
+    assert histogram["p50"] == 0.0025
+    assert histogram["buckets"][-1] == ["+Inf", 1]
+
+
+def test_prometheus_export():
+    metrics = Metrics(buckets=(0.001, 0.01))
+    metrics.inc("moves_total", move="left")
+    metrics.observe("engine_seconds", 0.005, engine='say "hi"\n')
+    metrics.observe("engine_seconds", 0.5, engine='say "hi"\n')
+    labels = 'engine="say \\"hi\\"\\n"'
+    assert metrics.to_prometheus().splitlines() == [
+        "# TYPE zacks_2048_moves_total counter",
+        'zacks_2048_moves_total{move="left"} 1',
+        "# TYPE zacks_2048_engine_seconds histogram",
+        f'zacks_2048_engine_seconds_bucket{{{labels},le="0.001"}} 0',
+        f'zacks_2048_engine_seconds_bucket{{{labels},le="0.01"}} 1',
+        f'zacks_2048_engine_seconds_bucket{{{labels},le="+Inf"}} 2',
+        f"zacks_2048_engine_seconds_sum{{{labels}}} 0.505",
+        f"zacks_2048_engine_seconds_count{{{labels}}} 2",
+    ]
@@ -0,0 +1,119 @@
+import time
+import numpy as np
+from src.engines_2048 import create_engine
+from src.game_2048 import Game2048
+from src.monte_carlo_ai_engine_2048 import TIMED_BATCH_SIZE, MonteCarloAIEngine
+from src.utils import Keys2048
+import pytest
+
+board = [[2, 4, 0, 0], [0, 8, 2, 0], [16, 0, 0, 2], [4, 2, 0, 0]]
+
+
+def test_no_legal_move():
+    stuck = [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]]
+    analysis = MonteCarloAIEngine(seed=0).analyse(stuck)
+    assert analysis == (Keys2048.LEFT, None, 0)
+
+
+def test_recommends_legal_moves():
+    # Only UP or DOWN change this board
+    only_vertical = [[2, 4, 8, 16], [2, 8, 16, 32], [0, 0, 0, 0], [0] * 4]
+    engine = MonteCarloAIEngine(playouts=20, depth=5, seed=0)
+    assert engine.recommend_next_move(only_vertical) in (
+        Keys2048.UP,
+        Keys2048.DOWN,
+    )
+    row = [[2, 4, 8, 16], [4, 8, 16, 32], [8, 16, 32, 64], [0, 2, 4, 8]]
+    assert engine.recommend_next_move(row) in (Keys2048.LEFT, Keys2048.DOWN)
+
+
+@pytest.mark.parametrize("policy", ["random", "greedy"])
+def test_seeded_analysis_is_reproducible(policy):
+    first = MonteCarloAIEngine(playouts=30, depth=8, policy=policy, seed=3)
+    second = MonteCarloAIEngine(playouts=30, depth=8, policy=policy, seed=3)
+    assert first.analyse(board) == second.analyse(board)
+    assert first.analyse(board).depth == 8
+
+
+def test_counts_playouts():
+    engine = MonteCarloAIEngine(playouts=24, depth=4, batch_size=10, seed=0)
+    engine.analyse(board)
+    # Every legal root move gets all its playouts
+    assert engine.playouts_played == 4 * 24
+    assert engine.playouts_per_second > 0
+
+
+def test_time_budget_stops_after_one_batch():
+    engine = MonteCarloAIEngine(
+        playouts=10_000, depth=4, batch_size=5, time_budget=0, seed=0
+    )
+    engine.analyse(board)
+    assert engine.playouts_played == 4 * 5
+
+
+def test_respects_time_budget():
+    engine = MonteCarloAIEngine(
+        playouts=100_000, depth=1000, time_budget=0.01, seed=0
+    )
+    assert engine.batch_size == TIMED_BATCH_SIZE
+    start = time.perf_counter()
+    analysis = engine.analyse(board)
+    assert time.perf_counter() - start < 0.2
+    # Cut short on the first batch, every playout as deep as the others
+    assert 1 <= analysis.depth < 1000
+    assert engine.playouts_played == 4 * TIMED_BATCH_SIZE
+
+
+def test_batch_analysis():
+    stuck = [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]]
+    only_vertical = [[2, 4, 8, 16], [2, 8, 16, 32], [0, 0, 0, 0], [0] * 4]
+    engine = MonteCarloAIEngine(playouts=10, depth=4, seed=0)
+    analyses = engine.analyse_batch([board, stuck, only_vertical])
+    assert analyses[1] == (Keys2048.LEFT, None, 0)
+    assert analyses[2].move in (Keys2048.UP, Keys2048.DOWN)
+    # One batch for the 4 + 0 + 2 legal root moves
+    assert engine.playouts_played == 6 * 10
+    moves = engine.recommend_batch([board, [[2, 0], [0, 0]]])
+    assert moves[1] in (Keys2048.RIGHT, Keys2048.DOWN)
+
+
+def test_playouts_follow_game_rules():
+    # With no room left after the first spawn, the greedy policy has to
+    # merge the pair of 1024s: 2048 points, more than any other playout
+    boards = np.array(
+        [
+            [[1024, 1024, 2, 4], [8, 16, 32, 64], [2, 4, 8, 16], [0, 2, 4, 8]],
+            [[4, 8, 2, 4], [8, 16, 32, 64], [2, 4, 8, 16], [0, 2, 4, 8]],
+        ]
+    )
+    engine = MonteCarloAIEngine(depth=1, policy="greedy", seed=0)
+    scores = engine.playout_scores(boards, count=3)
+    reference = Game2048(board=boards[0].tolist())
+    reference.move_left()
+    assert scores[0] >= 3 * reference.score
+    assert scores[1] < scores[0]
+
+
+def test_plays_a_game_to_the_end():
+    engine = MonteCarloAIEngine(playouts=8, depth=5, seed=0)
+    game = Game2048(grid_size=3, max_score=64, ai_engine=engine, seed=0)
+    game.start_game()
+    for _ in range(500):
+        move = engine.recommend_next_move(game.board)
+        if not getattr(game, f"move_{move}")():
+            break
+        game.generate_tile()
+        if game.is_game_over() or game.is_game_win():
+            break
+    assert game.is_end_game()
+
+
+def test_registered():
+    assert isinstance(
+        create_engine("montecarlo", playouts=5), MonteCarloAIEngine
+    )
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        MonteCarloAIEngine(policy="clever")
@@ -0,0 +1,194 @@
+import pickle
+import random
+import numpy as np
+from src import bitboard_2048
+from src.ntuple_ai_engine_2048 import (
+    NTupleAIEngine,
+    NTupleNetwork,
+    load_network,
+    play_episode,
+    save_network,
+    symmetric_cells,
+    train,
+)
+from src.utils import Keys2048
+import pytest
+
+SMALL_TUPLES = ((0, 1, 2, 3), (4, 5, 6, 7), (0, 1, 4, 5))
+
+board = [[0, 4, 0, 2], [8, 16, 2, 0], [0, 2, 0, 0], [4, 0, 0, 128]]
+
+
+def random_network(seed=0):
+    network = NTupleNetwork(SMALL_TUPLES)
+    network.weights[:] = np.random.default_rng(seed).random(
+        network.weights.shape
+    )
+    return network
+
+
+def symmetries(board):
+    rotations = [board]
+    for _ in range(3):
+        rotations.append([list(row) for row in zip(*rotations[-1][::-1])])
+    return rotations + [[row[::-1] for row in b] for b in rotations]
+
+
+@pytest.mark.parametrize(
+    "cell, expected",
+    [
+        (0, {0, 3, 12, 15}),
+        (1, {1, 2, 4, 7, 8, 11, 13, 14}),
+        (5, {5, 6, 9, 10}),
+    ],
+)
+def test_symmetric_cells(cell, expected):
+    images = symmetric_cells(cell)
+    assert len(images) == 8
+    assert set(images) == expected
+    assert cell in images
+
+
+def test_value_is_symmetric():
+    network = random_network()
+    values = {
+        round(network.value(bitboard_2048.to_bitboard(b)), 3)
+        for b in symmetries(board)
+    }
+    assert len(values) == 1
+
+
+def test_value_sums_feature_weights():
+    network = NTupleNetwork(((0, 1),))
+    network.weights[0x21] = 1.5  # 2 then 4 along some edge, in order
+    # Row 0 reads 2, 4 from cell 0 to cell 1
+    bitboard = bitboard_2048.to_bitboard(
+        [[2, 4, 0, 0], [0] * 4, [0] * 4, [0] * 4]
+    )
+    assert network.value(bitboard) == 1.5
+    assert network.value(0) == 0
+
+
+def test_update_moves_the_value():
+    network = NTupleNetwork(SMALL_TUPLES)
+    bitboard = bitboard_2048.to_bitboard(board)
+    network.update(bitboard, 0.5)
+    # Every feature adds 0.5, also to a weight another feature already hit
+    assert network.weights.sum() == pytest.approx(0.5 * network.n_features)
+    assert network.value(bitboard) >= 0.5 * network.n_features
+
+
+def test_rejects_mismatched_weights():
+    with pytest.raises(ValueError):
+        NTupleNetwork(SMALL_TUPLES, np.zeros(10, dtype=np.float32))
+    with pytest.raises(ValueError):
+        NTupleNetwork(((0, 1), (0, 1, 2)))
+
+
+def test_save_and_load(tmp_path):
+    network = random_network()
+    path = str(tmp_path / "network.bin")
+    save_network(network, path)
+
+    loaded = load_network(path)
+    assert loaded.tuples == network.tuples
+    assert isinstance(loaded.weights, np.memmap)
+    assert not loaded.weights.flags.writeable
+    np.testing.assert_array_equal(loaded.weights, network.weights)
+
+    writable = load_network(path, writable=True)
+    writable.weights[0] += 1
+    assert load_network(path).weights[0] == network.weights[0]
+
+
+@pytest.mark.parametrize(
+    "content", [b"", b"nope", b"Z48N\x01\x01\x02\x00\x01"]
+)
+def test_load_rejects_bad_files(tmp_path, content):
+    path = tmp_path / "network.bin"
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        load_network(str(path))
+
+
+def test_engine_plays_the_best_afterstate():
+    network = random_network()
+    engine = NTupleAIEngine(network)
+    bitboard = bitboard_2048.to_bitboard(board)
+    expected = max(
+        (score + network.value(new), key)
+        for key, move in bitboard_2048.MOVES
+        for new, score in [move(bitboard)]
+        if new != bitboard
+    )[1]
+    assert engine.recommend_next_move(board) == expected
+
+
+def test_engine_without_legal_moves():
+    engine = NTupleAIEngine(random_network())
+    stuck = [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]]
+    assert engine.recommend_next_move(stuck) == Keys2048.LEFT
+
+
+def test_batch_matches_one_by_one():
+    engine = NTupleAIEngine(random_network())
+    rng = random.Random(5)
+    stuck = [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]]
+    boards = [
+        [[rng.choice([0, 0, 2, 4, 8, 64]) for _ in range(4)] for _ in range(4)]
+        for _ in range(30)
+    ] + [stuck]
+    assert engine.recommend_batch(boards) == [
+        engine.recommend_next_move(b) for b in boards
+    ]
+    values = engine.network.values([bitboard_2048.to_bitboard(board)])
+    assert values[0] == pytest.approx(
+        engine.network.value(bitboard_2048.to_bitboard(board))
+    )
+
+
+def test_engine_loads_from_path(tmp_path):
+    path = str(tmp_path / "network.bin")
+    save_network(random_network(), path)
+    engine = NTupleAIEngine(path=path)
+    assert engine.network.tuples == SMALL_TUPLES
+    with pytest.raises(ValueError, match="train one"):
+        NTupleAIEngine(path=str(tmp_path / "missing.bin"))
+
+
+def test_mapped_networks_pickle_as_their_path(tmp_path):
+    path = str(tmp_path / "network.bin")
+    network = random_network()
+    save_network(network, path)
+    engine = NTupleAIEngine(path=path)
+    data = pickle.dumps(engine)
+    assert len(data) < 1000 < network.weights.nbytes
+    copy = pickle.loads(data)
+    assert isinstance(copy.network.weights, np.memmap)
+    assert copy.recommend_next_move(board) == engine.recommend_next_move(board)
+    # Networks in memory, e.g. in training, travel with their weights
+    in_memory = pickle.loads(pickle.dumps(network))
+    assert np.array_equal(in_memory.weights, network.weights)
+
+
+def test_play_episode_is_reproducible():
+    first, second = NTupleNetwork(SMALL_TUPLES), NTupleNetwork(SMALL_TUPLES)
+    assert play_episode(first, random.Random(3)) == play_episode(
+        second, random.Random(3)
+    )
+    np.testing.assert_array_equal(first.weights, second.weights)
+    assert first.weights.any()
+
+
+def test_training_improves_play():
+    network = NTupleNetwork(SMALL_TUPLES)
+    scores = train(network, 150, learning_rate=0.1, seed=1, log_every=0)
+    assert sum(scores[-50:]) > sum(scores[:50])
+
+
+def test_learn_moves_towards_the_target():
+    network = NTupleNetwork(SMALL_TUPLES)
+    bitboard = bitboard_2048.to_bitboard(board)
+    value = network.learn(bitboard, 100.0, 0.5)
+    assert value == pytest.approx(network.value(bitboard))
+    assert 50.0 <= value < 100.0
@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+import src
+from src.engines_2048 import ENGINES, engine_class
+from src.expectimax_ai_engine_2048 import ExpectimaxAIEngine
+import pytest
+
+ROOT = os.path.join(os.path.dirname(__file__), "..", "..")
+# What command line tools and pool workers import before doing anything
+ENTRY_POINTS = (
+    "src",
+    "src.main",
+    "src.headless_2048",
+    "src.tournament_2048",
+    "src.parallel_ai_engine_2048",
+)
+# Everything above imports in well under this on a laptop, numpy alone
+# takes most of it
+IMPORT_BUDGET_SECONDS = 0.5
+
+
+def fresh_import(statements):
+    """Runs statements in a new interpreter, returns (stdout, stderr)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statements],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout, result.stderr
+
+
+def test_entry_points_import_no_heavy_module():
+    stdout, _ = fresh_import(
+        f"import sys, {', '.join(ENTRY_POINTS)}\nprint(*sorted(sys.modules))"
+    )
+    loaded = set(stdout.split())
+    for heavy in ("pygame", "numpy", "asyncio", "sqlite3"):
+        assert heavy not in loaded
+
+
+def test_entry_points_import_within_budget():
+    _, stderr = fresh_import(f"import {', '.join(ENTRY_POINTS)}")
+    # Lines read "import time: self [us] | cumulative | module", nested
+    # imports are indented, so only top level lines are summed
+    seconds = 0.0
+    for line in stderr.splitlines():
+        _, cumulative, module = line.split("|")
+        if module.startswith(" src"):
+            seconds += int(cumulative) / 1e6
+    assert 0 < seconds < IMPORT_BUDGET_SECONDS
+
+
+def test_engines_import_on_creation():
+    stdout, _ = fresh_import(
+        "import sys\n"
+        "from src import create_engine\n"
+        "create_engine('zack')\n"
+        "print('numpy' in sys.modules)\n"
+        "create_engine('montecarlo')\n"
+        "print('numpy' in sys.modules)"
+    )
+    assert stdout.split() == ["False", "True"]
+
+
+def test_lazy_exports():
+    for name in src.__all__:
+        assert getattr(src, name) is not None
+        assert name in dir(src)
+    assert (
+        src.create_engine("zack").recommend_next_move([[0] * 4] * 4)
+        == src.Keys2048.LEFT
+    )
+    with pytest.raises(AttributeError):
+        src.Game4096
+
+
+def test_engine_class():
+    assert engine_class("expectimax") is ExpectimaxAIEngine
+    assert all(issubclass(engine_class(n), src.AIEngine2048) for n in ENGINES)
+    with pytest.raises(ValueError, match="Unknown engine"):
+        engine_class("deep blue")
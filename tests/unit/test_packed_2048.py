@@ -0,0 +1,85 @@
+from src import packed_2048
+from src.game_2048 import Game2048
+from src.packed_2048 import PackedGame2048
+import pytest
+
+
+board_cases = [
+    [[0, 0, 0], [0, 0, 0], [0, 0, 0]],
+    [[2, 2, 0, 0], [0, 0, 0, 0], [2, 0, 0, 2], [0, 0, 0, 2]],
+    [
+        [2, 4, 8, 16, 32],
+        [64, 128, 256, 512, 1024],
+        [1 << 16, 1 << 20, 1 << 40, 1 << 127, 0],
+        [0, 2, 0, 2, 0],
+        [4, 4, 4, 4, 4],
+    ],
+]
+
+
+@pytest.mark.parametrize("board", board_cases)
+def test_round_trip(board):
+    rows, columns = packed_2048.to_packed(board)
+    assert packed_2048.from_packed(rows, len(board)) == board
+    assert packed_2048.from_packed(columns, len(board)) == [
+        list(column) for column in zip(*board)
+    ]
+
+
+@pytest.mark.parametrize("value", [3, 1, 1 << 128, -2])
+def test_unsupported_tile(value):
+    with pytest.raises(ValueError):
+        packed_2048.tile_to_exponent(value)
+
+
+def test_zero_bytes():
+    cells = 6
+    low = packed_2048.repeat_byte(0x7F, cells)
+    high = packed_2048.repeat_byte(0x80, cells)
+    packed = int.from_bytes(bytes([0, 1, 0, 127, 0x40, 0]), "little")
+    zeros = packed_2048.zero_bytes(packed, low, high)
+    assert zeros == int.from_bytes(
+        bytes([0x80, 0, 0x80, 0, 0, 0x80]), "little"
+    )
+
+
+@pytest.mark.parametrize("move", ["left", "right", "up", "down"])
+@pytest.mark.parametrize("board", board_cases[1:])
+def test_moves_match_reference(board, move):
+    reference = Game2048(
+        grid_size=len(board), board=[row[:] for row in board]
+    )
+    game = PackedGame2048(grid_size=len(board), board=board)
+    assert getattr(game, f"move_{move}")() == getattr(
+        reference, f"move_{move}"
+    )()
+    assert game.board == reference.board
+    assert game.score == reference.score
+
+
+def test_merging_past_the_largest_exponent():
+    game = PackedGame2048(grid_size=2, board=[[1 << 127, 1 << 127], [2, 4]])
+    with pytest.raises(ValueError):
+        game.move_left()
+
+
+def test_is_game_over():
+    board = [[2, 4, 2], [4, 2, 4], [2, 4, 2]]
+    game = PackedGame2048(grid_size=3, board=board)
+    assert game.is_game_over()
+    assert game.is_end_game() == 2
+
+    # Equal pairs across the row boundary of the packed integer do not count
+    board = [[2, 4, 8], [8, 2, 4], [2, 4, 2]]
+    assert PackedGame2048(grid_size=3, board=board).is_game_over()
+
+    board[2][2] = 4
+    assert not PackedGame2048(grid_size=3, board=board).is_game_over()
+
+
+def test_is_game_win():
+    board = [[0, 0, 0], [0, 1 << 20, 0], [0, 0, 0]]
+    game = PackedGame2048(grid_size=3, board=board, max_score=1 << 20)
+    assert game.is_game_win()
+    assert game.is_end_game() == 1
+    assert not PackedGame2048(grid_size=3, board=board).is_game_win()
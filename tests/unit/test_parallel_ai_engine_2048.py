@@ -0,0 +1,70 @@
+import time
+from src.base_ai_engine_2048 import AIEngine2048
+from src.expectimax_ai_engine_2048 import ExpectimaxAIEngine
+from src.parallel_ai_engine_2048 import ParallelAIEngine
+from src.utils import Keys2048
+import pytest
+
+
+class FixedAIEngine(AIEngine2048):
+    def __repr__(self):
+        return "Fixed AI Engine"
+
+    def recommend_next_move(self, board) -> Keys2048:
+        return Keys2048.DOWN
+
+
+@pytest.fixture(scope="module")
+def parallel_engine():
+    engine = ParallelAIEngine(
+        ExpectimaxAIEngine(max_depth=2, time_budget=10), max_workers=2
+    )
+    yield engine
+    engine.close()
+
+
+recommend_cases = [
+    [[2, 2, 4, 8], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]],
+    [[2, 4, 8, 16], [2, 16, 4, 8], [32, 8, 16, 4], [4, 32, 2, 64]],
+    [[2, 0, 0, 0], [4, 0, 0, 0], [8, 0, 0, 0], [16, 0, 0, 0]],
+    [[0, 4, 0, 2], [8, 16, 2, 0], [0, 2, 0, 0], [4, 0, 0, 128]],
+]
+
+
+@pytest.mark.parametrize("board", recommend_cases)
+def test_matches_serial_search(parallel_engine, board):
+    # The parallel root adds one ply on top of the wrapped engine's depth
+    serial_engine = ExpectimaxAIEngine(max_depth=3, time_budget=10)
+    assert parallel_engine.recommend_next_move(
+        board
+    ) == serial_engine.recommend_next_move(board)
+
+
+def test_pool_is_reused(parallel_engine):
+    parallel_engine.recommend_next_move(recommend_cases[0])
+    pool = parallel_engine.pool
+    parallel_engine.recommend_next_move(recommend_cases[1])
+    assert parallel_engine.pool is pool
+
+
+def test_no_legal_move(parallel_engine):
+    board = [[2, 4, 2, 4], [4, 2, 4, 2], [2, 4, 2, 4], [4, 2, 4, 2]]
+    assert parallel_engine.recommend_next_move(board) == Keys2048.LEFT
+
+
+def test_delegates_without_score_position():
+    with ParallelAIEngine(FixedAIEngine(), max_workers=2) as engine:
+        assert engine.recommend_next_move(recommend_cases[0]) == "down"
+        assert engine._pool is None
+
+
+def test_respects_time_budget():
+    board = [[2, 4, 0, 0], [0, 8, 0, 2], [0, 0, 4, 0], [2, 0, 0, 0]]
+    with ParallelAIEngine(
+        ExpectimaxAIEngine(max_depth=8, time_budget=0.1), max_workers=2
+    ) as engine:
+        # Starting the workers is not part of the budget
+        engine.recommend_next_move(board)
+        start = time.perf_counter()
+        engine.recommend_next_move(board)
+        assert time.perf_counter() - start < 0.5
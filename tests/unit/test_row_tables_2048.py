@@ -0,0 +1,78 @@
+from src.game_2048 import Game2048
+from src import row_tables_2048
+import pytest
+
+
+@pytest.fixture(scope="module")
+def tables():
+    return row_tables_2048.get_row_tables()
+
+
+def test_tables_match_slide_row_left(tables):
+    game = Game2048()
+    values = [0, 2, 4, 8, 16384]
+    for a in values:
+        for b in values:
+            for c in values:
+                for d in values:
+                    row = [a, b, c, d]
+                    key = row_tables_2048.encode_row(row)
+                    expected_left = game.slide_row_left(row)
+                    expected_right = game.slide_row_left(row[::-1])[::-1]
+                    left = row_tables_2048.decode_row(tables.left[key])
+                    right = row_tables_2048.decode_row(tables.right[key])
+                    assert left == expected_left
+                    assert right == expected_right
+                    assert tables.changed_left[key] == (left != row)
+                    assert tables.changed_right[key] == (right != row)
+
+
+score_cases = [
+    ([2, 2, 0, 0], 4),
+    ([2, 2, 2, 2], 8),
+    ([2, 4, 2, 4], 0),
+    ([8, 8, 4, 4], 24),
+    ([2, 2, 2, 0], 4),
+]
+
+
+@pytest.mark.parametrize("row, expected_score", score_cases)
+def test_score(tables, row, expected_score):
+    assert tables.score[row_tables_2048.encode_row(row)] == expected_score
+
+
+def test_encode_unsupported_tile():
+    with pytest.raises(KeyError):
+        row_tables_2048.encode_row([3, 0, 0, 0])
+    with pytest.raises(KeyError):
+        row_tables_2048.encode_row([32768, 32768, 0, 0])
+
+
+def test_save_and_load(tables, tmp_path):
+    path = str(tmp_path / "tables" / "row_tables.bin")
+    row_tables_2048.save_row_tables(tables, path)
+    assert row_tables_2048.load_row_tables(path) == tables
+
+
+def test_load_rejects_bad_file(tmp_path):
+    path = tmp_path / "row_tables.bin"
+    path.write_bytes(b"not a table")
+    with pytest.raises(ValueError):
+        row_tables_2048.load_row_tables(str(path))
+
+
+def test_get_row_tables_builds_and_caches(tables, tmp_path, monkeypatch):
+    path = str(tmp_path / "row_tables.bin")
+    monkeypatch.setattr(row_tables_2048, "_row_tables", None)
+    assert row_tables_2048.get_row_tables(path) == tables
+    assert row_tables_2048.load_row_tables(path) == tables
+
+    monkeypatch.setattr(row_tables_2048, "_row_tables", None)
+    monkeypatch.setattr(row_tables_2048, "build_row_tables", None)
+    assert row_tables_2048.get_row_tables(path) == tables
+
+
+def test_large_tiles_fall_back_to_slide_row_left():
+    game = Game2048(board=[[32768, 32768, 0, 0]] + [[0] * 4 for _ in range(3)])
+    assert game.move_left()
+    assert game.board[0] == [65536, 0, 0, 0]
@@ -0,0 +1,214 @@
+import asyncio
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src import headless_2048
+from src.base_ai_engine_2048 import AIEngine2048
+from src.server_2048 import RecommendationServer, RemoteAIEngine
+from src.utils import Keys2048
+import pytest
+
+
+class RecordingEngine(AIEngine2048):
+    """Plays RIGHT if the top left tile is 2, rejects boards holding a 3"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __repr__(self):
+        return "Recording engine"
+
+    def recommend_next_move(self, board) -> Keys2048:
+        if any(3 in row for row in board):
+            raise ValueError("3 is not a tile")
+        return Keys2048.RIGHT if board[0][0] == 2 else Keys2048.LEFT
+
+    def recommend_batch(self, boards):
+        self.batches.append(boards)
+        return super().recommend_batch(boards)
+
+
+class SlowEngine(RecordingEngine):
+    """Takes half a second over boards with an 8 in the top left corner"""
+
+    def recommend_next_move(self, board) -> Keys2048:
+        if board[0][0] == 8:
+            time.sleep(0.5)
+        return super().recommend_next_move(board)
+
+
+class RunningServer:
+    def __init__(self, engine, path, **kwargs):
+        self.server = RecommendationServer(engine, path, **kwargs)
+        ready = threading.Event()
+        self.thread = threading.Thread(
+            target=asyncio.run, args=(self.server.serve_forever(ready),)
+        )
+        self.thread.start()
+        ready.wait()
+
+    def stop(self):
+        self.server.shutdown()
+        self.thread.join()
+
+
+@pytest.fixture
+def socket_path():
+    # Unix socket paths are short, pytest's tmp_path may be too long
+    directory = tempfile.mkdtemp()
+    yield os.path.join(directory, "engine.sock")
+    shutil.rmtree(directory)
+
+
+@pytest.fixture
+def engine():
+    return RecordingEngine()
+
+
+@pytest.fixture
+def server(engine, socket_path):
+    running = RunningServer(engine, socket_path, max_wait=0.05)
+    yield running.server
+    running.stop()
+
+
+def board_with(tile):
+    return [[tile, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 2]]
+
+
+def test_recommends_like_the_engine(server, engine, socket_path):
+    client = RemoteAIEngine(socket_path)
+    assert client.recommend_next_move(board_with(2)) == Keys2048.RIGHT
+    assert client.recommend_next_move(board_with(4)) == Keys2048.LEFT
+    assert client.recommend_batch([board_with(2)]) == [Keys2048.RIGHT]
+    client.close()
+
+
+def test_concurrent_requests_are_batched(server, engine, socket_path):
+    clients = [RemoteAIEngine(socket_path) for _ in range(8)]
+    boards = [board_with(2 if i % 2 else 4) for i in range(8)]
+    with ThreadPoolExecutor(len(clients)) as executor:
+        moves = list(
+            executor.map(
+                lambda args: args[0].recommend_next_move(args[1]),
+                zip(clients, boards),
+            )
+        )
+    assert moves == [
+        Keys2048.RIGHT if i % 2 else Keys2048.LEFT for i in range(8)
+    ]
+    # Identical boards are evaluated once per batch
+    assert max(len(batch) for batch in engine.batches) <= 2
+    assert len(engine.batches) < len(boards)
+
+    stats = clients[0].stats()
+    assert stats["requests"] == 8
+    assert stats["batches"] == len(engine.batches)
+    assert stats["mean_batch_size"] > 1
+    assert stats["queue_depth"] == 0
+    assert stats["clients"] == len(clients)
+    assert stats["latency_ms"]["p99"] > 0
+    for client in clients:
+        client.close()
+
+
+def test_max_batch(engine, socket_path):
+    running = RunningServer(engine, socket_path, max_batch=1, max_wait=0.05)
+    clients = [RemoteAIEngine(socket_path) for _ in range(4)]
+    with ThreadPoolExecutor(len(clients)) as executor:
+        list(
+            executor.map(
+                lambda client: client.recommend_next_move(board_with(2)),
+                clients,
+            )
+        )
+    running.stop()
+    assert [len(batch) for batch in engine.batches] == [1, 1, 1, 1]
+
+
+def test_bad_requests_fail_alone(server, engine, socket_path):
+    client = RemoteAIEngine(socket_path)
+    with pytest.raises(ValueError, match="square"):
+        client.recommend_next_move([[2, 0], [0]])
+    with pytest.raises(ValueError, match="3 is not a tile"):
+        client.recommend_next_move(board_with(3))
+    # The connection survives both errors
+    assert client.recommend_next_move(board_with(2)) == Keys2048.RIGHT
+    assert client.stats()["errors"] == 2
+    client.close()
+
+
+def test_engine_errors_do_not_spoil_the_batch(server, socket_path):
+    clients = [RemoteAIEngine(socket_path) for _ in range(2)]
+
+    def ask(args):
+        client, board = args
+        try:
+            return client.recommend_next_move(board)
+        except ValueError as e:
+            return str(e)
+
+    with ThreadPoolExecutor(2) as executor:
+        answers = list(
+            executor.map(ask, zip(clients, [board_with(3), board_with(2)]))
+        )
+    assert answers == ["3 is not a tile", Keys2048.RIGHT]
+    for client in clients:
+        client.close()
+
+
+def test_client_reconnects_after_a_restart(engine, socket_path):
+    running = RunningServer(engine, socket_path)
+    client = RemoteAIEngine(socket_path)
+    assert client.recommend_next_move(board_with(2)) == Keys2048.RIGHT
+    running.stop()
+    assert not os.path.exists(socket_path)
+    with pytest.raises(OSError):
+        client.recommend_next_move(board_with(2))
+
+    running = RunningServer(engine, socket_path)
+    assert client.recommend_next_move(board_with(2)) == Keys2048.RIGHT
+    client.close()
+    running.stop()
+
+
+def test_refuses_a_socket_in_use(server, socket_path):
+    second = RecommendationServer(RecordingEngine(), socket_path)
+    with pytest.raises(ValueError, match="already running"):
+        asyncio.run(second.start())
+    client = RemoteAIEngine(socket_path)
+    assert client.recommend_next_move(board_with(2)) == Keys2048.RIGHT
+    client.close()
+
+
+def test_replaces_a_stale_socket(engine, socket_path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(socket_path)
+    running = RunningServer(engine, socket_path)
+    client = RemoteAIEngine(socket_path)
+    assert client.recommend_next_move(board_with(2)) == Keys2048.RIGHT
+    client.close()
+    running.stop()
+
+
+def test_timeouts_are_not_retried(socket_path):
+    engine = SlowEngine()
+    running = RunningServer(engine, socket_path, max_wait=0)
+    client = RemoteAIEngine(socket_path, timeout=0.1)
+    assert client.recommend_next_move(board_with(2)) == Keys2048.RIGHT
+    with pytest.raises(TimeoutError):
+        client.recommend_next_move(board_with(8))
+    running.stop()
+    assert [batch for batch in engine.batches if batch[0][0][0] == 8] == [
+        [board_with(8)]
+    ]
+
+
+def test_headless_plays_through_the_server(server, socket_path, capsys):
+    args = ["--server", socket_path, "-n", "2", "--seed", "1"]
+    assert headless_2048.main(args) == 0
+    assert "games       2" in capsys.readouterr().out
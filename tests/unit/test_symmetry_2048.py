@@ -0,0 +1,138 @@
+import random
+from src import bitboard_2048
+from src.game_2048 import Game2048
+from src.symmetry_2048 import (
+    FLIP_COLUMNS,
+    FLIP_ROWS,
+    IDENTITY,
+    TRANSFORMS,
+    TRANSPOSE,
+    SymmetryProbe,
+    canonical_bitboard,
+    canonical_board,
+    canonical_key,
+    flip_columns,
+    flip_rows,
+    inverse,
+    move_from_canonical,
+    symmetric_bitboards,
+    transform_bitboard,
+    transform_board,
+    transform_move,
+)
+from src.utils import Keys2048
+import pytest
+
+board = [[0, 4, 0, 2], [8, 16, 2, 0], [0, 2, 0, 0], [4, 0, 0, 128]]
+
+
+def random_boards(count, grid_size=4, seed=0):
+    rng = random.Random(seed)
+    tiles = [0, 0, 0, 2, 4, 8, 16, 32, 64, 128]
+    return [
+        [
+            [rng.choice(tiles) for _ in range(grid_size)]
+            for _ in range(grid_size)
+        ]
+        for _ in range(count)
+    ]
+
+
+def test_flips():
+    bitboard = bitboard_2048.to_bitboard(board)
+    assert bitboard_2048.from_bitboard(flip_rows(bitboard)) == [
+        row[::-1] for row in board
+    ]
+    assert bitboard_2048.from_bitboard(flip_columns(bitboard)) == board[::-1]
+
+
+@pytest.mark.parametrize("transform", TRANSFORMS)
+def test_bitboard_and_list_transforms_agree(transform):
+    for b in random_boards(20):
+        assert bitboard_2048.from_bitboard(
+            transform_bitboard(bitboard_2048.to_bitboard(b), transform)
+        ) == transform_board(b, transform)
+
+
+def test_transforms_are_the_8_symmetries():
+    images = [transform_board(board, t) for t in TRANSFORMS]
+    rotations = [board]
+    for _ in range(3):
+        rotations.append([list(row) for row in zip(*rotations[-1][::-1])])
+    mirrors = [[row[::-1] for row in b] for b in rotations]
+    assert sorted(images) == sorted(rotations + mirrors)
+    bitboard = bitboard_2048.to_bitboard(board)
+    assert symmetric_bitboards(bitboard) == [
+        transform_bitboard(bitboard, t) for t in TRANSFORMS
+    ]
+
+
+@pytest.mark.parametrize("transform", TRANSFORMS)
+def test_inverse(transform):
+    image = transform_board(board, transform)
+    assert transform_board(image, inverse(transform)) == board
+
+
+def test_inverse_examples():
+    assert inverse(IDENTITY) == IDENTITY
+    assert inverse(TRANSPOSE | FLIP_ROWS) == TRANSPOSE | FLIP_COLUMNS
+    assert inverse(FLIP_ROWS | FLIP_COLUMNS) == FLIP_ROWS | FLIP_COLUMNS
+
+
+@pytest.mark.parametrize("transform", TRANSFORMS)
+@pytest.mark.parametrize("move", list(Keys2048))
+def test_transform_move_commutes_with_moves(transform, move):
+    for b in random_boards(10, seed=1):
+        moved = Game2048(board=b)
+        getattr(moved, f"move_{move}")()
+
+        image = Game2048(board=transform_board(b, transform))
+        getattr(image, f"move_{transform_move(move, transform)}")()
+        assert image.board == transform_board(moved.board, transform)
+
+
+def test_canonical_bitboard_is_shared_by_all_symmetries():
+    for b in random_boards(50, seed=2):
+        bitboard = bitboard_2048.to_bitboard(b)
+        canonical, transform = canonical_bitboard(bitboard)
+        assert transform_bitboard(bitboard, transform) == canonical
+        assert canonical_key(bitboard) == canonical
+        for image in symmetric_bitboards(bitboard):
+            assert canonical_bitboard(image)[0] == canonical
+
+
+@pytest.mark.parametrize("grid_size", [3, 4, 5])
+def test_canonical_board_is_shared_by_all_symmetries(grid_size):
+    for b in random_boards(20, grid_size, seed=3):
+        canonical, transform = canonical_board(b)
+        assert transform_board(b, transform) == canonical
+        for t in TRANSFORMS:
+            assert canonical_board(transform_board(b, t))[0] == canonical
+
+
+@pytest.mark.parametrize("move", list(Keys2048))
+def test_move_from_canonical(move):
+    for b in random_boards(20, seed=4):
+        canonical, transform = canonical_board(b)
+        on_canonical = Game2048(board=canonical)
+        getattr(on_canonical, f"move_{move}")()
+
+        original = Game2048(board=b)
+        getattr(original, f"move_{move_from_canonical(move, transform)}")()
+        assert transform_board(original.board, transform) == (
+            on_canonical.board
+        )
+
+
+def test_symmetry_probe():
+    probe = SymmetryProbe()
+    assert probe.raw_hit_rate == probe.canonical_hit_rate == 0.0
+    bitboard = bitboard_2048.to_bitboard(board)
+    for image in symmetric_bitboards(bitboard):
+        probe.observe(image)
+    probe.observe(bitboard)
+    # The board itself is seen twice, its symmetries all hit canonically
+    assert probe.lookups == 9
+    assert probe.raw_hits == 1
+    assert probe.canonical_hits == 8
+    assert probe.summary()["canonical_entries"] == 1
@@ -0,0 +1,234 @@
+import functools
+import pickle
+import numpy as np
+from src import bitboard_2048
+from src.afterstates_2048 import (
+    MOVES,
+    afterstates,
+    legal_moves,
+    moves_from_mask,
+)
+from src.base_ai_engine_2048 import AIEngine2048
+from src.game_2048 import Game2048
+from src.tablebase_2048 import (
+    NO_MOVE,
+    PROBABILITY_SCALE,
+    TablebaseAIEngine,
+    board_key,
+    build_opening_book,
+    build_tablebase,
+    opening_positions,
+    parse_args,
+    reachable_positions,
+    save_table,
+    start_positions,
+)
+from src.utils import Keys2048
+from src.zack_ai_engine_2048 import ZackAIEngine
+import pytest
+
+
+def from_key(key, grid_size):
+    return [
+        [
+            bitboard_2048.exponent_to_tile(key >> 4 * (grid_size * i + j) & 15)
+            for j in range(grid_size)
+        ]
+        for i in range(grid_size)
+    ]
+
+
+def reference_solver(max_score, numbers=(2, 4)):
+    """Plain recursive expectimax over list of lists boards"""
+
+    @functools.lru_cache(maxsize=None)
+    def value(board):
+        rows = [list(row) for row in board]
+        if not legal_moves(rows):
+            return 0.0
+        if any(max_score in row for row in rows):
+            return 1.0
+        boards, _, legal = afterstates(rows)
+        best = 0.0
+        for k, after in enumerate(boards):
+            if not legal >> k & 1:
+                continue
+            children = []
+            for i, row in enumerate(after):
+                for j, tile in enumerate(row):
+                    for number in numbers if tile == 0 else ():
+                        row[j] = number
+                        children.append(tuple(map(tuple, after)))
+                        row[j] = 0
+            best = max(best, sum(map(value, children)) / len(children))
+        return best
+
+    return lambda board: value(tuple(map(tuple, board)))
+
+
+class FirstLegal(AIEngine2048):
+    def __repr__(self):
+        return "First legal"
+
+    def recommend_next_move(self, board):
+        return moves_from_mask(legal_moves(board))[0]
+
+
+@pytest.fixture(scope="module")
+def tablebase():
+    return build_tablebase(grid_size=2, max_score=32)
+
+
+def test_keys_are_bitboards():
+    board = [[0, 2, 4, 8], [16, 0, 0, 32768], [2, 2, 0, 0], [0] * 4]
+    assert board_key(board) == bitboard_2048.to_bitboard(board)
+    assert from_key(board_key([[2, 0], [0, 4]]), 2) == [[2, 0], [0, 4]]
+    assert board_key([[3, 0], [0, 0]]) is None
+    assert board_key([[0] * 5] * 5) is None
+
+
+def test_start_positions_are_dealt_by_start_game():
+    starts = set(start_positions(3).tolist())
+    assert len(starts) == 2**9 - 1
+    for seed in range(20):
+        game = Game2048(grid_size=3, seed=seed)
+        game.start_game()
+        assert board_key(game.board) in starts
+
+
+def test_reachable_positions_come_from_starts():
+    keys = reachable_positions(2, 16)
+    assert set(start_positions(2).tolist()) <= set(keys.tolist())
+    boards = [from_key(key, 2) for key in keys.tolist()]
+    assert all(max(map(max, board)) <= 16 for board in boards)
+    assert np.all(np.diff(keys.astype(np.int64)) > 0)
+
+
+@pytest.mark.parametrize("max_score", [8, 16, 32])
+def test_matches_recursive_expectimax(max_score):
+    table = build_tablebase(grid_size=2, max_score=max_score)
+    reference = reference_solver(max_score)
+    for key, move, probability in zip(
+        table.keys.tolist(), table.moves, table.probabilities
+    ):
+        board = from_key(key, 2)
+        assert probability == pytest.approx(reference(board))
+        if move != NO_MOVE:
+            boards, _, legal = afterstates(board)
+            assert legal >> move & 1
+
+
+def test_three_by_three():
+    table = build_tablebase(grid_size=3, max_score=8)
+    reference = reference_solver(8)
+    for key, probability in list(zip(table.keys, table.probabilities))[::97]:
+        assert probability == pytest.approx(reference(from_key(int(key), 3)))
+
+
+def test_engine_looks_up_every_position(tablebase, tmp_path):
+    path = str(tmp_path / "2x2.bin")
+    save_table(tablebase, path)
+    engine = TablebaseAIEngine(path)
+    assert repr(engine) == "Tablebase of 2x2 boards up to 32"
+    assert len(engine) == len(tablebase.keys)
+    assert engine.numbers_to_be_generated == (2, 4)
+    for key, move, probability in zip(
+        tablebase.keys.tolist(), tablebase.moves, tablebase.probabilities
+    ):
+        analysis = engine.lookup(from_key(key, 2))
+        if move == NO_MOVE:
+            assert analysis is None
+        else:
+            assert analysis.move == MOVES[move]
+            assert analysis.score == pytest.approx(
+                probability, abs=1 / PROBABILITY_SCALE
+            )
+    engine.close()
+
+
+def test_engine_falls_back(tablebase, tmp_path):
+    class Up(AIEngine2048):
+        def __repr__(self):
+            return "Up"
+
+        def recommend_next_move(self, board):
+            return Keys2048.UP
+
+    path = str(tmp_path / "2x2.bin")
+    save_table(tablebase, path)
+    # Unreachable: tiles above max_score, or another grid size
+    unknown = [[64, 0], [0, 0]]
+    # Without a fallback, the first legal move
+    assert TablebaseAIEngine(path).recommend_next_move(unknown) == (
+        Keys2048.RIGHT
+    )
+    engine = TablebaseAIEngine(path, fallback=Up())
+    assert engine.recommend_next_move(unknown) == Keys2048.UP
+    assert engine.recommend_next_move([[0] * 3] * 3) == Keys2048.UP
+
+    copy = pickle.loads(pickle.dumps(TablebaseAIEngine(path, FirstLegal())))
+    assert copy.lookup([[2, 0], [0, 0]]) == engine.lookup([[2, 0], [0, 0]])
+
+
+def test_engine_knows_every_position_of_its_games(tmp_path):
+    path = str(tmp_path / "3x3.bin")
+    save_table(build_tablebase(grid_size=3, max_score=16), path)
+    engine = TablebaseAIEngine(path)
+    for seed in range(10):
+        game = Game2048(grid_size=3, max_score=16, seed=seed)
+        game.start_game()
+        while not (game.is_game_over() or game.is_game_win()):
+            analysis = engine.lookup(game.board)
+            assert 0 <= analysis.score <= 1
+            assert getattr(game, f"move_{analysis.move}")()
+            game.generate_tile()
+
+
+def test_opening_book(tmp_path):
+    assert len(opening_positions(0)) == 2**16 - 1
+    positions = opening_positions(1, grid_size=3)
+    assert set(start_positions(3).tolist()) < set(positions.tolist())
+
+    book = build_opening_book(1, FirstLegal(), grid_size=3)
+    assert np.array_equal(book.keys, positions)
+    pooled = build_opening_book(1, FirstLegal(), grid_size=3, processes=2)
+    assert np.array_equal(book.moves, pooled.moves)
+
+    path = str(tmp_path / "book.bin")
+    save_table(book, path)
+    engine = TablebaseAIEngine(path, fallback=FirstLegal())
+    assert repr(engine) == "Opening book of 3x3 boards, 1 plies deep"
+    for key in positions.tolist()[::50]:
+        board = from_key(key, 3)
+        if legal_moves(board):
+            analysis = engine.lookup(board)
+            assert analysis.move == FirstLegal().recommend_next_move(board)
+            assert analysis.score is None
+
+
+def test_opening_book_leaves_out_moves_that_do_nothing():
+    book = build_opening_book(0, ZackAIEngine(), grid_size=2)
+    for key, move in zip(book.keys.tolist(), book.moves):
+        legal = legal_moves(from_key(key, 2))
+        assert move == (0 if legal & 1 else NO_MOVE)
+
+
+@pytest.mark.parametrize(
+    "argv, grid_size",
+    [
+        ([], 3),
+        (["--book-plies", "2"], 4),
+        (["--book-plies", "2", "--grid-size", "3"], 3),
+    ],
+)
+def test_default_grid_size(argv, grid_size):
+    assert parse_args(["-o", "table.bin"] + argv).grid_size == grid_size
+
+
+def test_rejects_bad_files(tmp_path):
+    path = tmp_path / "table.bin"
+    path.write_bytes(b"Z48N" + bytes(100))
+    with pytest.raises(ValueError):
+        TablebaseAIEngine(str(path))
+    with pytest.raises(ValueError):
+        build_tablebase(grid_size=2, max_score=100)
@@ -0,0 +1,148 @@
+import math
+from src.base_ai_engine_2048 import AIEngine2048
+from src.expectimax_ai_engine_2048 import ExpectimaxAIEngine
+from src.headless_2048 import GameResult
+from src.ntuple_ai_engine_2048 import WEIGHTS_ENV_VAR
+from src.tournament_2048 import (
+    compare,
+    create_engines,
+    format_tournament,
+    main,
+    mean_interval,
+    run_tournament,
+    wilson_interval,
+    z_score,
+)
+from src.utils import Keys2048
+import pytest
+
+
+class FixedAIEngine(AIEngine2048):
+    def __init__(self, move=Keys2048.LEFT):
+        self.move = move
+
+    def __repr__(self):
+        return f"Fixed AI Engine ({self.move})"
+
+    def recommend_next_move(self, board) -> Keys2048:
+        return self.move
+
+
+def result(seed, score, outcome="over"):
+    return GameResult(seed, seed, 10, score, 64, outcome)
+
+
+def test_z_score():
+    assert z_score(0.95) == pytest.approx(1.96, abs=0.01)
+
+
+def test_wilson_interval():
+    low, high = wilson_interval(50, 100, 1.96)
+    assert low == pytest.approx(0.404, abs=0.001)
+    assert high == pytest.approx(0.596, abs=0.001)
+    assert wilson_interval(0, 10, 1.96)[0] == 0.0
+    assert wilson_interval(0, 0, 1.96) == (0.0, 1.0)
+
+
+def test_mean_interval():
+    low, high = mean_interval([1.0, 2.0, 3.0, 4.0], 1.96)
+    assert (low + high) / 2 == pytest.approx(2.5)
+    assert high - low == pytest.approx(2 * 1.96 * 1.291 / 2, abs=0.01)
+    assert mean_interval([1.0], 1.96) == (-math.inf, math.inf)
+
+
+def test_compare_pairs_games_by_seed():
+    results = {
+        "a": [result(1, 110), result(2, 1010), result(3, 510)],
+        "b": [result(3, 500), result(2, 1000), result(1, 100), result(4, 0)],
+    }
+    comparison = compare("a", "b", results, "score", 1.96)
+    # Scores spread widely, their matched differences do not at all
+    assert comparison.mean_difference == 10
+    assert comparison.interval == (10, 10)
+    assert comparison.significant
+
+
+def test_compare_win_rates():
+    results = {
+        "a": [result(1, 0, "won"), result(2, 0, "over")],
+        "b": [result(1, 0, "won"), result(2, 0, "won")],
+    }
+    comparison = compare("a", "b", results, "won", 1.96)
+    assert comparison.mean_difference == -0.5
+    assert not comparison.significant
+
+
+def test_stops_early_once_significant():
+    tournament = run_tournament(
+        {
+            "expectimax": ExpectimaxAIEngine(max_depth=1),
+            "left": FixedAIEngine(),
+        },
+        max_games=200,
+        min_games=8,
+        batch_size=4,
+        max_score=64,
+        max_workers=0,
+    )
+    assert tournament.stopped_early
+    assert tournament.seeds < 200
+    assert [s.engine for s in tournament.stats] == ["expectimax", "left"]
+    (comparison,) = tournament.comparisons
+    assert comparison.leader == "expectimax"
+    assert comparison.significant
+    assert tournament.stats[0].games == tournament.seeds
+    assert "stopped early" in format_tournament(tournament)
+
+
+def test_identical_engines_run_to_max_games():
+    tournament = run_tournament(
+        {"a": FixedAIEngine(), "b": FixedAIEngine()},
+        max_games=12,
+        min_games=4,
+        batch_size=5,
+        max_workers=0,
+    )
+    # Same seeds, same moves: the games are identical
+    assert tournament.seeds == 12
+    assert not tournament.stopped_early
+    assert tournament.comparisons[0].mean_difference == 0
+    assert tournament.stats[0].mean_score == tournament.stats[1].mean_score
+
+
+def test_process_pool_matches_serial():
+    engines = {
+        "expectimax": ExpectimaxAIEngine(max_depth=1),
+        "up": FixedAIEngine(Keys2048.UP),
+    }
+    kwargs = dict(max_games=6, batch_size=3, max_score=64, early_stop=False)
+    serial = run_tournament(engines, max_workers=0, **kwargs)
+    parallel = run_tournament(engines, max_workers=2, **kwargs)
+    assert serial == parallel
+
+
+def test_rejects_bad_arguments():
+    with pytest.raises(ValueError):
+        run_tournament({"a": FixedAIEngine()}, max_workers=0)
+    with pytest.raises(ValueError):
+        run_tournament(
+            {"a": FixedAIEngine(), "b": FixedAIEngine()},
+            metric="moves",
+            max_workers=0,
+        )
+
+
+def test_default_engines_leave_out_those_missing_files(monkeypatch, tmp_path):
+    monkeypatch.setenv(WEIGHTS_ENV_VAR, str(tmp_path / "missing.bin"))
+    engines = create_engines()
+    assert "ntuple" not in engines
+    assert {"zack", "expectimax"} <= set(engines)
+    with pytest.raises(ValueError):
+        create_engines(["zack", "ntuple"])
+
+
+def test_main_needs_two_engines(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(["-e", "zack"])
+    assert exit_info.value.code == 2
+    assert "at least two engines" in capsys.readouterr().err